@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+End-to-End Benchmark gegen den Mock der Tuya OpenAPI
+
+Startet mock_tuya_cloud im selben Prozess (eigener Thread) und misst
+TuyaCloudClient (und AsyncTuyaCloudClient, falls aiohttp installiert ist)
+mit simulierter Cloud-Latenz. Zusätzlich wird gezählt, wie viele Requests
+tatsächlich beim Server ankommen (Cache, Single-Flight, Batching).
+
+Dient in der CI als Smoke-Test: fehlgeschlagene oder leere Ergebnisse
+(False, None, {}, "success": False) führen zu Exit-Code 1, solange
+keine Fehlerquote (--error-rate) simuliert wird.
+
+Usage:
+  python benchmarks/bench_mock_cloud.py [--devices 40] [--latency 0.05]
+                                        [--iterations 50] [--threads 16]
+                                        [--error-rate 0.0]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from client import TuyaCloudClient
+from config_loader import TuyaConfig
+from mock_tuya_cloud import MOCK_ACCESS_ID, MOCK_ACCESS_KEY, MockTuyaCloud
+
+
+# "label: Ergebnis" aller fehlgeschlagenen Aufrufe
+FAILURES: List[str] = []
+
+
+def check(label: str, result: Any) -> Any:
+    """Merkt fehlgeschlagene oder leere Ergebnisse für den Exit-Code"""
+    if not result or (isinstance(result, dict) and result.get("success") is False):
+        FAILURES.append(f"{label}: {result!r}")
+    return result
+
+
+def make_config(server: MockTuyaCloud) -> TuyaConfig:
+    return TuyaConfig({
+        "cloud": {
+            "access_id": MOCK_ACCESS_ID,
+            "access_key": MOCK_ACCESS_KEY,
+            "base_url": server.base_url,
+        },
+        "devices": [{"device_id": device_id, "name": device_id} for device_id in server.device_ids],
+        "http": {"pool_size": 32},
+        "rate_limit": {"enabled": False},
+        "retry": {"base_delay": 0.01, "max_delay": 0.05},
+    })
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50": ordered[len(ordered) // 2] * 1000,
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "mean": statistics.mean(ordered) * 1000,
+    }
+
+
+def measure(server: MockTuyaCloud, label: str, fn: Callable[[], object], iterations: int) -> None:
+    """Führt fn iterations-mal aus und gibt Latenzen und Server-Requests aus"""
+    before = server.stats["requests"]
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+        check(label, result)
+    report(server, label, samples, before, iterations)
+
+
+def report(server: MockTuyaCloud, label: str, samples: List[float], before: int, calls: int) -> None:
+    stats = percentiles(samples)
+    requests = server.stats["requests"] - before
+    print(f"{label:<40} {stats['p50']:>8.1f} {stats['p95']:>8.1f} {stats['mean']:>8.1f}"
+          f" {requests / max(calls, 1):>9.2f}")
+
+
+def run_sync(server: MockTuyaCloud, args) -> None:
+    client = TuyaCloudClient(config=make_config(server))
+    device_ids = server.device_ids
+    first = device_ids[0]
+
+    measure(server, "get_token (force_refresh)", lambda: client.get_token(force_refresh=True),
+            min(args.iterations, 10))
+    measure(server, "get_device_properties (uncached)",
+            lambda: client.get_device_properties(first, max_staleness=0), args.iterations)
+    measure(server, "get_device_properties (cache.ttl)",
+            lambda: client.get_device_properties(first), args.iterations)
+
+    toggle = [False]
+
+    def set_power():
+        toggle[0] = not toggle[0]
+        return client.set_device_properties(first, None, {"Power": toggle[0], "temp_set": 210})
+    measure(server, "set_device_properties (2 codes)", set_power, args.iterations)
+
+    def get_status():
+        statuses = client.get_devices_status(device_ids)
+        return len(statuses) == len(device_ids) and statuses
+    measure(server, f"get_devices_status ({len(device_ids)} devices)",
+            get_status, min(args.iterations, 20))
+
+    # Viele Threads lesen gleichzeitig dasselbe Gerät (Single-Flight)
+    before = server.stats["requests"]
+    samples: List[float] = []
+
+    def timed_read(_):
+        start = time.perf_counter()
+        result = client.get_device_properties(first, max_staleness=0)
+        samples.append(time.perf_counter() - start)
+        check("threads, same device", result)
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(timed_read, range(args.iterations * args.threads // 4)))
+    report(server, f"{args.threads} threads, same device", samples, before, len(samples))
+
+    # Alle Geräte parallel
+    before = server.stats["requests"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(
+            lambda d: client.get_device_properties(d, max_staleness=0), device_ids))
+    for device_id, result in zip(device_ids, results):
+        check(f"all devices {device_id}", result)
+    report(server, f"{args.threads} threads, all devices (total)",
+           [time.perf_counter() - start], before, len(device_ids))
+    client.close()
+
+
+def run_async(server: MockTuyaCloud, args) -> None:
+    try:
+        from async_client import AsyncTuyaCloudClient
+    except ImportError:
+        print("(aiohttp nicht installiert - async übersprungen)")
+        return
+
+    async def main():
+        async with AsyncTuyaCloudClient(config=make_config(server)) as client:
+            await client.get_token()
+            before = server.stats["requests"]
+            samples = []
+            for _ in range(max(args.iterations // 10, 1)):
+                start = time.perf_counter()
+                results = await client.get_many_device_properties(server.device_ids,
+                                                                  max_staleness=0)
+                samples.append(time.perf_counter() - start)
+                for device_id in server.device_ids:
+                    check(f"async get_many {device_id}", results.get(device_id))
+            report(server, f"async get_many ({len(server.device_ids)} devices)",
+                   samples, before, len(samples) * len(server.device_ids))
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the client against the mock cloud")
+    parser.add_argument("--devices", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05, help="Sekunden pro Request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    server = MockTuyaCloud(port=0, device_count=args.devices, latency=args.latency,
+                           jitter=args.jitter, error_rate=args.error_rate, seed=1).start()
+
+    print(f"\nMock: {args.devices} Geräte, Latenz {args.latency * 1000:.0f} ms,"
+          f" Fehlerquote {args.error_rate:.0%}\n")
+    print(f"{'Fall':<40} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'req/call':>9}")
+    print("-" * 77)
+    try:
+        run_sync(server, args)
+        run_async(server, args)
+    finally:
+        server.stop()
+    print(f"\nServer: {dict(server.stats)}\n")
+
+    if FAILURES:
+        print(f"{len(FAILURES)} fehlgeschlagene Aufrufe, z.B.:")
+        for failure in FAILURES[:10]:
+            print(f"  {failure}")
+        if not args.error_rate:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
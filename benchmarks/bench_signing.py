@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Micro-Benchmark: Request-Signatur
+
+Vergleicht die ursprüngliche Signatur (HMAC pro Request neu aufbauen,
+leeren Body jedes Mal hashen, Debug-String immer formatieren) mit dem
+vorberechneten SigningContext.
+
+Usage:
+  python benchmarks/bench_signing.py [--iterations 200000]
+"""
+
+import argparse
+import hashlib
+import hmac
+import logging
+import sys
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from client import SigningContext
+
+ACCESS_ID = "abcdefghijklmnopqrst"
+ACCESS_KEY = "0123456789abcdef0123456789abcdef"
+TOKEN = "c1f0e5d7a4b2c3d4e5f60718293a4b5c"
+PATH = "/v2.0/cloud/thing/bf0123456789abcdefgh/shadow/properties"
+BODY = '{"commands":[{"code":"Power","value":true},{"code":"temp_set","value":210}]}'
+
+logger = logging.getLogger("bench_signing")
+
+
+def legacy_sign(method, path, body=None, access_token=None):
+    """Signatur wie vor dem SigningContext"""
+    timestamp = int(time.time() * 1000)
+    if access_token:
+        payload = ACCESS_ID + access_token + str(timestamp)
+    else:
+        payload = ACCESS_ID + str(timestamp)
+    content_sha256 = hashlib.sha256((body or "").encode('utf-8')).hexdigest()
+    payload += f"{method}\n{content_sha256}\n\n{path}"
+    logger.debug(f"Payload to sign:\n{payload}")
+    signature = hmac.new(
+        ACCESS_KEY.encode('utf-8'),
+        payload.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest().upper()
+    return signature, str(timestamp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request signing")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    context = SigningContext(ACCESS_ID, ACCESS_KEY)
+    
+    # Beide Varianten müssen dieselbe Signatur liefern
+    ts = int(time.time() * 1000)
+    assert context.sign("GET", PATH, "", TOKEN, ts)[0] == hmac.new(
+        ACCESS_KEY.encode(), f"{ACCESS_ID}{TOKEN}{ts}GET\n{hashlib.sha256(b'').hexdigest()}\n\n{PATH}".encode(),
+        hashlib.sha256
+    ).hexdigest().upper()
+    
+    cases = [
+        ("GET  (leerer Body)", "GET", ""),
+        ("POST (commands)", "POST", BODY),
+    ]
+    
+    print(f"\n{'Fall':<22} {'legacy µs':>10} {'context µs':>11} {'Faktor':>7}")
+    print("-" * 54)
+    for label, method, body in cases:
+        legacy = min(timeit.repeat(
+            lambda: legacy_sign(method, PATH, body, TOKEN),
+            number=args.iterations, repeat=3))
+        fast = min(timeit.repeat(
+            lambda: context.sign(method, PATH, body, TOKEN),
+            number=args.iterations, repeat=3))
+        legacy_us = legacy / args.iterations * 1e6
+        fast_us = fast / args.iterations * 1e6
+        print(f"{label:<22} {legacy_us:>10.2f} {fast_us:>11.2f} {legacy_us / fast_us:>6.2f}x")
+    print()
+
+
+if __name__ == "__main__":
+    main()
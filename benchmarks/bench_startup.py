@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Startup-Benchmark: Import- und App-Erstellungszeit
+
+Misst in frischen Python-Prozessen, wie lange der Import der Module
+und create_app() der REST API dauern (Kaltstart ohne Modul-Cache).
+
+Usage:
+  python benchmarks/bench_startup.py [--runs 10] [--config config/config.yaml.example]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+SNIPPETS = {
+    "import client": "import client",
+    "import tuya_homeassistant_api": "import tuya_homeassistant_api",
+    "create_app()": "import tuya_homeassistant_api as m; m.create_app({config!r})",
+}
+
+TEMPLATE = """
+import sys, time
+sys.path.insert(0, {src!r})
+t0 = time.perf_counter()
+{snippet}
+print(time.perf_counter() - t0)
+"""
+
+
+def measure(snippet: str, runs: int) -> list:
+    """Führt das Snippet `runs`-mal in einem neuen Interpreter aus"""
+    code = TEMPLATE.format(src=str(SRC), snippet=snippet)
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                             text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--config",
+                        default=str(SRC.parent / "config" / "config.yaml.example"))
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}, {args.runs} Läufe pro Messung\n")
+    for name, snippet in SNIPPETS.items():
+        samples = measure(snippet.format(config=args.config), args.runs)
+        print(f"{name:32s} median {statistics.median(samples) * 1000:7.1f} ms"
+              f"   min {min(samples) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
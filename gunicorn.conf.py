@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for the REST API with many /events subscribers
+
+    pip install gunicorn gevent
+    gunicorn                                   # from the repository root
+    TUYA_CONFIG=/etc/tuya/config.yaml TUYA_BIND=0.0.0.0:5000 gunicorn
+
+gevent workers serve every request (and every open /events stream) as a
+greenlet instead of an OS thread; the event hub's condition variable,
+the poller and the HTTP client are monkey-patched to cooperate. One
+worker only: each worker process runs its own poller, so more workers
+would multiply cloud requests.
+"""
+
+import os
+
+_config = os.environ.get("TUYA_CONFIG")
+_config = os.path.abspath(_config) if _config else "config.yaml"
+
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+wsgi_app = f"tuya_homeassistant_api:create_app({_config!r})"
+bind = os.environ.get("TUYA_BIND", "0.0.0.0:5000")
+
+worker_class = "gevent"
+workers = 1
+worker_connections = int(os.environ.get("TUYA_WORKER_CONNECTIONS", 1000))
+graceful_timeout = 5
@@ -0,0 +1,43 @@
+"""
+Tuya Cloud Client
+
+Die Module in src/ importieren sich gegenseitig flach (import json_codec,
+from client import ...), damit Skripte, PyInstaller-Builds und die REST
+API direkt aus src/ laufen. Für Aufrufer aus dem Repository-Verzeichnis
+(from src.client import TuyaCloudClient) legt dieses Paket src/ auf den
+sys.path und liefert für src.<modul> dasselbe Modulobjekt wie für <modul>.
+So gibt es keine doppelten Klassen (isinstance bleibt gültig).
+"""
+
+import importlib
+import importlib.abc
+import importlib.util
+import os
+import sys
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
+
+
+class _FlatModuleAlias(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """src.<modul> -> bereits flach importiertes bzw. zu importierendes <modul>"""
+    
+    def find_spec(self, fullname, path=None, target=None):
+        package, _, name = fullname.partition(".")
+        if package != __name__ or not name or "." in name:
+            return None
+        if not os.path.isfile(os.path.join(_SRC_DIR, f"{name}.py")):
+            return None
+        return importlib.util.spec_from_loader(fullname, self)
+    
+    def create_module(self, spec):
+        return importlib.import_module(spec.name.partition(".")[2])
+    
+    def exec_module(self, module):
+        # Bereits vom flachen Import ausgeführt
+        pass
+
+
+if not any(isinstance(finder, _FlatModuleAlias) for finder in sys.meta_path):
+    sys.meta_path.insert(0, _FlatModuleAlias())
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Tuya Cloud Client - asyncio Variante
+Gleiche Methoden und Rückgabeformate wie TuyaCloudClient, aber mit aiohttp
+
+Benötigt: pip install aiohttp
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import aiohttp
+
+import json_codec
+from client import TuyaClientBase
+from config_loader import TuyaConfig
+from rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class _AsyncCall:
+    """Laufender Aufruf einer AsyncSingleFlight Gruppe"""
+    
+    __slots__ = ("task", "waiters")
+    
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    asyncio Single-Flight Gruppe (nur innerhalb eines Event Loops)
+    
+    fn läuft als eigener Task, auf den alle Aufrufer (auch der erste)
+    per shield warten. Bricht ein Aufrufer ab (z.B. wait_for Timeout),
+    laufen Request und die übrigen Aufrufer weiter; erst wenn niemand
+    mehr wartet, wird der Task abgebrochen.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, _AsyncCall] = {}
+    
+    async def do(self, key: Hashable,
+                 fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Führt fn aus oder wartet auf den laufenden Aufruf mit gleichem key
+        
+        Zurückgegeben: (result, shared)
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = self._calls[key] = _AsyncCall(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _task: self._forget(key, call))
+        
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Niemand wartet mehr: neue Aufrufer starten frisch
+                self._forget(key, call)
+                call.task.cancel()
+    
+    def _forget(self, key: Hashable, call: _AsyncCall) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+    
+    def in_flight(self) -> int:
+        """Anzahl gerade laufender Aufrufe"""
+        return len(self._calls)
+
+
+class AsyncTuyaCloudClient(TuyaClientBase):
+    """
+    asyncio Tuya Cloud Client
+    
+    Signatur, Token-Cache und Response-Parsing kommen aus TuyaClientBase,
+    dadurch liefern alle Methoden dieselben Dicts wie TuyaCloudClient.
+    
+    Verwendung:
+        async with AsyncTuyaCloudClient("config.yaml") as client:
+            props = await client.get_device_properties(device_id)
+    """
+    
+    # Max. gleichzeitige Requests (überschreibbar über http.max_concurrency)
+    DEFAULT_MAX_CONCURRENCY = 50
+    
+    def __init__(self, config_file: str = "config.yaml",
+                 max_concurrency: Optional[int] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 config: Optional[TuyaConfig] = None):
+        """Initialisiert Client mit Config"""
+        super().__init__(config_file, rate_limiter, config)
+        
+        http_config = self.config.get('http', {}) or {}
+        self.max_concurrency = int(
+            max_concurrency
+            or http_config.get('max_concurrency', self.DEFAULT_MAX_CONCURRENCY)
+        )
+        
+        # Wird im laufenden Event Loop erstellt (siehe _get_session)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._token_lock: Optional[asyncio.Lock] = None
+        
+        # Gleichzeitige identische GETs teilen sich einen Request
+        self._inflight = AsyncSingleFlight()
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Liefert die ClientSession (wird beim ersten Request erstellt)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                force_close=not self.keep_alive,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self.timeout[0],
+                    sock_read=self.timeout[1],
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._token_lock = asyncio.Lock()
+        return self._session
+    
+    async def close(self) -> None:
+        """Schließt die Session und alle offenen Verbindungen"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self) -> "AsyncTuyaCloudClient":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def _request(self,
+                       method: str,
+                       path: str,
+                       body: Optional[Dict] = None,
+                       access_token: Optional[str] = None,
+                       deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Macht HTTP Request mit Signature
+        
+        Höchstens max_concurrency Requests laufen gleichzeitig, weitere
+        warten auf einen freien Slot. Retry, Token-Erneuerung, Circuit
+        Breaker und Single-Flight wie TuyaCloudClient._request.
+        """
+        if method not in ("GET", "POST"):
+            return {"success": False, "msg": f"Unsupported method: {method}"}
+        
+        if self._coalesce(method, path):
+            result, _ = await self._inflight.do(
+                (method, path),
+                lambda: self._request_with_retry(method, path, body, access_token, deadline)
+            )
+        else:
+            result = await self._request_with_retry(method, path, body, access_token, deadline)
+        return self._with_last_known(method, path, result)
+    
+    async def _request_with_retry(self,
+                                  method: str,
+                                  path: str,
+                                  body: Optional[Dict],
+                                  access_token: Optional[str],
+                                  deadline: Optional[float]) -> Dict[str, Any]:
+        """Retry-Schleife für _request"""
+        policy = self.retry_policy
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + (policy.deadline if deadline is None else deadline)
+        body_bytes = json_codec.dumps_bytes(body) if body else b""
+        token_refreshed = False
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            result, transient = await self._send(method, path, body_bytes, access_token, deadline_at)
+            
+            if access_token and not token_refreshed and policy.is_token_error(result):
+                token_refreshed = True
+                logger.info("Token ungültig - erneuere Token und wiederhole Request")
+                new_token = await self._refresh_token(access_token)
+                if new_token:
+                    access_token = new_token
+                    attempt -= 1
+                    continue
+                return result
+            
+            if not (transient or policy.is_retryable(result)) or attempt >= policy.max_attempts:
+                return result
+            
+            delay = policy.backoff(attempt)
+            if loop.time() + delay >= deadline_at:
+                return result
+            
+            logger.warning(f"Retry {attempt}/{policy.max_attempts - 1} für {method} {path} "
+                           f"in {delay:.2f}s: {result.get('msg')}")
+            await asyncio.sleep(delay)
+    
+    async def _send(self,
+                    method: str,
+                    path: str,
+                    body_bytes: bytes,
+                    access_token: Optional[str],
+                    deadline_at: float) -> Tuple[Dict[str, Any], bool]:
+        """
+        Ein einzelner HTTP Versuch
+        
+        Zurückgegeben: (result, transient)
+        """
+        session = self._get_session()
+        url = self.base_url + path
+        loop = asyncio.get_running_loop()
+        
+        # Bei offenem Circuit sofort abbrechen (kein Warten auf Timeouts)
+        if not self.circuit_breaker.allow_request():
+            return self._circuit_open_result(), False
+        
+        try:
+            # Rate Limit vor dem Semaphore, damit Wartende keine Slots belegen;
+            # nie über die Deadline hinaus warten
+            remaining = deadline_at - loop.time()
+            if remaining <= 0 or await self.rate_limiter.acquire_async(
+                    self.region, method, path, max_wait=remaining) is None:
+                self.circuit_breaker.release()
+                if self.rate_limiter.quota_exhausted(self.region, method, path):
+                    return {"success": False, "msg": "Daily quota exceeded"}, False
+                return {"success": False, "msg": "Deadline exceeded"}, False
+            
+            async with self._semaphore:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    self.circuit_breaker.release()
+                    return {"success": False, "msg": "Deadline exceeded"}, False
+                
+                result, transient = await self._send_once(
+                    session, method, url, path, body_bytes, access_token, remaining
+                )
+        except asyncio.CancelledError:
+            self.circuit_breaker.release()
+            raise
+        
+        self._record_outcome(result, transient)
+        return result, transient
+    
+    async def _send_once(self,
+                         session: aiohttp.ClientSession,
+                         method: str,
+                         url: str,
+                         path: str,
+                         body_bytes: bytes,
+                         access_token: Optional[str],
+                         remaining: float) -> Tuple[Dict[str, Any], bool]:
+        """HTTP Request ohne Retry/Breaker. Zurückgegeben: (result, transient)"""
+        # Erst im Slot signieren, damit der Timestamp beim Senden aktuell ist
+        signature, timestamp = self._generate_signature(
+            method, path, body_bytes, access_token
+        )
+        headers = self._build_headers(signature, timestamp, access_token)
+        
+        logger.debug("%s %s", method, path)
+        
+        try:
+            async with session.request(method, url, headers=headers,
+                                       data=body_bytes or None,
+                                       timeout=aiohttp.ClientTimeout(total=remaining)) as resp:
+                logger.debug("Status: %s", resp.status)
+                if resp.status >= 500:
+                    logger.error(f"Request Error: HTTP {resp.status}")
+                    return {"success": False, "msg": f"HTTP {resp.status}"}, True
+                
+                result = json_codec.loads(await resp.read())
+                logger.debug("Response: %s", result)
+                return result, False
+        
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            logger.error(f"Request Error: {e!r}")
+            return {"success": False, "msg": str(e) or type(e).__name__}, True
+        
+        except Exception as e:
+            logger.error(f"Request Error: {e}")
+            return {"success": False, "msg": str(e)}, False
+    
+    async def get_token(self, force_refresh: bool = False) -> Optional[str]:
+        """
+        Liefert Access Token aus dem Cache oder holt einen neuen
+        
+        API: GET /v1.0/token?grant_type=1
+        """
+        if not force_refresh:
+            token = self._cached_token()
+            if token:
+                return token
+        
+        self._get_session()
+        async with self._token_lock:
+            if not force_refresh:
+                token = self._cached_token()
+                if token:
+                    return token
+            return await self._fetch_token()
+    
+    def invalidate_token(self) -> None:
+        """Verwirft den gecachten Token (z.B. nach 'token invalid')"""
+        self._token = None
+        self._token_expires_at = 0.0
+    
+    async def _refresh_token(self, stale_token: str) -> Optional[str]:
+        """Ersetzt einen vom Server abgelehnten Token (einmal für alle Wartenden)"""
+        self._get_session()
+        async with self._token_lock:
+            token = self._cached_token()
+            if token and token != stale_token:
+                return token
+            return await self._fetch_token()
+    
+    async def _fetch_token(self) -> Optional[str]:
+        """Holt neuen Token vom Server (Aufrufer hält _token_lock)"""
+        logger.info("Hole Access Token...")
+        result = await self._request("GET", "/v1.0/token?grant_type=1")
+        return self._token_from_result(result)
+    
+    async def _resolve_token(self, token: Optional[str]) -> Optional[str]:
+        """Verwendet übergebenen Token oder den gecachten Client-Token"""
+        return token or await self.get_token()
+    
+    async def get_device_status(self, device_id: str,
+                                token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Holt Device Status
+        
+        API: GET /v2.0/cloud/thing/batch?device_ids={id}
+        """
+        path = f"/v2.0/cloud/thing/batch?device_ids={device_id}"
+        result = await self._request("GET", path, access_token=await self._resolve_token(token))
+        return self._parse_status(result)
+    
+    async def get_devices_status(self, device_ids: Iterable[str],
+                                 token: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Holt Status beliebig vieler Geräte
+        
+        API: GET /v2.0/cloud/thing/batch?device_ids={id1},{id2},...
+        
+        Returns:
+            Dict device_id -> Status (wie get_device_status)
+        """
+        paths = self._status_batch_paths(device_ids)
+        if not paths:
+            return {}
+        
+        token = await self._resolve_token(token)
+        results = await asyncio.gather(*(
+            self._request("GET", path, access_token=token) for path in paths
+        ))
+        
+        statuses: Dict[str, Dict[str, Any]] = {}
+        for result in results:
+            statuses.update(self._parse_status_batch(result))
+        return statuses
+    
+    async def get_device_properties(self, device_id: str,
+                                    token: Optional[str] = None,
+                                    max_staleness: Optional[float] = None,
+                                    allow_stale: bool = True) -> Dict[str, Any]:
+        """
+        Holt alle Device Properties mit aktuellen Werten
+        
+        API: GET /v2.0/cloud/thing/{device_id}/shadow/properties
+        
+        Args:
+            max_staleness: Max. Alter gecachter Werte in Sekunden
+                           (None = cache.ttl, 0 = immer aus der Cloud)
+            allow_stale: wie TuyaCloudClient.get_device_properties
+        """
+        cached = self.property_cache.get(device_id, max_staleness)
+        if cached is not None:
+            return cached
+        
+        return await self._cloud_properties(device_id, token, allow_stale)
+    
+    async def _cloud_properties(self, device_id: str, token: Optional[str] = None,
+                                allow_stale: bool = True) -> Dict[str, Any]:
+        """Properties aus der Cloud, lädt auch das Schema neu"""
+        path = f"/v2.0/cloud/thing/{device_id}/shadow/properties"
+        result = await self._request("GET", path, access_token=await self._resolve_token(token))
+        return self._properties_from_result(device_id, result, allow_stale)
+    
+    async def get_many_device_properties(self, device_ids: Iterable[str],
+                                         token: Optional[str] = None,
+                                         max_staleness: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Holt Properties mehrerer Geräte gleichzeitig
+        
+        Returns:
+            Dict device_id -> Properties (wie get_device_properties)
+        """
+        device_ids = list(device_ids)
+        token = await self._resolve_token(token)
+        results = await asyncio.gather(*(
+            self.get_device_properties(device_id, token, max_staleness) for device_id in device_ids
+        ))
+        return dict(zip(device_ids, results))
+    
+    async def get_property_changes(self, device_id: str, since: int = 0,
+                                   token: Optional[str] = None,
+                                   max_staleness: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Liefert nur Properties, die sich seit Version since geändert haben
+        
+        Returns:
+            {"version": int, "changes": {code: prop}, "removed": [code], "full": bool}
+        """
+        await self.get_device_properties(device_id, token, max_staleness)
+        return self.shadow_tracker.changes(device_id, since)
+    
+    async def get_device_property_value(self, device_id: str, token: Optional[str],
+                                        property_code: str,
+                                        max_staleness: Optional[float] = None) -> Any:
+        """
+        Holt einen einzelnen Property-Wert
+        
+        Returns:
+            Property-Wert oder None
+        """
+        properties = await self.get_device_properties(device_id, token, max_staleness)
+        if property_code in properties:
+            return properties[property_code].get("value")
+        
+        logger.warning(f"Property '{property_code}' nicht gefunden")
+        return None
+    
+    async def set_device_property(self, device_id: str, token: Optional[str],
+                                  property_code: str, value: Any) -> bool:
+        """
+        Setzt Device Property über Command API
+        
+        API: POST /v1.0/iot-03/devices/{device_id}/commands
+        """
+        return await self.set_device_properties(device_id, token, {property_code: value})
+    
+    async def set_device_properties(self, device_id: str, token: Optional[str],
+                                    properties: Dict[str, Any]) -> bool:
+        """
+        Setzt mehrere Device Properties mit einem Request
+        
+        API: POST /v1.0/iot-03/devices/{device_id}/commands
+        """
+        return await self.send_device_properties(device_id, token, properties) is None
+    
+    async def send_device_properties(self, device_id: str, token: Optional[str],
+                                     properties: Dict[str, Any]) -> Optional[str]:
+        """
+        Wie set_device_properties, aber mit Begründung bei Ablehnung
+        
+        Zurückgegeben: Fehlermeldung (Validierung oder Cloud) oder None
+        """
+        if not properties:
+            return None
+        
+        token = await self._resolve_token(token)
+        
+        # Validiere gegen gecachtes Schema (GET nur wenn Cache leer/abgelaufen)
+        error = await self._validate_commands(device_id, token, properties)
+        if error:
+            logger.error(error)
+            return error
+        
+        path = f"/v1.0/iot-03/devices/{device_id}/commands"
+        body = self._commands_body(properties)
+        
+        result = await self._request("POST", path, body, access_token=token)
+        
+        if result.get("success"):
+            self._apply_property_values(device_id, properties)
+            for code, value in properties.items():
+                logger.info(f"✓ Property '{code}' gesetzt auf {value}")
+            return None
+        else:
+            if self._is_unknown_code_error(result):
+                self.invalidate_schema(device_id)
+            logger.error(f"Property Error: {result.get('msg')}")
+            return result.get("msg") or "Command rejected"
+    
+    async def _validate_commands(self, device_id: str, token: Optional[str],
+                                 commands: Dict[str, Any]) -> Optional[str]:
+        """
+        Validiert Commands gegen das Property Schema des Geräts
+        
+        Zurückgegeben: Fehlermeldung oder None
+        """
+        schema = self._cached_schema(device_id)
+        if schema is not None:
+            if all(code in schema for code in commands):
+                return self._check_commands(schema, commands)
+        
+        # Wie TuyaCloudClient: Schema immer aus der Cloud neu laden
+        await self._cloud_properties(device_id, token)
+        schema = self._cached_schema(device_id)
+        if schema is None:
+            return f"Properties für {device_id} nicht verfügbar"
+        return self._check_commands(schema, commands)
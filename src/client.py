@@ -5,70 +5,218 @@ Offizielle API: https://developer.tuya.com/en/docs/iot/new-singnature?id=Kbw0q34
 """
 
 import sys
-# Fix für PyInstaller: stdout kann None sein
-try:
-    if sys.stdout and sys.stdout.encoding != 'utf-8':
-        sys.stdout.reconfigure(encoding='utf-8')
-except (AttributeError, RuntimeError):
-    pass
-
 import logging
-import yaml
-import json
 import time
 import hmac
 import hashlib
-import requests
-from typing import Dict, List, Any, Optional
+import threading
+from typing import TYPE_CHECKING, Dict, List, Any, Iterable, Optional, Tuple, Union
+
+import json_codec
+from rate_limit import RateLimiter
+from resilience import CIRCUIT_OPEN, CircuitBreaker, RetryPolicy
+from singleflight import SingleFlight
+from property_cache import PropertyCache, ShadowTracker
+from models import DeviceSchema, PropertyValue
+from config_loader import TuyaConfig, load_config
+
+if TYPE_CHECKING:
+    # requests wird erst bei Bedarf importiert (schneller Start)
+    import requests
+    from local_transport import LocalTransport
 
 logger = logging.getLogger(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 
+def configure_stdout() -> None:
+    """Fix für PyInstaller / Windows Konsolen: stdout auf UTF-8 umstellen"""
+    try:
+        if sys.stdout and sys.stdout.encoding != 'utf-8':
+            sys.stdout.reconfigure(encoding='utf-8')
+    except (AttributeError, RuntimeError):
+        pass
 
-class TuyaCloudClient:
-    """Tuya Cloud Client mit offiziellem Authentication"""
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """
+    Globales Logging für Skripte und Server konfigurieren
     
-    def __init__(self, config_file: str = "config.yaml"):
-        """Initialisiert Client mit Config"""
-        self.config = self._load_config(config_file)
+    Wird nur von Einstiegspunkten (__main__, CLI, GUI, REST API) aufgerufen,
+    nie beim Import.
+    """
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+
+# SHA256 des leeren Bodys (GET Requests)
+EMPTY_BODY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class SigningContext:
+    """
+    Vorberechneter Signatur-Kontext für ein Credential-Paar
+    
+    Der mit access_key initialisierte HMAC wird einmal gebaut und pro
+    Request nur kopiert.
+    """
+    
+    __slots__ = ("access_id", "access_key", "_hmac")
+    
+    def __init__(self, access_id: Optional[str], access_key: Optional[str]):
+        self.access_id = access_id
+        self.access_key = access_key
+        self._hmac = hmac.new((access_key or "").encode('utf-8'), digestmod=hashlib.sha256)
+    
+    def sign(self,
+             method: str,
+             path: str,
+             body: Optional[Union[str, bytes]] = None,
+             access_token: Optional[str] = None,
+             timestamp: Optional[int] = None) -> Tuple[str, str]:
+        """
+        Signiert einen Request (neue Signatur-Methode)
+        
+        stringToSign = client_id + [access_token +] t +
+                       HTTPMethod + "\n" + Content-SHA256 + "\n" +
+                       Headers + "\n" + Path
+        
+        Zurückgegeben: (signature, timestamp)
+        """
+        t = str(int(time.time() * 1000) if timestamp is None else timestamp)
+        
+        if body:
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            content_sha256 = hashlib.sha256(body).hexdigest()
+        else:
+            content_sha256 = EMPTY_BODY_SHA256
+        
+        payload = f"{self.access_id or ''}{access_token or ''}{t}{method}\n{content_sha256}\n\n{path}"
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Payload to sign:\n%s", payload)
+        
+        # HMAC-SHA256
+        mac = self._hmac.copy()
+        mac.update(payload.encode('utf-8'))
+        return mac.hexdigest().upper(), t
+
+
+class TuyaClientBase:
+    """
+    Gemeinsame Basis für synchronen und asynchronen Client
+    
+    Enthält Config, Credentials, Signatur und Response-Parsing, aber
+    keinen HTTP Transport.
+    """
+    
+    # Token wird so viele Sekunden vor Ablauf erneuert
+    TOKEN_REFRESH_MARGIN = 60
+    # Fallback, falls die Token-Response kein expire_time liefert
+    DEFAULT_TOKEN_TTL = 7200
+    
+    # HTTP Defaults (überschreibbar über 'http' Abschnitt in config.yaml)
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_CONNECT_TIMEOUT = 5.0
+    DEFAULT_READ_TIMEOUT = 10.0
+    
+    # Max. device_ids pro GET /v2.0/cloud/thing/batch
+    BATCH_STATUS_MAX_IDS = 20
+    
+    # Property Schema Cache (überschreibbar über cache.schema_ttl)
+    DEFAULT_SCHEMA_TTL = 3600
+    # Tuya Fehlercodes für unbekannte Commands ("command or value not support")
+    UNKNOWN_CODE_ERRORS = {2008}
+    
+    def __init__(self, config_file: str = "config.yaml",
+                 rate_limiter: Optional[RateLimiter] = None,
+                 config: Optional[TuyaConfig] = None):
+        """
+        Initialisiert Client mit Config
+        
+        Args:
+            config_file: Pfad zur config.yaml
+            rate_limiter: Gemeinsamer RateLimiter (sonst aus 'rate_limit' Config)
+            config: Bereits geladene Config (config_file wird dann ignoriert)
+        """
+        self.config = config if config is not None else self._load_config(config_file)
         
         # Credentials
-        self.access_id = self.config.get('cloud', {}).get('access_id')
-        self.access_key = self.config.get('cloud', {}).get('access_key')
-        self.region = self.config.get('cloud', {}).get('region', 'eu')
-        self.base_url = f"https://openapi.tuya{self.region}.com"
+        self.access_id = self.config.cloud.access_id
+        self.access_key = self.config.cloud.access_key
+        self.region = self.config.cloud.region
+        self.base_url = self.config.cloud.base_url or f"https://openapi.tuya{self.region}.com"
         
         # Device list
-        self.devices = {}
-        for device in self.config.get('devices', []):
-            device_id = device.get('device_id')
-            self.devices[device_id] = device
+        self.devices = {device.device_id: device.raw for device in self.config.devices}
+        
+        # HTTP Einstellungen
+        http_config = self.config.get('http', {}) or {}
+        self.pool_size = int(http_config.get('pool_size', self.DEFAULT_POOL_SIZE))
+        self.keep_alive = bool(http_config.get('keep_alive', True))
+        self.timeout = (
+            float(http_config.get('connect_timeout', self.DEFAULT_CONNECT_TIMEOUT)),
+            float(http_config.get('read_timeout', self.DEFAULT_READ_TIMEOUT)),
+        )
+        
+        # Token Cache (siehe get_token)
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        
+        # Rate Limits für ausgehende Requests
+        self.rate_limiter = rate_limiter or RateLimiter(self.config.get('rate_limit'))
+        
+        # Retry mit Backoff (siehe _request)
+        self.retry_policy = RetryPolicy.from_config(self.config.get('retry'))
+        
+        # Circuit Breaker + letzte erfolgreiche GET Antworten (siehe _with_last_known)
+        self.circuit_breaker = CircuitBreaker.from_config(self.config.get('circuit_breaker'))
+        self._last_good: Dict[str, Dict[str, Any]] = {}
+        
+        # Signatur (siehe _signing_context)
+        self._signer: Optional[SigningContext] = None
+        
+        # Property Schema Cache: device_id -> (Zeitpunkt, DeviceSchema)
+        cache_config = self.config.get('cache', {}) or {}
+        self.schema_ttl = float(cache_config.get('schema_ttl', self.DEFAULT_SCHEMA_TTL))
+        self._schemas: Dict[str, Tuple[float, DeviceSchema]] = {}
+        
+        # Property Cache mit TTL/LRU (siehe get_device_properties)
+        self.property_cache = PropertyCache.from_config(cache_config)
+        
+        # Versionierte Änderungen pro Gerät (siehe get_property_changes)
+        self.shadow_tracker = ShadowTracker()
         
         logger.info(f"Tuya Client initialisiert - Region: {self.region}")
         logger.info(f"Geräte: {len(self.devices)}")
     
-    def _load_config(self, path: str) -> Dict:
-        """Lädt YAML Config"""
+    def _load_config(self, path: str) -> TuyaConfig:
+        """Lädt Config über den gemeinsamen Loader (leer bei Fehlern)"""
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f) or {}
+            return load_config(path)
         except Exception as e:
             logger.error(f"Config Error: {e}")
-            return {}
+            return TuyaConfig()
     
     def _sha256(self, data: str) -> str:
         """SHA256 Hash"""
         return hashlib.sha256(data.encode('utf-8')).hexdigest()
     
+    def _signing_context(self) -> "SigningContext":
+        """SigningContext für die aktuellen Credentials (wird wiederverwendet)"""
+        context = self._signer
+        if (context is None
+                or context.access_id != self.access_id
+                or context.access_key != self.access_key):
+            context = self._signer = SigningContext(self.access_id, self.access_key)
+        return context
+    
     def _generate_signature(self,
                            method: str,
                            path: str,
-                           body: Optional[str] = None,
+                           body: Optional[Union[str, bytes]] = None,
                            access_token: Optional[str] = None) -> tuple:
         """
         Generiert Signature nach Tuya Docs
@@ -77,174 +225,687 @@ class TuyaCloudClient:
         
         Zurückgegeben: (signature, timestamp)
         """
-        timestamp = int(time.time() * 1000)
+        return self._signing_context().sign(method, path, body, access_token)
+    
+    def _build_headers(self,
+                       signature: str,
+                       timestamp: str,
+                       access_token: Optional[str] = None) -> Dict[str, str]:
+        """Baut die signierten Request Headers"""
+        headers = {
+            "sign_method": "HMAC-SHA256",
+            "client_id": self.access_id,
+            "t": timestamp,
+            "sign": signature,
+            "Content-Type": "application/json",
+        }
         
-        # Basis Payload: client_id + [access_token +] timestamp
         if access_token:
-            payload = self.access_id + access_token + str(timestamp)
+            headers["access_token"] = access_token
+        
+        return headers
+    
+    def _record_outcome(self, result: Dict[str, Any], transient: bool) -> None:
+        """Meldet das Ergebnis eines Versuchs an den Circuit Breaker"""
+        if transient or result.get("code") in self.retry_policy.RETRYABLE_CODES:
+            self.circuit_breaker.record_failure()
         else:
-            payload = self.access_id + str(timestamp)
+            self.circuit_breaker.record_success()
+    
+    def _with_last_known(self, method: str, path: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Merkt sich erfolgreiche GET Antworten und liefert sie bei offenem
+        Circuit Breaker (markiert mit "stale": True) statt eines Fehlers
+        """
+        if method != "GET" or path.startswith("/v1.0/token"):
+            return result
+        
+        if result.get("success"):
+            self._last_good[path] = result
+        elif result.get("code") == CIRCUIT_OPEN and path in self._last_good:
+            logger.warning(f"Circuit offen - liefere letzte bekannte Daten für {path}")
+            return {**self._last_good[path], "stale": True}
+        return result
+    
+    @staticmethod
+    def _coalesce(method: str, path: str) -> bool:
+        """True für Lese-Requests, die zusammengefasst werden dürfen"""
+        # Token-Requests sind bereits über den Token-Lock serialisiert
+        return method == "GET" and not path.startswith("/v1.0/token")
+    
+    @staticmethod
+    def _circuit_open_result() -> Dict[str, Any]:
+        return {"success": False, "code": CIRCUIT_OPEN, "msg": "Tuya Cloud nicht erreichbar (Circuit offen)"}
+    
+    def _token_from_result(self, result: Dict[str, Any]) -> Optional[str]:
+        """
+        Übernimmt Token aus einer /v1.0/token Response in den Cache
         
-        # Neue Signatur-Methode (new_sign_algorithm=True):
-        # Berechne Content-SHA256
-        content_sha256 = self._sha256(body) if body else self._sha256("")
+        Zurückgegeben: Token oder None
+        """
+        # Token ist in result['result']['access_token']
+        if result.get("success") and "result" in result:
+            token = result["result"].get("access_token")
+            if token:
+                expire_time = result["result"].get("expire_time") or self.DEFAULT_TOKEN_TTL
+                ttl = max(int(expire_time) - self.TOKEN_REFRESH_MARGIN, 0)
+                self._token = token
+                self._token_expires_at = time.monotonic() + ttl
+                logger.info(f"✓ Token erhalten: {token[:20]}... (gültig {expire_time}s)")
+                return token
         
-        # Vollständige stringToSign:
-        # HTTPMethod + "\n" +
-        # Content-SHA256 + "\n" +
-        # Headers + "\n" +
-        # Path
-        string_to_sign = f"{method}\n{content_sha256}\n\n{path}"
+        logger.error(f"✗ Token Error: {result.get('msg')}")
+        return None
+    
+    def _cached_token(self) -> Optional[str]:
+        """Gecachter Token, falls noch gültig"""
+        token = self._token
+        if token and time.monotonic() < self._token_expires_at:
+            return token
+        return None
+    
+    @staticmethod
+    def _parse_status(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Erstes Gerät aus einer /v2.0/cloud/thing/batch Response"""
+        if result.get("success"):
+            devices = result.get("result", [])
+            if devices:
+                return devices[0]
         
-        # Gesamter zu signierter String
-        payload += string_to_sign
+        logger.error(f"Status Error: {result.get('msg')}")
+        return {}
+    
+    @staticmethod
+    def _parse_status_batch(result: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Alle Geräte aus einer /v2.0/cloud/thing/batch Response nach ID"""
+        if result.get("success"):
+            return {
+                device.get("id"): device
+                for device in result.get("result", []) or []
+            }
         
-        logger.debug(f"Payload to sign:\n{payload}")
+        logger.error(f"Status Error: {result.get('msg')}")
+        return {}
+    
+    def _status_batch_paths(self, device_ids: Iterable[str]) -> List[str]:
+        """Teilt device_ids in Batch-Pfade mit max. BATCH_STATUS_MAX_IDS IDs"""
+        ids = list(dict.fromkeys(device_ids))
+        size = self.BATCH_STATUS_MAX_IDS
+        return [
+            "/v2.0/cloud/thing/batch?device_ids=" + ",".join(ids[i:i + size])
+            for i in range(0, len(ids), size)
+        ]
+    
+    def _parse_properties(self, device_id: str, result: Dict[str, Any]) -> Dict[str, PropertyValue]:
+        """
+        Strukturiert eine shadow/properties Response nach Property Code
         
-        # HMAC-SHA256
-        signature = hmac.new(
-            self.access_key.encode('utf-8'),
-            payload.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest().upper()
+        Das statische Schema des Geräts wird wiederverwendet; pro Abfrage
+        entstehen nur neue PropertyValue Objekte (Wert + Zeitstempel).
+        """
+        if result.get("success") and "result" in result:
+            raw_properties = result["result"].get("properties", []) or []
+            if not raw_properties:
+                return {}
+            
+            entry = self._schemas.get(device_id)
+            schema = DeviceSchema.merge(entry[1] if entry else None, raw_properties)
+            self._schemas[device_id] = (time.monotonic(), schema)
+            
+            return {
+                raw.get("code"): PropertyValue(schema[raw.get("code")], raw.get("value"), raw.get("time"))
+                for raw in raw_properties
+            }
+        
+        logger.error(f"Properties Error: {result.get('msg')}")
+        return {}
+    
+    def _properties_from_result(self, device_id: str, result: Dict[str, Any],
+                                allow_stale: bool = True) -> Dict[str, PropertyValue]:
+        """
+        Parst shadow/properties Response und aktualisiert Schema und Cache
+        
+        allow_stale=False: letzte bekannte Daten bei offenem Circuit
+        Breaker ("stale") ergeben {} statt veralteter Werte
+        """
+        if result.get("stale") and not allow_stale:
+            logger.warning(f"Properties {device_id}: Circuit offen, nur veraltete Daten")
+            return {}
+        properties = self._parse_properties(device_id, result)
+        # Veraltete Daten vom Circuit Breaker nicht als frisch cachen
+        if properties and not result.get("stale"):
+            self.property_cache.put(device_id, properties)
+            self.shadow_tracker.observe(device_id, properties)
+        return properties
+    
+    def _apply_property_values(self, device_id: str, values: Dict[str, Any]) -> None:
+        """Übernimmt bestätigte Werte in Cache und Änderungsverfolgung (Write-Through)"""
+        self.property_cache.update(device_id, values)
+        self.shadow_tracker.update_values(device_id, values)
+    
+    def apply_status_report(self, device_id: str, status: Iterable[Dict[str, Any]]) -> int:
+        """
+        Übernimmt eine Push-Meldung (z.B. aus message_queue) in den Client-State
+        
+        Args:
+            device_id: Device ID
+            status: Liste [{"code": ..., "value": ..., "t": ms}, ...]
+        
+        Returns:
+            Aktuelle Shadow-Version des Geräts
+        """
+        values: Dict[str, Any] = {}
+        latest = 0
+        for item in status:
+            code = item.get("code")
+            if code is None:
+                continue
+            values[code] = item.get("value")
+            t = int(item.get("t") or 0)
+            # Manche Meldungen liefern Sekunden statt Millisekunden
+            latest = max(latest, t * 1000 if 0 < t < 10**12 else t)
+        
+        if not values:
+            return self.shadow_tracker.version(device_id)
+        time_ms = latest or None
+        self.property_cache.update(device_id, values, time_ms, refresh=True)
+        return self.shadow_tracker.update_values(device_id, values, time_ms)
+    
+    def _cached_schema(self, device_id: str) -> Optional[DeviceSchema]:
+        """Gecachtes Schema, falls jünger als schema_ttl"""
+        entry = self._schemas.get(device_id)
+        if entry and time.monotonic() - entry[0] < self.schema_ttl:
+            return entry[1]
+        return None
+    
+    def invalidate_schema(self, device_id: Optional[str] = None) -> None:
+        """Verwirft das gecachte Schema eines Geräts (oder aller Geräte)"""
+        if device_id is None:
+            self._schemas.clear()
+        else:
+            self._schemas.pop(device_id, None)
+    
+    @staticmethod
+    def _check_commands(schema: DeviceSchema, commands: Dict[str, Any]) -> Optional[str]:
+        """
+        Prüft Commands gegen das Schema (ohne I/O)
+        
+        Zurückgegeben: Fehlermeldung oder None
+        """
+        for code, value in commands.items():
+            if code not in schema:
+                return f"Property '{code}' nicht gefunden"
+            
+            prop_type = schema[code].type
+            if prop_type == "bool" and not isinstance(value, bool):
+                return f"Property '{code}' erwartet bool, nicht {type(value).__name__}"
+            if prop_type == "value" and (isinstance(value, bool)
+                                         or not isinstance(value, (int, float))):
+                return f"Property '{code}' erwartet Zahl, nicht {type(value).__name__}"
+        return None
+    
+    def _is_unknown_code_error(self, result: Dict[str, Any]) -> bool:
+        """True wenn die Command API den Code nicht (mehr) kennt"""
+        return result.get("code") in self.UNKNOWN_CODE_ERRORS
+    
+    @staticmethod
+    def _commands_body(commands: Dict[str, Any]) -> Dict[str, Any]:
+        """Body für POST /v1.0/iot-03/devices/{id}/commands"""
+        return {
+            "commands": [
+                {"code": code, "value": value}
+                for code, value in commands.items()
+            ]
+        }
+
+
+class TuyaCloudClient(TuyaClientBase):
+    """Tuya Cloud Client mit offiziellem Authentication"""
+    
+    def __init__(self, config_file: str = "config.yaml",
+                 rate_limiter: Optional[RateLimiter] = None,
+                 config: Optional[TuyaConfig] = None):
+        """Initialisiert Client mit Config"""
+        super().__init__(config_file, rate_limiter, config)
         
-        return signature, str(timestamp)
+        # HTTP Session (Keep-Alive + Connection Pool)
+        self._session: Optional["requests.Session"] = None
+        self._session_lock = threading.Lock()
+        
+        self._token_lock = threading.Lock()
+        
+        # Gleichzeitige identische GETs teilen sich einen Request
+        self._inflight = SingleFlight()
+        
+        # Optional: Geräte im LAN direkt ansprechen (Cloud als Fallback)
+        self.local: Optional["LocalTransport"] = None
+        if (self.config.get('local', {}) or {}).get('enabled'):
+            from local_transport import LocalTransport
+            self.local = LocalTransport.from_config(self)
+    
+    def _get_session(self) -> "requests.Session":
+        """
+        Liefert die persistente HTTP Session (wird beim ersten Request erstellt)
+        
+        Der Pool ist so groß wie die Anzahl gleichzeitiger Flask-Threads,
+        damit TCP/TLS-Verbindungen wiederverwendet statt neu aufgebaut werden.
+        """
+        session = self._session
+        if session is not None:
+            return session
+        
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.pool_size,
+                    pool_block=False,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["Connection"] = "keep-alive" if self.keep_alive else "close"
+                self._session = session
+            return self._session
+    
+    def close(self) -> None:
+        """Schließt die HTTP Session und alle offenen Verbindungen"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+        if self.local is not None:
+            self.local.close()
+    
+    def __enter__(self) -> "TuyaCloudClient":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
     
     def _request(self,
                 method: str,
                 path: str,
                 body: Optional[Dict] = None,
-                access_token: Optional[str] = None) -> Dict[str, Any]:
+                access_token: Optional[str] = None,
+                deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         Macht HTTP Request mit Signature (wie tinytuya)
+        
+        Vorübergehende Fehler (Netzwerk, HTTP 5xx, wiederholbare Tuya
+        Codes) werden laut retry_policy mit Backoff wiederholt. Bei
+        abgelaufenem Token wird er erneuert und der Request einmal
+        wiederholt. Kein Versuch läuft über die Deadline hinaus.
+        
+        Args:
+            deadline: Gesamtzeit in Sekunden (Default: retry.deadline)
+        
+        Ist der Circuit Breaker offen, wird sofort abgebrochen (GETs
+        liefern dann die letzte bekannte Antwort, falls vorhanden).
+        
+        Gleichzeitige identische GETs (gleiche Methode und gleicher Pfad,
+        der Pfad enthält die Device ID) werden zu einem Request
+        zusammengefasst; alle Aufrufer erhalten dieselbe Antwort.
         """
-        url = self.base_url + path
-        body_str = json.dumps(body, separators=(',', ':')) if body else ""
+        if method not in ("GET", "POST"):
+            return {"success": False, "msg": f"Unsupported method: {method}"}
+        
+        if self._coalesce(method, path):
+            result, shared = self._inflight.do(
+                (method, path),
+                lambda: self._request_with_retry(method, path, body, access_token, deadline)
+            )
+            if shared:
+                logger.debug("Single-Flight: %s %s geteilt", method, path)
+        else:
+            result = self._request_with_retry(method, path, body, access_token, deadline)
+        return self._with_last_known(method, path, result)
+    
+    def _request_with_retry(self,
+                            method: str,
+                            path: str,
+                            body: Optional[Dict],
+                            access_token: Optional[str],
+                            deadline: Optional[float]) -> Dict[str, Any]:
+        """Retry-Schleife für _request"""
+        policy = self.retry_policy
+        deadline_at = time.monotonic() + (policy.deadline if deadline is None else deadline)
+        body_bytes = json_codec.dumps_bytes(body) if body else b""
+        token_refreshed = False
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            result, transient = self._send(method, path, body_bytes, access_token, deadline_at)
+            
+            if access_token and not token_refreshed and policy.is_token_error(result):
+                token_refreshed = True
+                logger.info("Token ungültig - erneuere Token und wiederhole Request")
+                new_token = self._refresh_token(access_token)
+                if new_token:
+                    access_token = new_token
+                    attempt -= 1
+                    continue
+                return result
+            
+            if not (transient or policy.is_retryable(result)) or attempt >= policy.max_attempts:
+                return result
+            
+            delay = policy.backoff(attempt)
+            if time.monotonic() + delay >= deadline_at:
+                return result
+            
+            logger.warning(f"Retry {attempt}/{policy.max_attempts - 1} für {method} {path} "
+                           f"in {delay:.2f}s: {result.get('msg')}")
+            time.sleep(delay)
+    
+    def _send(self,
+              method: str,
+              path: str,
+              body_bytes: bytes,
+              access_token: Optional[str],
+              deadline_at: float) -> Tuple[Dict[str, Any], bool]:
+        """
+        Ein einzelner HTTP Versuch
+        
+        Zurückgegeben: (result, transient) - transient ist True bei
+        Netzwerkfehlern und HTTP 5xx
+        """
+        # Bei offenem Circuit sofort abbrechen (kein Warten auf Timeouts)
+        if not self.circuit_breaker.allow_request():
+            return self._circuit_open_result(), False
+        
+        # Bei erschöpftem Rate Limit warten (vor dem Signieren, damit t aktuell ist),
+        # aber nie über die Deadline hinaus
+        remaining = deadline_at - time.monotonic()
+        if remaining > 0 and self.rate_limiter.acquire(self.region, method, path,
+                                                       max_wait=remaining) is not None:
+            remaining = deadline_at - time.monotonic()
+        else:
+            remaining = 0
+        if remaining <= 0:
+            self.circuit_breaker.release()
+            if self.rate_limiter.quota_exhausted(self.region, method, path):
+                return {"success": False, "msg": "Daily quota exceeded"}, False
+            return {"success": False, "msg": "Deadline exceeded"}, False
+        
+        result, transient = self._send_once(method, path, body_bytes, access_token, remaining)
+        self._record_outcome(result, transient)
+        return result, transient
+    
+    def _send_once(self,
+                   method: str,
+                   path: str,
+                   body_bytes: bytes,
+                   access_token: Optional[str],
+                   remaining: float) -> Tuple[Dict[str, Any], bool]:
+        """HTTP Request ohne Retry/Breaker. Zurückgegeben: (result, transient)"""
+        timeout = (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
         
         # Generiere Signature
         signature, timestamp = self._generate_signature(
-            method, path, body_str, access_token
+            method, path, body_bytes, access_token
         )
         
-        # Headers
-        headers = {
-            "sign_method": "HMAC-SHA256",
-            "client_id": self.access_id,
-            "t": timestamp,
-            "sign": signature,
-            "Content-Type": "application/json",
-        }
+        headers = self._build_headers(signature, timestamp, access_token)
         
-        if access_token:
-            headers["access_token"] = access_token
+        logger.debug("%s %s", method, path)
+        logger.debug("Headers: %s", headers)
         
-        logger.debug(f"{method} {path}")
-        logger.debug(f"Headers: {headers}")
+        session = self._get_session()
+        import requests
         
         try:
+            url = self.base_url + path
             if method == "GET":
-                resp = requests.get(url, headers=headers, timeout=10)
-            elif method == "POST":
-                resp = requests.post(url, headers=headers, data=body_str, timeout=10)
+                resp = session.get(url, headers=headers, timeout=timeout)
             else:
-                return {"success": False, "msg": f"Unsupported method: {method}"}
+                resp = session.post(url, headers=headers, data=body_bytes, timeout=timeout)
             
-            logger.debug(f"Status: {resp.status_code}")
-            result = resp.json()
-            logger.debug(f"Response: {result}")
-            return result
+            logger.debug("Status: %s", resp.status_code)
+            if resp.status_code >= 500:
+                logger.error(f"Request Error: HTTP {resp.status_code}")
+                return {"success": False, "msg": f"HTTP {resp.status_code}"}, True
+            
+            result = json_codec.loads(resp.content)
+            logger.debug("Response: %s", result)
+            return result, False
+        
+        except (requests.ConnectionError, requests.Timeout) as e:
+            logger.error(f"Request Error: {e}")
+            return {"success": False, "msg": str(e)}, True
         
         except Exception as e:
             logger.error(f"Request Error: {e}")
-            return {"success": False, "msg": str(e)}
+            return {"success": False, "msg": str(e)}, False
     
-    def get_token(self) -> Optional[str]:
+    def get_token(self, force_refresh: bool = False) -> Optional[str]:
         """
-        Holt Access Token
+        Liefert Access Token aus dem Cache oder holt einen neuen
         
         API: GET /v1.0/token?grant_type=1
-        """
-        logger.info("Hole Access Token...")
-        result = self._request("GET", "/v1.0/token?grant_type=1")
         
-        # Token ist in result['result']['access_token']
-        if result.get("success") and "result" in result:
-            token = result["result"].get("access_token")
+        Der Token wird bis kurz vor Ablauf (expire_time aus der Response)
+        ohne weiteren Request zurückgegeben. Brauchen mehrere Threads
+        gleichzeitig einen neuen Token, wird er nur einmal geholt.
+        """
+        if not force_refresh:
+            token = self._cached_token()
             if token:
-                logger.info(f"✓ Token erhalten: {token[:20]}...")
                 return token
         
-        logger.error(f"✗ Token Error: {result.get('msg')}")
-        return None
+        with self._token_lock:
+            # Ein anderer Thread hat den Token evtl. schon erneuert
+            if not force_refresh:
+                token = self._cached_token()
+                if token:
+                    return token
+            return self._fetch_token()
+    
+    def invalidate_token(self) -> None:
+        """Verwirft den gecachten Token (z.B. nach 'token invalid')"""
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0.0
     
-    def get_device_status(self, device_id: str, token: str) -> Dict[str, Any]:
+    def _refresh_token(self, stale_token: str) -> Optional[str]:
+        """
+        Ersetzt einen vom Server abgelehnten Token
+        
+        Hat ein anderer Thread den Token inzwischen erneuert, wird dieser
+        verwendet statt erneut zu holen.
+        """
+        with self._token_lock:
+            token = self._cached_token()
+            if token and token != stale_token:
+                return token
+            return self._fetch_token()
+    
+    def _fetch_token(self) -> Optional[str]:
+        """Holt neuen Token vom Server (Aufrufer hält _token_lock)"""
+        logger.info("Hole Access Token...")
+        result = self._request("GET", "/v1.0/token?grant_type=1")
+        return self._token_from_result(result)
+    
+    def _resolve_token(self, token: Optional[str]) -> Optional[str]:
+        """Verwendet übergebenen Token oder den gecachten Client-Token"""
+        return token or self.get_token()
+    
+    def get_device_status(self, device_id: str, token: Optional[str] = None) -> Dict[str, Any]:
         """
         Holt Device Status
         
         API: GET /v2.0/cloud/thing/batch?device_ids={id}
         """
         path = f"/v2.0/cloud/thing/batch?device_ids={device_id}"
-        result = self._request("GET", path, access_token=token)
+        result = self._request("GET", path, access_token=self._resolve_token(token))
+        return self._parse_status(result)
+    
+    def get_devices_status(self, device_ids: Iterable[str],
+                           token: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Holt Status beliebig vieler Geräte
         
-        if result.get("success"):
-            devices = result.get("result", [])
-            if devices:
-                return devices[0]
+        API: GET /v2.0/cloud/thing/batch?device_ids={id1},{id2},...
         
-        logger.error(f"Status Error: {result.get('msg')}")
-        return {}
+        Die IDs werden in Blöcke zu BATCH_STATUS_MAX_IDS aufgeteilt, die
+        Blöcke parallel abgefragt.
+        
+        Returns:
+            Dict device_id -> Status (wie get_device_status). Geräte ohne
+            Antwort fehlen im Ergebnis.
+        """
+        paths = self._status_batch_paths(device_ids)
+        if not paths:
+            return {}
+        
+        token = self._resolve_token(token)
+        
+        def fetch(path: str) -> Dict[str, Dict[str, Any]]:
+            return self._parse_status_batch(
+                self._request("GET", path, access_token=token)
+            )
+        
+        if len(paths) == 1:
+            return fetch(paths[0])
+        
+        statuses: Dict[str, Dict[str, Any]] = {}
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with ThreadPoolExecutor(max_workers=min(len(paths), self.pool_size)) as executor:
+            for chunk in executor.map(fetch, paths):
+                statuses.update(chunk)
+        return statuses
     
-    def get_device_properties(self, device_id: str, token: str) -> Dict[str, Any]:
+    def get_device_properties(self, device_id: str, token: Optional[str] = None,
+                              max_staleness: Optional[float] = None,
+                              allow_stale: bool = True) -> Dict[str, Any]:
         """
         Holt alle Device Properties mit aktuellen Werten
         
         API: GET /v2.0/cloud/thing/{device_id}/shadow/properties
+        
+        Args:
+            device_id: Device ID
+            token: Access Token (None = gecachter Client-Token)
+            max_staleness: Max. Alter gecachter Werte in Sekunden
+                           (None = cache.ttl, 0 = immer aus der Cloud)
+            allow_stale: Bei offenem Circuit Breaker die letzten bekannten
+                         Werte liefern (False = {} wie bei einem Fehler)
         """
+        cached = self.property_cache.get(device_id, max_staleness)
+        if cached is not None:
+            return cached
+        
+        if self.local is not None:
+            properties = self._local_properties(device_id)
+            if properties is not None:
+                return properties
+        
+        return self._cloud_properties(device_id, token, allow_stale)
+    
+    def _cloud_properties(self, device_id: str, token: Optional[str] = None,
+                          allow_stale: bool = True) -> Dict[str, Any]:
+        """Properties aus der Cloud (lädt auch das Schema neu, anders als das LAN)"""
         path = f"/v2.0/cloud/thing/{device_id}/shadow/properties"
-        result = self._request("GET", path, access_token=token)
+        result = self._request("GET", path, access_token=self._resolve_token(token))
+        return self._properties_from_result(device_id, result, allow_stale)
+    
+    def _local_properties(self, device_id: str) -> Optional[Dict[str, PropertyValue]]:
+        """
+        Liest Properties über das LAN
         
-        if result.get("success") and "result" in result:
-            properties = result["result"].get("properties", [])
-            
-            # Strukturiere Properties für einfache Verwendung
-            props_dict = {}
-            for prop in properties:
-                code = prop.get("code")
-                value = prop.get("value")
-                props_dict[code] = {
-                    "code": code,
-                    "dp_id": prop.get("dp_id"),
-                    "type": prop.get("type"),
-                    "value": value,
-                    "time": prop.get("time"),
-                    "custom_name": prop.get("custom_name")
-                }
-            
-            return props_dict
+        Braucht das Schema (dp_id -> code) aus einer früheren Cloud-Abfrage.
+        Zurückgegeben: Properties oder None (Cloud verwenden)
+        """
+        schema = self._cached_schema(device_id)
+        if schema is None:
+            return None
+        dps = self.local.query(device_id)
+        if dps is None:
+            return None
         
-        logger.error(f"Properties Error: {result.get('msg')}")
-        return {}
+        # Das LAN liefert keine Zeitstempel: unveränderte Werte behalten ihre
+        # bisherige time, damit die Shadow-Version nicht bei jedem Lesen steigt
+        previous = self.property_cache.get(device_id, float("inf")) or {}
+        now_ms = int(time.time() * 1000)
+        properties = {}
+        for code, prop in schema.items():
+            key = str(prop.dp_id)
+            if key not in dps:
+                continue
+            old = previous.get(code)
+            if old is not None and old.get("value") == dps[key]:
+                properties[code] = old
+            else:
+                properties[code] = PropertyValue(prop, dps[key], now_ms)
+        
+        # Nicht gemeldete DPs sind nicht entfernt, nur nicht Teil der Antwort
+        partial = len(properties) < len(schema)
+        if partial:
+            properties = {**previous, **properties}
+        self.property_cache.put(device_id, properties)
+        self.shadow_tracker.observe(device_id, properties, partial=partial)
+        return properties
+    
+    def _set_local(self, device_id: str, properties: Dict[str, Any]) -> bool:
+        """Setzt Properties über das LAN (False = Cloud verwenden)"""
+        schema = self._cached_schema(device_id)
+        if schema is None:
+            return False
+        dps = {}
+        for code, value in properties.items():
+            prop = schema.get(code)
+            if prop is None or prop.dp_id is None:
+                return False
+            dps[str(prop.dp_id)] = value
+        return self.local.set_dps(device_id, dps)
     
-    def get_device_property_value(self, device_id: str, token: str, property_code: str) -> Any:
+    def get_device_property_value(self, device_id: str, token: Optional[str], property_code: str,
+                                  max_staleness: Optional[float] = None) -> Any:
         """
         Holt einen einzelnen Property-Wert
         
         Args:
             device_id: Device ID
-            token: Access Token
+            token: Access Token (None = gecachter Client-Token)
             property_code: Property Code (z.B. 'temp_current', 'Power', etc.)
+            max_staleness: Max. Alter gecachter Werte in Sekunden (None = cache.ttl)
         
         Returns:
             Property-Wert oder None
         """
-        properties = self.get_device_properties(device_id, token)
+        properties = self.get_device_properties(device_id, token, max_staleness)
         if property_code in properties:
             return properties[property_code].get("value")
         
         logger.warning(f"Property '{property_code}' nicht gefunden")
         return None
     
-    def list_device_properties(self, device_id: str, token: str) -> None:
+    def get_property_changes(self, device_id: str, since: int = 0,
+                             token: Optional[str] = None,
+                             max_staleness: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Liefert nur Properties, deren Wert oder time sich seit Version since
+        geändert hat
+        
+        Args:
+            device_id: Device ID
+            since: Zuletzt gesehene Version (0 = kompletter Stand)
+            token: Access Token (None = gecachter Client-Token)
+            max_staleness: wie get_device_properties
+        
+        Returns:
+            {"version": int, "changes": {code: prop}, "removed": [code],
+             "full": bool} - version beim nächsten Aufruf als since übergeben
+        """
+        self.get_device_properties(device_id, token, max_staleness)
+        return self.shadow_tracker.changes(device_id, since)
+    
+    def list_device_properties(self, device_id: str, token: Optional[str] = None) -> None:
         """
         Zeigt alle verfügbaren Properties eines Geräts an
         """
@@ -268,7 +929,7 @@ class TuyaCloudClient:
             
             print(f"{code:<25} {prop_type:<10} {str(value):<20} {dp_id:<5}")
     
-    def set_device_property(self, device_id: str, token: str,
+    def set_device_property(self, device_id: str, token: Optional[str],
                           property_code: str, value: Any) -> bool:
         """
         Setzt Device Property über Command API
@@ -277,32 +938,93 @@ class TuyaCloudClient:
         
         Verwendet property_code (nicht DP_ID!)
         """
-        # Validiere dass Property existiert
-        properties = self.get_device_properties(device_id, token)
+        return self.set_device_properties(device_id, token, {property_code: value})
+    
+    def set_device_properties(self, device_id: str, token: Optional[str],
+                              properties: Dict[str, Any]) -> bool:
+        """
+        Setzt mehrere Device Properties mit einem Request
         
-        if property_code not in properties:
-            logger.error(f"Property '{property_code}' nicht gefunden")
-            return False
+        API: POST /v1.0/iot-03/devices/{device_id}/commands
+        
+        Args:
+            device_id: Device ID
+            token: Access Token (None = gecachter Client-Token)
+            properties: {property_code: value}, Reihenfolge bleibt erhalten
+        
+        Returns:
+            True wenn alle Commands angenommen wurden
+        """
+        return self.send_device_properties(device_id, token, properties) is None
+    
+    def send_device_properties(self, device_id: str, token: Optional[str],
+                               properties: Dict[str, Any]) -> Optional[str]:
+        """
+        Wie set_device_properties, aber mit Begründung bei Ablehnung
+        
+        Zurückgegeben: Fehlermeldung (Validierung oder Cloud) oder None
+        """
+        if not properties:
+            return None
+        
+        token = self._resolve_token(token)
+        
+        # Validiere gegen gecachtes Schema (GET nur wenn Cache leer/abgelaufen)
+        error = self._validate_commands(device_id, token, properties)
+        if error:
+            logger.error(error)
+            return error
+        
+        if self.local is not None and self._set_local(device_id, properties):
+            self._apply_property_values(device_id, properties)
+            for code, value in properties.items():
+                logger.info(f"✓ Property '{code}' lokal gesetzt auf {value}")
+            return None
         
         # Verwende tinytuya Command API Format
         path = f"/v1.0/iot-03/devices/{device_id}/commands"
-        body = {
-            "commands": [
-                {"code": property_code, "value": value}
-            ]
-        }
+        body = self._commands_body(properties)
         
         result = self._request("POST", path, body, access_token=token)
         
         if result.get("success"):
-            logger.info(f"✓ Property '{property_code}' gesetzt auf {value}")
-            return True
+            self._apply_property_values(device_id, properties)
+            for code, value in properties.items():
+                logger.info(f"✓ Property '{code}' gesetzt auf {value}")
+            return None
         else:
+            if self._is_unknown_code_error(result):
+                self.invalidate_schema(device_id)
             logger.error(f"Property Error: {result.get('msg')}")
-            return False
+            return result.get("msg") or "Command rejected"
+    
+    def _validate_commands(self, device_id: str, token: Optional[str],
+                           commands: Dict[str, Any]) -> Optional[str]:
+        """
+        Validiert Commands gegen das Property Schema des Geräts
+        
+        Das Schema wird bei Bedarf geholt. Ist ein Code im gecachten Schema
+        unbekannt, wird einmal neu geladen (Gerät evtl. geändert) - immer
+        aus der Cloud, das LAN liefert nur Werte zum vorhandenen Schema.
+        
+        Zurückgegeben: Fehlermeldung oder None
+        """
+        schema = self._cached_schema(device_id)
+        if schema is not None:
+            if all(code in schema for code in commands):
+                return self._check_commands(schema, commands)
+        
+        self._cloud_properties(device_id, token)
+        schema = self._cached_schema(device_id)
+        if schema is None:
+            return f"Properties für {device_id} nicht verfügbar"
+        return self._check_commands(schema, commands)
 
 
 if __name__ == "__main__":
+    configure_stdout()
+    setup_logging()
+    
     print("\n" + "="*70)
     print("TUYA CLOUD CLIENT - SAUBERE IMPLEMENTATION")
     print("="*70 + "\n")
@@ -319,10 +1041,11 @@ if __name__ == "__main__":
         
         # Teste Device Status
         print("\n[Test] Device Status:")
+        statuses = client.get_devices_status(client.devices.keys(), token)
         for device_id, device_info in client.devices.items():
             name = device_info.get('name', device_id)
             print(f"\n  Gerät: {name}")
-            status = client.get_device_status(device_id, token)
+            status = statuses.get(device_id)
             
             if status:
                 print(f"    Online: {status.get('is_online')}")
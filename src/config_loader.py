@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Gemeinsamer Config Loader
+
+config.yaml wird pro Prozess nur einmal geparst und in typisierte
+Strukturen übersetzt (Credentials, Geräte-Index nach ID und Name,
+property_types/dp_id Map). Das kompilierte Ergebnis wird zusätzlich auf
+der Platte gecacht - Schlüssel sind mtime und SHA256 des Dateiinhalts.
+Solange sich config.yaml nicht ändert, entfällt das YAML-Parsing auch
+beim nächsten Prozessstart.
+
+Der Cache ist JSON (kein pickle, also keine Codeausführung beim Laden)
+und enthält wie config.yaml die Credentials: Verzeichnis 0700, Datei
+0600; fremde oder für andere beschreibbare Cache-Dateien werden ignoriert.
+
+Usage:
+  from config_loader import load_config
+  config = load_config("config.yaml")
+  config.cloud.access_id
+  config.device("Wohnzimmer").device_id
+  config.get("http", {})
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bei inkompatiblen Änderungen am Cache-Format erhöhen
+CACHE_FORMAT = 2
+
+
+class ConfigError(ValueError):
+    """config.yaml hat eine ungültige Struktur"""
+
+
+class CloudCredentials:
+    """Zugangsdaten für die Tuya Cloud"""
+    
+    __slots__ = ("access_id", "access_key", "region", "base_url")
+    
+    def __init__(self, access_id: Optional[str], access_key: Optional[str], region: str = "eu",
+                 base_url: Optional[str] = None):
+        self.access_id = access_id
+        self.access_key = access_key
+        self.region = region
+        # Überschreibt den Endpunkt der Region (z.B. mock_tuya_cloud.py)
+        self.base_url = base_url
+    
+    def __repr__(self) -> str:
+        return f"CloudCredentials(access_id={self.access_id!r}, region={self.region!r})"
+
+
+class DeviceConfig:
+    """Ein Eintrag aus 'devices'"""
+    
+    __slots__ = ("device_id", "name", "type", "raw")
+    
+    def __init__(self, device_id: str, name: Optional[str], type: Optional[str], raw: Dict):
+        self.device_id = device_id
+        self.name = name
+        self.type = type
+        self.raw = raw
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Zugriff auf beliebige Felder des Original-Eintrags"""
+        return self.raw.get(key, default)
+    
+    def __repr__(self) -> str:
+        return f"DeviceConfig(device_id={self.device_id!r}, name={self.name!r})"
+
+
+class PropertyType:
+    """Eintrag aus property_types: Typ, DP_ID und ob nur lesbar"""
+    
+    __slots__ = ("code", "type", "dp_id", "readonly")
+    
+    def __init__(self, code: str, type: Optional[str], dp_id: Optional[int], readonly: bool = False):
+        self.code = code
+        self.type = type
+        self.dp_id = dp_id
+        self.readonly = readonly
+    
+    def __repr__(self) -> str:
+        return (f"PropertyType(code={self.code!r}, type={self.type!r}, "
+                f"dp_id={self.dp_id!r}, readonly={self.readonly!r})")
+
+
+class TuyaConfig(Mapping):
+    """
+    Validierte, kompilierte Konfiguration
+    
+    Verhält sich für die übrigen Abschnitte (http, cache, retry, ...) wie
+    das ursprüngliche Dict: config.get("http", {}).
+    """
+    
+    def __init__(self, raw: Optional[Dict] = None, source: Optional[str] = None):
+        raw = {} if raw is None else raw
+        if not isinstance(raw, dict):
+            raise ConfigError("Top-Level muss ein Mapping sein")
+        self.raw = raw
+        self.source = source
+        
+        cloud = _section(raw, "cloud", dict)
+        self.cloud = CloudCredentials(
+            cloud.get("access_id"),
+            cloud.get("access_key"),
+            cloud.get("region") or "eu",
+            (cloud.get("base_url") or "").rstrip("/") or None,
+        )
+        
+        devices = []
+        self.devices_by_id: Dict[str, DeviceConfig] = {}
+        self.devices_by_name: Dict[str, DeviceConfig] = {}
+        for index, entry in enumerate(_section(raw, "devices", list)):
+            if not isinstance(entry, dict) or not entry.get("device_id"):
+                raise ConfigError(f"devices[{index}]: 'device_id' fehlt")
+            device = DeviceConfig(str(entry["device_id"]), entry.get("name"),
+                                  entry.get("type"), entry)
+            devices.append(device)
+            self.devices_by_id[device.device_id] = device
+            if device.name:
+                self.devices_by_name.setdefault(device.name, device)
+        self.devices: Tuple[DeviceConfig, ...] = tuple(devices)
+        
+        self.property_types = _compile_property_types(_section(raw, "property_types", dict))
+        self.dp_ids: Dict[int, str] = {
+            prop.dp_id: code for code, prop in self.property_types.items()
+            if prop.dp_id is not None
+        }
+    
+    # Mapping Interface (rohe Abschnitte)
+    
+    def __getitem__(self, key: str) -> Any:
+        return self.raw[key]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.raw)
+    
+    def __len__(self) -> int:
+        return len(self.raw)
+    
+    @property
+    def primary_device(self) -> Optional[DeviceConfig]:
+        """Erstes konfiguriertes Gerät"""
+        return self.devices[0] if self.devices else None
+    
+    def device(self, key: str) -> Optional[DeviceConfig]:
+        """Gerät nach Device-ID oder Name"""
+        return self.devices_by_id.get(key) or self.devices_by_name.get(key)
+    
+    @property
+    def readonly_codes(self) -> FrozenSet[str]:
+        return frozenset(code for code, prop in self.property_types.items() if prop.readonly)
+
+
+def _section(raw: Dict, name: str, expected: type) -> Any:
+    value = raw.get(name)
+    if value is None:
+        return expected()
+    if not isinstance(value, expected):
+        raise ConfigError(f"'{name}' muss vom Typ {expected.__name__} sein")
+    return value
+
+
+def _compile_property_types(section: Dict) -> Dict[str, PropertyType]:
+    """property_types → {code: PropertyType}"""
+    readonly = section.get("readonly") or []
+    if not isinstance(readonly, list):
+        raise ConfigError("'property_types.readonly' muss eine Liste sein")
+    readonly = set(readonly)
+    
+    types: Dict[str, PropertyType] = {}
+    for type_name, entries in section.items():
+        if type_name == "readonly" or entries is None:
+            continue
+        if not isinstance(entries, dict):
+            raise ConfigError(f"'property_types.{type_name}' muss ein Mapping code: dp_id sein")
+        for code, dp_id in entries.items():
+            if dp_id is not None and not isinstance(dp_id, int):
+                raise ConfigError(f"property_types.{type_name}.{code}: dp_id muss eine Zahl sein")
+            types[code] = PropertyType(code, type_name, dp_id, code in readonly)
+    
+    # readonly Codes ohne Typ-Eintrag trotzdem aufnehmen
+    for code in readonly - types.keys():
+        types[code] = PropertyType(code, None, None, True)
+    return types
+
+
+# ============================================================
+# Laden mit Prozess- und Platten-Cache
+# ============================================================
+
+_lock = threading.Lock()
+# Absoluter Pfad -> ((mtime_ns, size), TuyaConfig)
+_loaded: Dict[str, Tuple[Tuple[int, int], TuyaConfig]] = {}
+
+
+def _cache_dir() -> Path:
+    """Verzeichnis für kompilierte Configs (TUYA_CONFIG_CACHE_DIR überschreibt)"""
+    override = os.environ.get("TUYA_CONFIG_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "tuya-client"
+
+
+def _cache_file(path: str) -> Path:
+    name = hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+    return _cache_dir() / f"config-{name}.json"
+
+
+def _trusted(fd: int) -> bool:
+    """Cache-Datei gehört uns und ist nur für uns beschreibbar (POSIX)"""
+    if not hasattr(os, "getuid"):
+        return True
+    info = os.fstat(fd)
+    return info.st_uid == os.getuid() and not info.st_mode & 0o022
+
+
+def _read_disk_cache(cache_file: Path, mtime_ns: int, digest: str) -> Optional[Dict]:
+    try:
+        with open(cache_file, "rb") as f:
+            if not _trusted(f.fileno()):
+                logger.warning(f"Config-Cache ignoriert, fremde Rechte: {cache_file}")
+                return None
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug(f"Config-Cache unlesbar ({cache_file}): {e}")
+        return None
+    
+    if (not isinstance(entry, dict)
+            or entry.get("format") != CACHE_FORMAT
+            or entry.get("sha256") != digest):
+        return None
+    if entry.get("mtime_ns") != mtime_ns:
+        # Inhalt gleich, nur touch/checkout - Eintrag bleibt gültig
+        logger.debug("Config-Cache: mtime geändert, Inhalt identisch")
+    return entry.get("data")
+
+
+def _write_disk_cache(cache_file: Path, mtime_ns: int, digest: str, data: Dict) -> None:
+    entry = {"format": CACHE_FORMAT, "mtime_ns": mtime_ns, "sha256": digest, "data": data}
+    try:
+        content = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        # YAML kennt z.B. Datumswerte und Zahlen als Keys: nur verlustfrei Cachebares
+        if json.loads(content)["data"] != data:
+            logger.debug("Config-Cache: Config nicht verlustfrei als JSON darstellbar")
+            return
+        cache_file.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # mkstemp legt die Datei mit 0600 an
+        fd, tmp = tempfile.mkstemp(dir=cache_file.parent, prefix=".config-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, cache_file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except Exception as e:
+        logger.debug(f"Config-Cache nicht geschrieben ({cache_file}): {e}")
+
+
+def _parse_yaml(content: bytes) -> Dict:
+    import yaml
+    try:
+        loader = yaml.CSafeLoader
+    except AttributeError:
+        loader = yaml.SafeLoader
+    return yaml.load(content, Loader=loader) or {}
+
+
+def load_config(path: str = "config.yaml", use_disk_cache: bool = True) -> TuyaConfig:
+    """
+    Lädt und validiert config.yaml (einmal pro Prozess und Dateistand)
+    
+    Args:
+        path: Pfad zur config.yaml
+        use_disk_cache: Kompiliertes Ergebnis auf der Platte cachen
+    
+    Returns:
+        TuyaConfig
+    
+    Raises:
+        OSError: Datei nicht lesbar
+        ConfigError: ungültige Struktur (auch bei YAML-Syntaxfehlern)
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    
+    with _lock:
+        loaded = _loaded.get(abs_path)
+        if loaded is not None and loaded[0] == stamp:
+            return loaded[1]
+        
+        with open(abs_path, "rb") as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        cache_file = _cache_file(abs_path)
+        
+        data = _read_disk_cache(cache_file, stat.st_mtime_ns, digest) if use_disk_cache else None
+        from_disk = data is not None
+        if data is None:
+            try:
+                data = _parse_yaml(content)
+            except Exception as e:
+                raise ConfigError(f"{path}: {e}") from e
+        
+        config = TuyaConfig(data, source=abs_path)
+        if use_disk_cache and not from_disk:
+            _write_disk_cache(cache_file, stat.st_mtime_ns, digest, data)
+        
+        _loaded[abs_path] = (stamp, config)
+        logger.debug(f"Config geladen: {abs_path} ({'Cache' if from_disk else 'YAML'})")
+        return config
+
+
+def clear_cache() -> None:
+    """Vergisst alle im Prozess geladenen Configs"""
+    with _lock:
+        _loaded.clear()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Verteiler für Property-Änderungen (Server-Sent Events)
+
+Der Poller meldet jede Wertänderung an EventHub.publish. Ereignisse
+landen mit fortlaufender ID in einem begrenzten Ringpuffer; Abonnenten
+merken sich nur ihre letzte ID (Cursor) und warten gemeinsam auf eine
+Condition. Es gibt keine Queue und keinen Thread pro Abonnent, ein
+wartender Abonnent kostet nur seinen Cursor. Mit gevent Workern
+(Monkey-Patching) warten die Abonnenten als Greenlets.
+
+Nach einem Reconnect setzt ein Client per Last-Event-ID fort, solange
+die Ereignisse noch im Puffer sind; sonst bekommt er ein "resync".
+"""
+
+import itertools
+import threading
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Event:
+    """Änderung eines Geräts: {code: property} seit dem vorherigen Stand"""
+    
+    __slots__ = ("seq", "device_id", "version", "changes")
+    
+    def __init__(self, seq: int, device_id: str, version: int, changes: Dict[str, Any]):
+        self.seq = seq
+        self.device_id = device_id
+        self.version = version
+        self.changes = changes
+
+
+class EventHub:
+    """
+    Thread-sicherer Ringpuffer mit gemeinsamer Condition für alle Abonnenten
+    
+    Config (alle Schlüssel optional):
+        events:
+          buffer: 1000        # Ereignisse für Last-Event-ID Resume
+          heartbeat: 15       # Sekunden zwischen Keep-Alive Kommentaren
+    """
+    
+    def __init__(self, buffer: int = 1000):
+        # Teil jeder Event-ID: IDs aus einem früheren Prozess passen nie
+        self.boot = uuid.uuid4().hex[:8]
+        self._events: "deque[Event]" = deque(maxlen=max(1, int(buffer)))
+        self._cond = threading.Condition()
+        self._seq = itertools.count(1)
+        self.last_seq = 0
+        self.subscribers = 0
+        self.published = 0
+    
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "EventHub":
+        """Erstellt Hub aus dem 'events' Abschnitt der Config"""
+        config = config or {}
+        return cls(buffer=config.get("buffer", 1000))
+    
+    def publish(self, device_id: str, changes: Dict[str, Any], version: int = 0) -> Optional[Event]:
+        """Legt ein Ereignis ab und weckt alle wartenden Abonnenten"""
+        if not changes:
+            return None
+        with self._cond:
+            event = Event(next(self._seq), device_id, version, changes)
+            self._events.append(event)
+            self.last_seq = event.seq
+            self.published += 1
+            self._cond.notify_all()
+        return event
+    
+    def subscribe(self) -> int:
+        """Registriert einen Abonnenten, Zurückgegeben: aktueller Cursor"""
+        with self._cond:
+            self.subscribers += 1
+            return self.last_seq
+    
+    def unsubscribe(self) -> None:
+        with self._cond:
+            self.subscribers -= 1
+    
+    def event_id(self, seq: int) -> str:
+        return f"{self.boot}-{seq}"
+    
+    def parse_event_id(self, event_id: Optional[str]) -> Optional[int]:
+        """
+        Cursor aus einer Last-Event-ID
+        
+        Returns:
+            Sequenznummer, oder None wenn die ID fehlt oder aus einem
+            anderen Prozess stammt (dann ist ein resync nötig)
+        """
+        if not event_id:
+            return None
+        boot, _, seq = event_id.partition("-")
+        if boot != self.boot or not seq.isdigit():
+            return None
+        return int(seq)
+    
+    def wait(self, cursor: int, timeout: Optional[float] = None) -> Tuple[List[Event], int, bool]:
+        """
+        Wartet auf Ereignisse nach cursor
+        
+        Returns:
+            (events, neuer cursor, lost) - events leer nach Timeout;
+            lost=True wenn Ereignisse schon aus dem Puffer verdrängt waren
+        """
+        with self._cond:
+            if self.last_seq <= cursor:
+                self._cond.wait(timeout)
+            if self.last_seq <= cursor:
+                return [], cursor, False
+            
+            first = self._events[0].seq
+            lost = cursor + 1 < first
+            start = max(cursor + 1 - first, 0)
+            events = list(itertools.islice(self._events, start, None))
+            return events, self.last_seq, lost
+    
+    def stats(self) -> Dict[str, Any]:
+        """Status für /health"""
+        return {
+            "subscribers": self.subscribers,
+            "published": self.published,
+            "buffered": len(self._events),
+            "last_event_id": self.event_id(self.last_seq) if self.last_seq else None,
+        }
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+JSON Codec für den Request/Response Hot Path
+
+Verwendet orjson, falls installiert, sonst die Standardbibliothek.
+Beide Backends erzeugen kompaktes JSON ohne Leerzeichen; signierte
+Bodies werden als UTF-8 Bytes erzeugt, gehasht und unverändert gesendet.
+
+Backend erzwingen: Umgebungsvariable TUYA_JSON_BACKEND=json|orjson
+oder set_backend().
+"""
+
+import json
+import os
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+BACKEND = "json"
+
+
+def set_backend(name: str) -> str:
+    """
+    Wählt das JSON Backend ('orjson' oder 'json')
+    
+    Returns:
+        Tatsächlich aktives Backend (fällt auf 'json' zurück, wenn
+        orjson nicht installiert ist)
+    """
+    global BACKEND
+    BACKEND = "orjson" if name == "orjson" and orjson is not None else "json"
+    return BACKEND
+
+
+set_backend(os.environ.get("TUYA_JSON_BACKEND", "orjson"))
+
+
+def dumps_bytes(obj: Any,
+                default: Optional[Callable[[Any], Any]] = None,
+                sort_keys: bool = False) -> bytes:
+    """Kompaktes JSON als UTF-8 Bytes (für signierte Request Bodies)"""
+    if BACKEND == "orjson":
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False,
+                      default=default, sort_keys=sort_keys).encode('utf-8')
+
+
+def dumps(obj: Any,
+          default: Optional[Callable[[Any], Any]] = None,
+          sort_keys: bool = False) -> str:
+    """Kompaktes JSON als str"""
+    if BACKEND == "orjson":
+        return dumps_bytes(obj, default, sort_keys).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False,
+                      default=default, sort_keys=sort_keys)
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """Parst JSON aus bytes oder str"""
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Lokaler LAN-Zugriff auf Tuya Geräte (Protokoll 3.3 / 3.4)
+
+Liest und setzt DPs direkt per TCP (Port 6668) statt über die Cloud:
+wenige Millisekunden statt mehrerer hundert, ohne API-Kontingent.
+Ist ein Gerät nicht erreichbar, fällt TuyaCloudClient automatisch auf
+die Cloud zurück und versucht es erst nach retry_after Sekunden erneut.
+
+Frame (0x55AA):
+  prefix 000055AA | seqno | cmd | length | [retcode] payload | crc32 | suffix 0000AA55
+  3.4: statt crc32 ein HMAC-SHA256 (32 Byte) mit dem Session Key
+
+Verschlüsselung: AES-128-ECB mit local_key (3.3) bzw. Session Key (3.4).
+3.4 handelt den Session Key mit SESS_KEY_NEG_START/RESP/FINISH aus.
+
+Benötigt: pip install cryptography
+
+Config:
+  local:
+    enabled: true
+    timeout: 2          # Sekunden für Verbindung und Antwort
+    retry_after: 60     # Sekunden Cloud-Fallback nach Fehler
+  devices:
+    - device_id: "..."
+      ip: "192.168.1.50"
+      local_key: "..."  # optional, sonst aus get_device_status
+      version: "3.3"    # oder "3.4"
+"""
+
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+PREFIX_55AA = 0x000055AA
+SUFFIX_55AA = 0x0000AA55
+HEADER_FMT = ">4I"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+CRC_END_FMT = ">II"
+HMAC_END_FMT = ">32sI"
+
+DEFAULT_PORT = 6668
+
+# Commands
+SESS_KEY_NEG_START = 0x03
+SESS_KEY_NEG_RESP = 0x04
+SESS_KEY_NEG_FINISH = 0x05
+CONTROL = 0x07
+STATUS = 0x08
+HEART_BEAT = 0x09
+DP_QUERY = 0x0A
+CONTROL_NEW = 0x0D
+DP_QUERY_NEW = 0x10
+
+# Payloads dieser Commands haben keinen Versions-Header ("3.3" + 12 Nullbytes)
+NO_PROTOCOL_HEADER_CMDS = {
+    DP_QUERY, DP_QUERY_NEW, HEART_BEAT,
+    SESS_KEY_NEG_START, SESS_KEY_NEG_RESP, SESS_KEY_NEG_FINISH,
+}
+PROTOCOL_HEADER_SIZE = 15
+
+SUPPORTED_VERSIONS = ("3.3", "3.4")
+
+# Max. Frames, die auf der Suche nach der passenden Antwort übersprungen werden
+MAX_SKIPPED_FRAMES = 8
+
+
+class LocalProtocolError(Exception):
+    """Ungültiger Frame, falsche Prüfsumme oder abgelehnter Command"""
+
+
+class TuyaMessage(NamedTuple):
+    seqno: int
+    cmd: int
+    retcode: Optional[int]
+    payload: bytes
+
+
+# ============================================================
+# Framing und Verschlüsselung
+# ============================================================
+
+def pack_message(seqno: int, cmd: int, payload: bytes,
+                 hmac_key: Optional[bytes] = None,
+                 retcode: Optional[int] = None) -> bytes:
+    """
+    Baut einen 0x55AA Frame
+    
+    Args:
+        hmac_key: Session Key (3.4) - sonst crc32
+        retcode: Nur in Frames vom Gerät
+    """
+    if retcode is not None:
+        payload = struct.pack(">I", retcode) + payload
+    end_fmt = HMAC_END_FMT if hmac_key else CRC_END_FMT
+    length = len(payload) + struct.calcsize(end_fmt)
+    data = struct.pack(HEADER_FMT, PREFIX_55AA, seqno, cmd, length) + payload
+    if hmac_key:
+        check = hmac.new(hmac_key, data, hashlib.sha256).digest()
+    else:
+        check = binascii.crc32(data) & 0xFFFFFFFF
+    return data + struct.pack(end_fmt, check, SUFFIX_55AA)
+
+
+def unpack_message(data: bytes, hmac_key: Optional[bytes] = None,
+                   has_retcode: bool = True) -> TuyaMessage:
+    """
+    Zerlegt einen 0x55AA Frame und prüft crc32 bzw. HMAC
+    
+    Raises:
+        LocalProtocolError: Frame ungültig
+    """
+    if len(data) < HEADER_SIZE:
+        raise LocalProtocolError("Frame zu kurz")
+    prefix, seqno, cmd, length = struct.unpack(HEADER_FMT, data[:HEADER_SIZE])
+    if prefix != PREFIX_55AA:
+        raise LocalProtocolError(f"Ungültiger Prefix {prefix:#x}")
+    
+    end_fmt = HMAC_END_FMT if hmac_key else CRC_END_FMT
+    end_size = struct.calcsize(end_fmt)
+    if len(data) != HEADER_SIZE + length or length < end_size:
+        raise LocalProtocolError("Länge passt nicht zum Header")
+    
+    body = data[:-end_size]
+    check, suffix = struct.unpack(end_fmt, data[-end_size:])
+    if suffix != SUFFIX_55AA:
+        raise LocalProtocolError(f"Ungültiger Suffix {suffix:#x}")
+    if hmac_key:
+        expected = hmac.new(hmac_key, body, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, check):
+            raise LocalProtocolError("HMAC ungültig")
+    elif binascii.crc32(body) & 0xFFFFFFFF != check:
+        raise LocalProtocolError("CRC ungültig")
+    
+    payload = body[HEADER_SIZE:]
+    retcode = None
+    if has_retcode and len(payload) >= 4:
+        retcode = struct.unpack(">I", payload[:4])[0]
+        payload = payload[4:]
+    return TuyaMessage(seqno, cmd, retcode, payload)
+
+
+def read_frame(sock: socket.socket) -> bytes:
+    """Liest genau einen Frame vom Socket"""
+    header = _recv_exact(sock, HEADER_SIZE)
+    prefix, _, _, length = struct.unpack(HEADER_FMT, header)
+    if prefix != PREFIX_55AA:
+        raise LocalProtocolError(f"Ungültiger Prefix {prefix:#x}")
+    if length > 0xFFFF:
+        raise LocalProtocolError(f"Frame zu groß ({length} Bytes)")
+    return header + _recv_exact(sock, length)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Verbindung vom Gerät geschlossen")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def aes_encrypt(key: bytes, data: bytes, pad: bool = True) -> bytes:
+    """AES-128-ECB, optional mit PKCS#7 Padding"""
+    if pad:
+        pad_len = 16 - len(data) % 16
+        data += bytes([pad_len]) * pad_len
+    encryptor = Cipher(algorithms.AES(key), modes.ECB()).encryptor()
+    return encryptor.update(data) + encryptor.finalize()
+
+
+def aes_decrypt(key: bytes, data: bytes, unpad: bool = True) -> bytes:
+    """Gegenstück zu aes_encrypt"""
+    if len(data) % 16:
+        raise LocalProtocolError("Ciphertext ist kein Vielfaches von 16 Byte")
+    decryptor = Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+    plain = decryptor.update(data) + decryptor.finalize()
+    if unpad and plain:
+        pad_len = plain[-1]
+        if not 0 < pad_len <= 16 or plain[-pad_len:] != bytes([pad_len]) * pad_len:
+            raise LocalProtocolError("Ungültiges Padding (falscher local_key?)")
+        plain = plain[:-pad_len]
+    return plain
+
+
+def protocol_header(version: str) -> bytes:
+    """Versions-Header vor verschlüsselten Payloads ("3.3" + 12 Nullbytes)"""
+    return version.encode("ascii") + b"\0" * (PROTOCOL_HEADER_SIZE - len(version))
+
+
+def session_key(local_key: bytes, local_nonce: bytes, remote_nonce: bytes) -> bytes:
+    """3.4 Session Key: AES(local_key, local_nonce XOR remote_nonce)"""
+    mixed = bytes(a ^ b for a, b in zip(local_nonce, remote_nonce))
+    return aes_encrypt(local_key, mixed, pad=False)
+
+
+def extract_dps(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """dps aus einer Antwort (3.3: {"dps"}, 3.4: {"data": {"dps"}})"""
+    if "dps" in message:
+        return message["dps"]
+    data = message.get("data")
+    if isinstance(data, dict) and "dps" in data:
+        return data["dps"]
+    return None
+
+
+# ============================================================
+# Ein Gerät
+# ============================================================
+
+class TuyaLocalDevice:
+    """
+    TCP Verbindung zu einem Gerät (wird zwischen Aufrufen offen gehalten)
+    
+    Thread-safe: Aufrufe auf dasselbe Gerät laufen nacheinander.
+    """
+    
+    def __init__(self, device_id: str, address: str, local_key: str,
+                 version: str = "3.3", port: int = DEFAULT_PORT, timeout: float = 2.0):
+        version = str(version)
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Protokollversion {version} nicht unterstützt")
+        self.device_id = device_id
+        self.address = address
+        self.port = port
+        self.version = version
+        self.timeout = timeout
+        self.local_key = local_key.encode("latin1")
+        
+        self._sock: Optional[socket.socket] = None
+        self._session_key: Optional[bytes] = None
+        self._seqno = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def is_34(self) -> bool:
+        return self.version == "3.4"
+    
+    def _next_seqno(self) -> int:
+        self._seqno = (self._seqno + 1) & 0xFFFFFFFF
+        return self._seqno
+    
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection((self.address, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._session_key = None
+        if self.is_34:
+            try:
+                self._negotiate_session_key()
+            except BaseException:
+                self.close()
+                raise
+        return sock
+    
+    def close(self) -> None:
+        """Schließt die Verbindung (nächster Aufruf verbindet neu)"""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._session_key = None
+    
+    def _negotiate_session_key(self) -> None:
+        """3.4 Schlüsselaushandlung (Commands 3/4/5)"""
+        local_nonce = os.urandom(16)
+        self._send_frame(SESS_KEY_NEG_START, aes_encrypt(self.local_key, local_nonce),
+                         self.local_key)
+        reply = self._receive(SESS_KEY_NEG_RESP, self.local_key)
+        payload = aes_decrypt(self.local_key, reply.payload)
+        if len(payload) < 48:
+            raise LocalProtocolError("Session Key Antwort zu kurz")
+        
+        remote_nonce, remote_hmac = payload[:16], payload[16:48]
+        expected = hmac.new(self.local_key, local_nonce, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, remote_hmac):
+            raise LocalProtocolError("Gerät kennt den local_key nicht (HMAC ungültig)")
+        
+        finish = hmac.new(self.local_key, remote_nonce, hashlib.sha256).digest()
+        self._send_frame(SESS_KEY_NEG_FINISH, aes_encrypt(self.local_key, finish),
+                         self.local_key)
+        self._session_key = session_key(self.local_key, local_nonce, remote_nonce)
+    
+    def _hmac_key(self) -> Optional[bytes]:
+        return self._session_key if self.is_34 else None
+    
+    def _send_frame(self, cmd: int, payload: bytes, hmac_key: Optional[bytes]) -> None:
+        self._sock.sendall(pack_message(self._next_seqno(), cmd, payload, hmac_key))
+    
+    def _receive(self, cmd: int, hmac_key: Optional[bytes]) -> TuyaMessage:
+        """Wartet auf die Antwort mit Command cmd (andere Frames, z.B. STATUS, werden übersprungen)"""
+        for _ in range(MAX_SKIPPED_FRAMES):
+            message = unpack_message(read_frame(self._sock), hmac_key)
+            if message.cmd == cmd:
+                return message
+            logger.debug(f"LAN {self.device_id}: Frame cmd={message.cmd:#x} übersprungen")
+        raise LocalProtocolError(f"Keine Antwort auf cmd={cmd:#x}")
+    
+    def encode_payload(self, cmd: int, data: bytes) -> bytes:
+        """Verschlüsselt einen Payload (inkl. Versions-Header, wo nötig)"""
+        if self.is_34:
+            if cmd not in NO_PROTOCOL_HEADER_CMDS:
+                data = protocol_header(self.version) + data
+            return aes_encrypt(self._session_key, data)
+        
+        encrypted = aes_encrypt(self.local_key, data)
+        if cmd not in NO_PROTOCOL_HEADER_CMDS:
+            encrypted = protocol_header(self.version) + encrypted
+        return encrypted
+    
+    def decode_payload(self, payload: bytes) -> Dict[str, Any]:
+        """Entschlüsselt einen Antwort-Payload zu JSON ({} bei leerem Payload)"""
+        if not payload:
+            return {}
+        if self.is_34:
+            plain = aes_decrypt(self._session_key, payload)
+            if plain.startswith(self.version.encode("ascii")):
+                plain = plain[PROTOCOL_HEADER_SIZE:]
+        else:
+            if payload.startswith(self.version.encode("ascii")):
+                payload = payload[PROTOCOL_HEADER_SIZE:]
+            plain = aes_decrypt(self.local_key, payload)
+        return json_codec.loads(plain) if plain else {}
+    
+    def _exchange(self, cmd: int, body: Dict[str, Any]) -> Tuple[TuyaMessage, Dict[str, Any]]:
+        if self._sock is None:
+            self._connect()
+        payload = self.encode_payload(cmd, json_codec.dumps_bytes(body))
+        self._send_frame(cmd, payload, self._hmac_key())
+        reply = self._receive(cmd, self._hmac_key())
+        if reply.retcode:
+            raise LocalProtocolError(f"Gerät meldet Fehler {reply.retcode} für cmd={cmd:#x}")
+        return reply, self.decode_payload(reply.payload)
+    
+    def _call(self, cmd: int, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Request/Response; eine offen gehaltene, inzwischen tote Verbindung wird einmal neu aufgebaut"""
+        with self._lock:
+            reused = self._sock is not None
+            try:
+                return self._exchange(cmd, body)[1]
+            except (OSError, LocalProtocolError) as e:
+                self.close()
+                if not reused or isinstance(e, (socket.timeout, LocalProtocolError)):
+                    raise
+            return self._exchange(cmd, body)[1]
+    
+    def status(self) -> Dict[str, Any]:
+        """
+        Liest alle DPs
+        
+        Returns:
+            {dp_id (str): Wert}
+        """
+        if self.is_34:
+            reply = self._call(DP_QUERY_NEW, {})
+        else:
+            reply = self._call(DP_QUERY, {
+                "gwId": self.device_id, "devId": self.device_id,
+                "uid": self.device_id, "t": str(int(time.time())),
+            })
+        dps = extract_dps(reply)
+        if dps is None:
+            raise LocalProtocolError("Antwort enthält keine dps")
+        return dps
+    
+    def set_dps(self, dps: Dict[str, Any]) -> None:
+        """
+        Setzt DPs ({dp_id (str): Wert})
+        
+        Raises:
+            OSError / LocalProtocolError: Gerät nicht erreichbar oder Command abgelehnt
+        """
+        if self.is_34:
+            self._call(CONTROL_NEW, {"protocol": 5, "t": int(time.time()), "data": {"dps": dps}})
+        else:
+            self._call(CONTROL, {
+                "devId": self.device_id, "uid": self.device_id,
+                "t": str(int(time.time())), "dps": dps,
+            })
+
+
+# ============================================================
+# Transport für TuyaCloudClient
+# ============================================================
+
+class LocalTransport:
+    """
+    Verwaltet die lokalen Verbindungen aller konfigurierten Geräte
+    
+    Geräte ohne 'ip' in der Config werden nie lokal angesprochen. Nach einem
+    Fehler wird das Gerät für retry_after Sekunden über die Cloud bedient.
+    """
+    
+    DEFAULT_TIMEOUT = 2.0
+    DEFAULT_RETRY_AFTER = 60.0
+    
+    def __init__(self, client, timeout: float = DEFAULT_TIMEOUT,
+                 retry_after: float = DEFAULT_RETRY_AFTER, port: int = DEFAULT_PORT):
+        self.client = client
+        self.timeout = float(timeout)
+        self.retry_after = float(retry_after)
+        self.port = int(port)
+        
+        self._devices: Dict[str, TuyaLocalDevice] = {}
+        self._unreachable_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        
+        # Statistik
+        self.local_reads = 0
+        self.local_writes = 0
+        self.fallbacks = 0
+    
+    @classmethod
+    def from_config(cls, client) -> Optional["LocalTransport"]:
+        """Transport aus dem 'local' Abschnitt (None wenn nicht aktiviert)"""
+        config = client.config.get("local", {}) or {}
+        if not config.get("enabled"):
+            return None
+        return cls(
+            client,
+            timeout=config.get("timeout", cls.DEFAULT_TIMEOUT),
+            retry_after=config.get("retry_after", cls.DEFAULT_RETRY_AFTER),
+            port=config.get("port", DEFAULT_PORT),
+        )
+    
+    def _device(self, device_id: str) -> Optional[TuyaLocalDevice]:
+        """Verbindungsobjekt des Geräts (None wenn nicht lokal erreichbar/konfiguriert)"""
+        until = self._unreachable_until.get(device_id)
+        if until is not None:
+            if time.monotonic() < until:
+                return None
+            self._unreachable_until.pop(device_id, None)
+        
+        device = self._devices.get(device_id)
+        if device is not None:
+            return device
+        
+        # Ohne Lock: get_device_status kann bis zum Request-Deadline dauern
+        # und darf den LAN-Zugriff auf die anderen Geräte nicht blockieren
+        entry = self.client.devices.get(device_id) or {}
+        address = entry.get("ip")
+        if not address:
+            return None
+        local_key = entry.get("local_key")
+        if not local_key:
+            # local_key liefert auch /v2.0/cloud/thing/batch
+            local_key = self.client.get_device_status(device_id).get("local_key")
+            if not local_key:
+                self._mark_unreachable(device_id, "kein local_key")
+                return None
+        try:
+            device = TuyaLocalDevice(device_id, address, local_key,
+                                     version=entry.get("version", "3.3"),
+                                     port=int(entry.get("port", self.port)),
+                                     timeout=self.timeout)
+        except ValueError as e:
+            self._mark_unreachable(device_id, str(e))
+            return None
+        with self._lock:
+            # Bei gleichzeitigem Aufbau gewinnt das erste (noch unverbundene) Objekt
+            return self._devices.setdefault(device_id, device)
+    
+    def _mark_unreachable(self, device_id: str, reason: str) -> None:
+        self.fallbacks += 1
+        self._unreachable_until[device_id] = time.monotonic() + self.retry_after
+        logger.warning(f"LAN {device_id} nicht verfügbar ({reason}), "
+                       f"Cloud für {self.retry_after:.0f}s")
+    
+    def query(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Liest alle DPs lokal
+        
+        Returns:
+            {dp_id (str): Wert} oder None (Cloud verwenden)
+        """
+        device = self._device(device_id)
+        if device is None:
+            return None
+        try:
+            dps = device.status()
+        except (OSError, LocalProtocolError) as e:
+            self._mark_unreachable(device_id, str(e) or type(e).__name__)
+            return None
+        self.local_reads += 1
+        return dps
+    
+    def set_dps(self, device_id: str, dps: Dict[str, Any]) -> bool:
+        """
+        Setzt DPs lokal
+        
+        Returns:
+            True wenn das Gerät bestätigt hat, False = Cloud verwenden
+        """
+        device = self._device(device_id)
+        if device is None:
+            return False
+        try:
+            device.set_dps(dps)
+        except (OSError, LocalProtocolError) as e:
+            self._mark_unreachable(device_id, str(e) or type(e).__name__)
+            return False
+        self.local_writes += 1
+        return True
+    
+    def close(self) -> None:
+        """Schließt alle Verbindungen"""
+        with self._lock:
+            for device in self._devices.values():
+                device.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Status für /health"""
+        now = time.monotonic()
+        return {
+            "devices": len(self._devices),
+            "local_reads": self.local_reads,
+            "local_writes": self.local_writes,
+            "fallbacks": self.fallbacks,
+            "cloud_only": sorted(d for d, until in self._unreachable_until.items() if until > now),
+        }
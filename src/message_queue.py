@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Tuya Message Queue (Pulsar Websocket) Subscriber
+
+Empfängt Statusmeldungen der Geräte per Push statt per Polling und
+übernimmt sie in den Client-State (PropertyCache + ShadowTracker).
+
+Protokoll:
+  - Websocket zu wss://mqe.tuya<region>.com:8285/ws/v2/consumer/persistent/
+    <access_id>/out/<env>/<access_id>-sub
+  - Header username=access_id, password=md5(access_id + md5(access_key))[8:24]
+  - Nachricht: {"messageId", "payload": base64(JSON), "properties": {"em": ...}}
+  - payload.data ist AES-verschlüsselt mit access_key[8:24]
+    (ECB, bei em == "aes_gcm": GCM mit 12 Byte Nonce vorne, Tag hinten)
+  - Jede Nachricht wird mit {"messageId": ...} bestätigt
+
+Benötigt: pip install aiohttp cryptography
+
+Usage:
+  subscriber = MessageQueueSubscriber(client)
+  subscriber.start()          # eigener Thread mit Event Loop
+  ...
+  await subscriber.run()      # oder im vorhandenen Event Loop
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+# Websocket Endpunkte je Region
+MQ_ENDPOINTS = {
+    "cn": "wss://mqe.tuyacn.com:8285/",
+    "us": "wss://mqe.tuyaus.com:8285/",
+    "eu": "wss://mqe.tuyaeu.com:8285/",
+    "in": "wss://mqe.tuyain.com:8285/",
+}
+
+ENV_PROD = "event"
+ENV_TEST = "event-test"
+
+# payload.protocol: 4 = Statusmeldung, 20 = Geräte-Ereignis (online, offline, ...)
+PROTOCOL_STATUS = 4
+PROTOCOL_EVENT = 20
+
+EM_AES_GCM = "aes_gcm"
+
+
+def mq_password(access_id: str, access_key: str) -> str:
+    """Websocket Passwort: md5(access_id + md5(access_key))[8:24]"""
+    key_md5 = hashlib.md5(access_key.encode("utf-8")).hexdigest()
+    return hashlib.md5((access_id + key_md5).encode("utf-8")).hexdigest()[8:24]
+
+
+def topic_url(base_url: str, access_id: str, env: str = ENV_PROD) -> str:
+    """Vollständige Consumer-URL für access_id und Umgebung"""
+    return (f"{base_url.rstrip('/')}/ws/v2/consumer/persistent/"
+            f"{access_id}/out/{env}/{access_id}-sub"
+            f"?ackTimeoutMillis=3000&subscriptionType=Failover")
+
+
+def _aes_key(access_key: str) -> bytes:
+    return access_key[8:24].encode("utf-8")
+
+
+def decrypt_data(data: str, access_key: str, mode: Optional[str] = None) -> bytes:
+    """
+    Entschlüsselt payload.data (base64)
+    
+    Args:
+        data: base64 Ciphertext
+        access_key: Access Secret (Schlüssel = access_key[8:24])
+        mode: properties.em der Nachricht ("aes_gcm" oder None für ECB)
+    """
+    raw = base64.b64decode(data)
+    key = _aes_key(access_key)
+    
+    if mode == EM_AES_GCM:
+        # nonce (12) | ciphertext | tag (16)
+        return AESGCM(key).decrypt(raw[:12], raw[12:], None)
+    
+    decryptor = Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+    plain = decryptor.update(raw) + decryptor.finalize()
+    # PKCS#7 Padding entfernen
+    pad = plain[-1] if plain else 0
+    if 0 < pad <= 16 and plain.endswith(bytes([pad]) * pad):
+        plain = plain[:-pad]
+    return plain
+
+
+def encrypt_data(plain: bytes, access_key: str, mode: Optional[str] = None) -> str:
+    """Gegenstück zu decrypt_data (für Stand-in Server und Tests)"""
+    key = _aes_key(access_key)
+    if mode == EM_AES_GCM:
+        nonce = os.urandom(12)
+        raw = nonce + AESGCM(key).encrypt(nonce, plain, None)
+    else:
+        pad = 16 - len(plain) % 16
+        encryptor = Cipher(algorithms.AES(key), modes.ECB()).encryptor()
+        raw = encryptor.update(plain + bytes([pad]) * pad) + encryptor.finalize()
+    return base64.b64encode(raw).decode("ascii")
+
+
+def decode_message(message: Dict[str, Any], access_key: str) -> Dict[str, Any]:
+    """
+    Dekodiert eine Websocket Nachricht
+    
+    Returns:
+        {"protocol": int, "data": dict, "t": int}
+    """
+    payload = json_codec.loads(base64.b64decode(message["payload"]))
+    mode = (message.get("properties") or {}).get("em")
+    data = json_codec.loads(decrypt_data(payload["data"], access_key, mode))
+    return {"protocol": payload.get("protocol"), "data": data, "t": payload.get("t")}
+
+
+def encode_message(message_id: str, protocol: int, data: Dict[str, Any],
+                   access_key: str, mode: Optional[str] = None) -> Dict[str, Any]:
+    """Baut eine Websocket Nachricht wie die Tuya Cloud (Gegenstück zu decode_message)"""
+    payload = {
+        "protocol": protocol,
+        "pv": "2.0",
+        "t": int(time.time() * 1000),
+        "data": encrypt_data(json_codec.dumps_bytes(data), access_key, mode),
+    }
+    message = {
+        "messageId": message_id,
+        "payload": base64.b64encode(json_codec.dumps_bytes(payload)).decode("ascii"),
+    }
+    if mode:
+        message["properties"] = {"em": mode}
+    return message
+
+
+class MessageQueueSubscriber:
+    """
+    Pulsar Websocket Subscriber für TuyaCloudClient / AsyncTuyaCloudClient
+    
+    Config (alle Schlüssel optional):
+        mq:
+          enabled: false
+          env: event              # event-test für die Tuya Testumgebung
+          url: null               # überschreibt den Endpunkt der Region
+          heartbeat: 30           # Sekunden zwischen Websocket Pings
+          reconnect_delay: 1.0    # verdoppelt sich bis max_reconnect_delay
+          max_reconnect_delay: 60.0
+    """
+    
+    def __init__(self, client, url: Optional[str] = None, env: Optional[str] = None,
+                 heartbeat: Optional[float] = None,
+                 reconnect_delay: Optional[float] = None,
+                 max_reconnect_delay: Optional[float] = None):
+        config = client.config.get("mq", {}) or {}
+        self.client = client
+        self.env = env or config.get("env", ENV_PROD)
+        base = url or config.get("url") or MQ_ENDPOINTS.get(client.region, MQ_ENDPOINTS["eu"])
+        self.url = topic_url(base, client.access_id, self.env)
+        self.heartbeat = float(heartbeat or config.get("heartbeat", 30))
+        self.reconnect_delay = float(reconnect_delay or config.get("reconnect_delay", 1.0))
+        self.max_reconnect_delay = float(
+            max_reconnect_delay or config.get("max_reconnect_delay", 60.0))
+        
+        # Callbacks: listener(device_id, protocol, data)
+        self._listeners: List[Callable[[str, int, Dict[str, Any]], None]] = []
+        
+        self._stop: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        
+        # Statistik
+        self.connected = False
+        self.messages = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.last_message_at: Optional[float] = None
+    
+    def add_listener(self, listener: Callable[[str, int, Dict[str, Any]], None]) -> None:
+        """Registriert Callback für jede dekodierte Nachricht"""
+        self._listeners.append(listener)
+    
+    def handle(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Verarbeitet eine Nachricht (ohne I/O)
+        
+        Statusmeldungen werden in den Client-State übernommen.
+        Zurückgegeben: dekodierte Nachricht oder None bei Fehlern
+        """
+        try:
+            decoded = decode_message(message, self.client.access_key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"MQ Nachricht {message.get('messageId')} nicht dekodierbar: {e}")
+            return None
+        
+        self.messages += 1
+        self.last_message_at = time.time()
+        data = decoded["data"]
+        device_id = data.get("devId")
+        if not device_id:
+            return decoded
+        
+        if decoded["protocol"] == PROTOCOL_STATUS:
+            version = self.client.apply_status_report(device_id, data.get("status") or [])
+            logger.debug(f"MQ Status {device_id}: {len(data.get('status') or [])} Werte (v{version})")
+        else:
+            logger.debug(f"MQ Ereignis {device_id}: {data.get('bizCode')}")
+        
+        for listener in self._listeners:
+            try:
+                listener(device_id, decoded["protocol"], data)
+            except Exception as e:
+                logger.error(f"MQ Listener Fehler: {e}")
+        return decoded
+    
+    async def run(self) -> None:
+        """Verbindet und verarbeitet Nachrichten bis stop() (mit Reconnect)"""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        if self._stopping:
+            return
+        headers = {
+            "username": self.client.access_id,
+            "password": mq_password(self.client.access_id, self.client.access_key),
+        }
+        delay = self.reconnect_delay
+        
+        async with aiohttp.ClientSession() as session:
+            while not self._stop.is_set():
+                try:
+                    async with session.ws_connect(self.url, headers=headers,
+                                                  heartbeat=self.heartbeat) as ws:
+                        self.connected = True
+                        delay = self.reconnect_delay
+                        logger.info(f"✓ MQ verbunden ({self.env})")
+                        await self._consume(ws)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"MQ Verbindung fehlgeschlagen: {e}")
+                finally:
+                    self.connected = False
+                
+                if self._stop.is_set():
+                    break
+                self.reconnects += 1
+                sleep = delay * random.uniform(0.5, 1.0)
+                logger.info(f"MQ Reconnect in {sleep:.1f}s")
+                try:
+                    await asyncio.wait_for(self._stop.wait(), sleep)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, self.max_reconnect_delay)
+    
+    async def _consume(self, ws) -> None:
+        stop_wait = asyncio.ensure_future(self._stop.wait())
+        try:
+            while True:
+                receive = asyncio.ensure_future(ws.receive())
+                done, _ = await asyncio.wait({receive, stop_wait},
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if stop_wait in done:
+                    receive.cancel()
+                    await ws.close()
+                    return
+                
+                msg = receive.result()
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    if msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED,
+                                    aiohttp.WSMsgType.ERROR):
+                        logger.info(f"MQ Verbindung geschlossen: {msg.type.name}")
+                        return
+                    continue
+                
+                try:
+                    message = json_codec.loads(msg.data)
+                except ValueError:
+                    self.errors += 1
+                    continue
+                message_id = message.get("messageId")
+                try:
+                    self.handle(message)
+                finally:
+                    # Auch nicht dekodierbare Nachrichten bestätigen (sonst Redelivery)
+                    if message_id is not None:
+                        await ws.send_str(json_codec.dumps({"messageId": message_id}))
+        finally:
+            stop_wait.cancel()
+    
+    def start(self) -> threading.Thread:
+        """Startet run() in einem eigenen Daemon-Thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        
+        def target():
+            try:
+                asyncio.run(self.run())
+            except Exception as e:
+                logger.error(f"MQ Subscriber beendet: {e}")
+        
+        self._thread = threading.Thread(target=target, name="tuya-mq", daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Beendet run() (aus beliebigem Thread)"""
+        self._stopping = True
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Status für /health"""
+        return {
+            "connected": self.connected,
+            "env": self.env,
+            "messages": self.messages,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "last_message_age": (round(time.time() - self.last_message_at, 1)
+                                 if self.last_message_at else None),
+        }
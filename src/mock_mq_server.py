@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Lokaler Stand-in für den Tuya Message Queue Websocket
+
+Prüft username/password wie die Tuya Cloud, verschickt verschlüsselte
+Statusmeldungen an alle verbundenen Consumer und zählt die Acks.
+Zum Testen von message_queue.MessageQueueSubscriber ohne Cloud-Zugang.
+Passwort, Verschlüsselung und Framing sind hier bewusst unabhängig von
+message_queue implementiert (nach der Tuya Doku), damit ein Fehler dort
+nicht vom Stand-in gespiegelt wird.
+
+Benötigt: pip install aiohttp cryptography
+
+Usage:
+  python mock_mq_server.py --access-id a --access-key 0123456789abcdef01234567
+  # Meldung einspielen:
+  curl -X POST http://localhost:8285/publish \\
+    -d '{"device_id": "dev1", "status": [{"code": "Power", "value": true}]}'
+
+In der config.yaml:
+  mq:
+    enabled: true
+    url: "ws://localhost:8285/"
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from aiohttp import web
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_STATUS = 4
+MODE_AES_GCM = "aes_gcm"
+
+
+def expected_password(access_id: str, access_key: str) -> str:
+    """Passwort laut Tuya Doku: md5(access_id + md5(access_key)) Zeichen 8-24"""
+    inner = hashlib.md5(access_key.encode("utf-8")).hexdigest()
+    return hashlib.md5(f"{access_id}{inner}".encode("utf-8")).hexdigest()[8:24]
+
+
+def encrypt_payload_data(plain: bytes, access_key: str, mode: Optional[str] = None) -> str:
+    """AES mit access_key[8:24]: ECB + PKCS#7 oder GCM (nonce | ciphertext | tag)"""
+    key = access_key[8:24].encode("utf-8")
+    if mode == MODE_AES_GCM:
+        nonce = os.urandom(12)
+        return base64.b64encode(nonce + AESGCM(key).encrypt(nonce, plain, None)).decode("ascii")
+    padder = padding.PKCS7(128).padder()
+    padded = padder.update(plain) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(key), modes.ECB()).encryptor()
+    return base64.b64encode(encryptor.update(padded) + encryptor.finalize()).decode("ascii")
+
+
+def build_message(message_id: str, protocol: int, data: Dict[str, Any],
+                  access_key: str, mode: Optional[str] = None) -> Dict[str, Any]:
+    """Pulsar Nachricht: payload = base64(JSON mit verschlüsseltem data)"""
+    payload = json.dumps({
+        "protocol": protocol,
+        "pv": "2.0",
+        "t": int(time.time() * 1000),
+        "data": encrypt_payload_data(json.dumps(data).encode("utf-8"), access_key, mode),
+    }).encode("utf-8")
+    message = {"messageId": message_id, "payload": base64.b64encode(payload).decode("ascii")}
+    if mode:
+        message["properties"] = {"em": mode}
+    return message
+
+
+class MockMessageQueue:
+    """Stand-in Server (aiohttp.web)"""
+    
+    def __init__(self, access_id: str, access_key: str, mode: Optional[str] = None):
+        self.access_id = access_id
+        self.access_key = access_key
+        self.mode = mode
+        self.consumers: Set[web.WebSocketResponse] = set()
+        self.sent: List[str] = []
+        self.acked: List[str] = []
+        self.rejected = 0
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._connected = asyncio.Event()
+    
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/ws/v2/consumer/persistent/{tenant}/out/{env}/{sub}", self.consumer)
+        app.router.add_post("/publish", self.publish_handler)
+        return app
+    
+    async def consumer(self, request: web.Request) -> web.StreamResponse:
+        expected = expected_password(self.access_id, self.access_key)
+        if (request.headers.get("username") != self.access_id
+                or request.headers.get("password") != expected
+                or request.match_info["tenant"] != self.access_id):
+            self.rejected += 1
+            return web.Response(status=401, text="unauthorized")
+        
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self.consumers.add(ws)
+        self._connected.set()
+        logger.info(f"Consumer verbunden ({request.match_info['env']})")
+        try:
+            async for msg in ws:
+                if msg.type == web.WSMsgType.TEXT:
+                    ack = json.loads(msg.data).get("messageId")
+                    if ack is not None:
+                        self.acked.append(ack)
+        finally:
+            self.consumers.discard(ws)
+            if not self.consumers:
+                self._connected.clear()
+        return ws
+    
+    async def wait_connected(self, timeout: float = 5.0) -> None:
+        await asyncio.wait_for(self._connected.wait(), timeout)
+    
+    async def disconnect_all(self) -> int:
+        """Trennt alle Consumer (Test für Reconnect), Zurückgegeben: Anzahl"""
+        consumers = list(self.consumers)
+        for ws in consumers:
+            await ws.close()
+        return len(consumers)
+    
+    async def publish(self, device_id: str, status: List[Dict[str, Any]],
+                      protocol: int = PROTOCOL_STATUS, **extra) -> str:
+        """Verschickt eine Meldung an alle Consumer, Zurückgegeben: messageId"""
+        now_ms = int(time.time() * 1000)
+        data = {"devId": device_id, "dataId": f"mock-{next(self._ids)}", **extra}
+        if protocol == PROTOCOL_STATUS:
+            data["status"] = [{"t": now_ms, **item} for item in status]
+        message_id = f"{now_ms}:{len(self.sent)}"
+        message = build_message(message_id, protocol, data, self.access_key, self.mode)
+        text = json.dumps(message)
+        for ws in list(self.consumers):
+            await ws.send_str(text)
+        self.sent.append(message_id)
+        return message_id
+    
+    async def publish_handler(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        message_id = await self.publish(body["device_id"], body.get("status", []),
+                                        int(body.get("protocol", PROTOCOL_STATUS)))
+        return web.json_response({"messageId": message_id, "consumers": len(self.consumers)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tuya MQ stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8285)
+    parser.add_argument("--access-id", required=True)
+    parser.add_argument("--access-key", required=True)
+    parser.add_argument("--gcm", action="store_true", help="aes_gcm statt AES-ECB")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    mock = MockMessageQueue(args.access_id, args.access_key, MODE_AES_GCM if args.gcm else None)
+    web.run_app(mock.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Lokaler Mock der Tuya OpenAPI
+
+Prüft die HMAC-SHA256 Signatur jedes Requests wie die echte Cloud und
+implementiert die Endpunkte, die TuyaCloudClient verwendet:
+
+  GET  /v1.0/token?grant_type=1
+  GET  /v2.0/cloud/thing/batch?device_ids=...
+  GET  /v2.0/cloud/thing/{device_id}/shadow/properties
+  POST /v1.0/iot-03/devices/{device_id}/commands
+  GET  /mock/stats                       (Request-Zähler, ohne Signatur)
+
+Latenz, Fehlerquoten und Geräteanzahl sind einstellbar. Grundlage für
+Offline-Tests und Benchmarks ohne echte Credentials.
+
+Usage:
+  python mock_tuya_cloud.py --devices 50 --latency 0.05 --error-rate 0.01
+  # in config.yaml:
+  cloud:
+    access_id: "mock_access_id"
+    access_key: "mock_access_key_0123456789abcdef"
+    base_url: "http://127.0.0.1:8765"
+"""
+
+import argparse
+import hashlib
+import hmac
+import logging
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+MOCK_ACCESS_ID = "mock_access_id"
+MOCK_ACCESS_KEY = "mock_access_key_0123456789abcdef"
+
+# Tuya Fehlercodes
+CODE_SYSTEM_ERROR = 500
+CODE_SIGN_INVALID = 1004
+CODE_TOKEN_INVALID = 1010
+CODE_TIME_INVALID = 1013
+CODE_PARAM_ILLEGAL = 1109
+CODE_DEVICE_NOT_FOUND = 2001
+CODE_COMMAND_NOT_SUPPORTED = 2008
+
+# Max. Abweichung des Client-Timestamps
+MAX_CLOCK_SKEW_MS = 5 * 60 * 1000
+BATCH_MAX_IDS = 20
+
+# Schema eines Klimageräts (code, dp_id, type, Anfangswert, Wertebereich)
+DEFAULT_PROPERTIES: List[Tuple[str, int, str, Any, Any]] = [
+    ("Power", 1, "bool", False, None),
+    ("temp_set", 2, "value", 220, (160, 320)),
+    ("temp_current", 3, "value", 215, (-200, 600)),
+    ("mode", 4, "enum", "auto", ["auto", "cold", "hot", "wet", "wind"]),
+    ("windspeed", 5, "enum", "auto", ["auto", "low", "mid", "high"]),
+    ("humidity_current", 18, "value", 45, (0, 100)),
+    ("pm25", 101, "value", 12, (0, 999)),
+    ("sleep", 105, "enum", "off", ["off", "normal", "old", "child"]),
+    ("boolCode", 123, "string", "cooling", None),
+    ("dirty_filter", 131, "bool", False, None),
+]
+
+
+class MockDevice:
+    """Zustand eines simulierten Geräts"""
+    
+    def __init__(self, device_id: str, name: str):
+        self.device_id = device_id
+        self.name = name
+        self.local_key = secrets.token_hex(8)
+        now_ms = int(time.time() * 1000)
+        self.properties: Dict[str, Dict[str, Any]] = {
+            code: {"code": code, "dp_id": dp_id, "type": prop_type, "value": value,
+                   "time": now_ms, "custom_name": ""}
+            for code, dp_id, prop_type, value, _ in DEFAULT_PROPERTIES
+        }
+        self.ranges = {code: spec for code, _, _, _, spec in DEFAULT_PROPERTIES}
+        self.lock = threading.Lock()
+    
+    def info(self) -> Dict[str, Any]:
+        """Eintrag wie in /v2.0/cloud/thing/batch"""
+        return {
+            "id": self.device_id,
+            "name": self.name,
+            "category": "kt",
+            "product_id": "mockproduct0001",
+            "product_name": "Mock Climate",
+            "local_key": self.local_key,
+            "ip": "127.0.0.1",
+            "is_online": True,
+            "time_zone": "+01:00",
+        }
+    
+    def check(self, code: str, value: Any) -> Optional[str]:
+        """Prüft einen Command wie die Cloud. Zurückgegeben: Fehlermeldung oder None"""
+        prop = self.properties.get(code)
+        if prop is None:
+            return "command or value not support"
+        prop_type, spec = prop["type"], self.ranges[code]
+        if prop_type == "bool" and not isinstance(value, bool):
+            return "type is incorrect"
+        if prop_type == "value":
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return "type is incorrect"
+            if spec and not spec[0] <= value <= spec[1]:
+                return "param is out of range"
+        if prop_type == "enum" and value not in spec:
+            return "command or value not support"
+        if prop_type == "string" and not isinstance(value, str):
+            return "type is incorrect"
+        return None
+
+
+class MockTuyaCloud(ThreadingHTTPServer):
+    """
+    Mock Server
+    
+    Args:
+        device_count: Anzahl simulierter Geräte (IDs mockdev0000, mockdev0001, ...)
+        latency: Verzögerung pro Request in Sekunden
+        jitter: zusätzliche zufällige Verzögerung (0..jitter)
+        error_rate: Anteil Antworten mit Tuya Code 500 (system error)
+        http_error_rate: Anteil Antworten mit HTTP 503
+        token_ttl: expire_time der ausgegebenen Tokens
+    """
+    
+    daemon_threads = True
+    # Default-Backlog 5 verwirft bei vielen parallelen Verbindungen SYNs (1s Retransmit)
+    request_queue_size = 128
+    
+    def __init__(self, address: str = "127.0.0.1", port: int = 8765,
+                 access_id: str = MOCK_ACCESS_ID, access_key: str = MOCK_ACCESS_KEY,
+                 device_count: int = 1, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, http_error_rate: float = 0.0,
+                 token_ttl: int = 7200, seed: Optional[int] = None):
+        super().__init__((address, port), _MockHandler)
+        self.access_id = access_id
+        self.access_key = access_key
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.token_ttl = token_ttl
+        self.random = random.Random(seed)
+        
+        self.devices: Dict[str, MockDevice] = {}
+        for index in range(device_count):
+            device_id = f"mockdev{index:04d}"
+            self.devices[device_id] = MockDevice(device_id, f"Mock Device {index}")
+        
+        # access_token -> Ablaufzeitpunkt (monotonic)
+        self.tokens: Dict[str, float] = {}
+        self.stats: Counter = Counter()
+        self.stats_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    @property
+    def device_ids(self) -> List[str]:
+        return list(self.devices)
+    
+    def start(self) -> "MockTuyaCloud":
+        """Startet den Server in einem Daemon-Thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-tuya-cloud",
+                                        daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+    
+    def count(self, key: str) -> None:
+        with self.stats_lock:
+            self.stats[key] += 1
+    
+    def expire_tokens(self) -> None:
+        """Alle ausgegebenen Tokens ungültig machen (testet Token-Refresh)"""
+        self.tokens.clear()
+    
+    # ------------------------------------------------------------
+    # Signatur
+    # ------------------------------------------------------------
+    
+    def expected_sign(self, method: str, path: str, body: bytes, t: str,
+                      access_token: str = "") -> str:
+        """
+        Signatur nach Tuya Doku (bewusst unabhängig von client.py implementiert):
+        HMAC(access_key, client_id + access_token + t + METHOD\\nSHA256(body)\\n\\nurl)
+        """
+        content_sha256 = hashlib.sha256(body or b"").hexdigest()
+        string_to_sign = f"{method}\n{content_sha256}\n\n{path}"
+        message = self.access_id + access_token + t + string_to_sign
+        return hmac.new(self.access_key.encode(), message.encode(), hashlib.sha256).hexdigest().upper()
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """Ein HTTP Request"""
+    
+    protocol_version = "HTTP/1.1"
+    # Header und Body werden getrennt geschrieben - ohne TCP_NODELAY
+    # kostet das mit Delayed ACK ~40 ms pro Request
+    disable_nagle_algorithm = True
+    server: MockTuyaCloud
+    
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+    
+    def do_GET(self):
+        self._dispatch("GET", b"")
+    
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._dispatch("POST", self.rfile.read(length) if length else b"")
+    
+    def _send(self, payload: Dict[str, Any], status: int = 200) -> None:
+        body = json_codec.dumps_bytes(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    @staticmethod
+    def _error(code: int, msg: str) -> Dict[str, Any]:
+        return {"success": False, "code": code, "msg": msg, "t": int(time.time() * 1000)}
+    
+    @staticmethod
+    def _ok(result: Any) -> Dict[str, Any]:
+        return {"success": True, "result": result, "t": int(time.time() * 1000)}
+    
+    def _dispatch(self, method: str, body: bytes) -> None:
+        server = self.server
+        url = urlsplit(self.path)
+        
+        if url.path == "/mock/stats":
+            with server.stats_lock:
+                self._send(dict(server.stats))
+            return
+        
+        server.count("requests")
+        delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        
+        if server.http_error_rate and server.random.random() < server.http_error_rate:
+            server.count("injected_http_errors")
+            self._send({"error": "injected"}, status=503)
+            return
+        if server.error_rate and server.random.random() < server.error_rate:
+            server.count("injected_errors")
+            self._send(self._error(CODE_SYSTEM_ERROR, "system error, please contact the admin"))
+            return
+        
+        is_token_request = url.path == "/v1.0/token"
+        error = self._verify(method, body, require_token=not is_token_request)
+        if error:
+            server.count(f"rejected_{error['code']}")
+            self._send(error)
+            return
+        
+        parts = url.path.strip("/").split("/")
+        query = parse_qs(url.query)
+        
+        if is_token_request and method == "GET":
+            endpoint, result = "token", self._token()
+        elif url.path == "/v2.0/cloud/thing/batch" and method == "GET":
+            endpoint, result = "batch", self._batch(query)
+        elif (method == "GET" and len(parts) == 6 and parts[:3] == ["v2.0", "cloud", "thing"]
+              and parts[4:] == ["shadow", "properties"]):
+            endpoint, result = "shadow", self._shadow(parts[3])
+        elif (method == "POST" and len(parts) == 5 and parts[:3] == ["v1.0", "iot-03", "devices"]
+              and parts[4] == "commands"):
+            endpoint, result = "commands", self._commands(parts[3], body)
+        else:
+            self._send({"success": False, "code": 404, "msg": f"uri path invalid: {url.path}"},
+                       status=404)
+            return
+        
+        server.count(endpoint)
+        self._send(result)
+    
+    def _verify(self, method: str, body: bytes, require_token: bool) -> Optional[Dict[str, Any]]:
+        """Prüft client_id, Timestamp, Token und Signatur"""
+        server = self.server
+        headers = self.headers
+        if headers.get("client_id") != server.access_id:
+            return self._error(CODE_SIGN_INVALID, "clientId is invalid")
+        if headers.get("sign_method") != "HMAC-SHA256":
+            return self._error(CODE_SIGN_INVALID, "sign method invalid")
+        
+        t = headers.get("t") or ""
+        if not t.isdigit() or abs(int(t) - time.time() * 1000) > MAX_CLOCK_SKEW_MS:
+            return self._error(CODE_TIME_INVALID, "request time is invalid")
+        
+        access_token = headers.get("access_token") or ""
+        if require_token:
+            expires_at = server.tokens.get(access_token)
+            if expires_at is None or expires_at < time.monotonic():
+                return self._error(CODE_TOKEN_INVALID, "token invalid")
+        
+        expected = server.expected_sign(method, self.path, body, t, access_token)
+        if not hmac.compare_digest(expected, headers.get("sign") or ""):
+            return self._error(CODE_SIGN_INVALID, "sign invalid")
+        return None
+    
+    def _token(self) -> Dict[str, Any]:
+        server = self.server
+        token = secrets.token_hex(16)
+        server.tokens[token] = time.monotonic() + server.token_ttl
+        return self._ok({
+            "access_token": token,
+            "expire_time": server.token_ttl,
+            "refresh_token": secrets.token_hex(16),
+            "uid": "mock-uid",
+        })
+    
+    def _batch(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        ids = [i for i in ",".join(query.get("device_ids", [])).split(",") if i]
+        if not ids or len(ids) > BATCH_MAX_IDS:
+            return self._error(CODE_PARAM_ILLEGAL, "param is illegal ,please check it")
+        devices = self.server.devices
+        return self._ok([devices[i].info() for i in ids if i in devices])
+    
+    def _shadow(self, device_id: str) -> Dict[str, Any]:
+        device = self.server.devices.get(device_id)
+        if device is None:
+            return self._error(CODE_DEVICE_NOT_FOUND, "device is offline")
+        with device.lock:
+            properties = [dict(prop) for prop in device.properties.values()]
+        return self._ok({"properties": properties})
+    
+    def _commands(self, device_id: str, body: bytes) -> Dict[str, Any]:
+        device = self.server.devices.get(device_id)
+        if device is None:
+            return self._error(CODE_DEVICE_NOT_FOUND, "device is offline")
+        try:
+            commands = json_codec.loads(body)["commands"]
+        except (ValueError, KeyError, TypeError):
+            return self._error(CODE_PARAM_ILLEGAL, "param is illegal ,please check it")
+        
+        for command in commands:
+            if command.get("code") not in device.properties:
+                return self._error(CODE_COMMAND_NOT_SUPPORTED, "command or value not support")
+            error = device.check(command.get("code"), command.get("value"))
+            if error:
+                # Bekannter Code, ungültiger Wert: kein Grund, das Schema zu verwerfen
+                return self._error(CODE_PARAM_ILLEGAL, error)
+        
+        now_ms = int(time.time() * 1000)
+        with device.lock:
+            for command in commands:
+                prop = device.properties[command["code"]]
+                prop["value"] = command["value"]
+                prop["time"] = now_ms
+        return self._ok(True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Tuya OpenAPI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--access-id", default=MOCK_ACCESS_ID)
+    parser.add_argument("--access-key", default=MOCK_ACCESS_KEY)
+    parser.add_argument("--devices", type=int, default=1, help="Anzahl Geräte")
+    parser.add_argument("--latency", type=float, default=0.0, help="Sekunden pro Request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="zusätzlich 0..jitter Sekunden")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil Tuya Code 500")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Anteil HTTP 503")
+    parser.add_argument("--token-ttl", type=int, default=7200)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    server = MockTuyaCloud(args.host, args.port, args.access_id, args.access_key,
+                           device_count=args.devices, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, http_error_rate=args.http_error_rate,
+                           token_ttl=args.token_ttl)
+    logger.info(f"Mock Tuya Cloud auf {server.base_url} ({len(server.devices)} Geräte)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
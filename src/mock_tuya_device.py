@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Lokaler Tuya Geräte-Emulator (LAN Protokoll 3.3 / 3.4)
+
+Beantwortet DP_QUERY/CONTROL (3.3) bzw. Session-Key-Aushandlung,
+DP_QUERY_NEW/CONTROL_NEW (3.4) wie ein echtes Gerät und schickt nach
+jedem CONTROL eine STATUS Meldung hinterher.
+Zum Testen von local_transport ohne echtes Gerät.
+
+Framing und Verschlüsselung sind hier bewusst unabhängig von
+local_transport implementiert (Gerätesicht), damit Fehler im Client
+nicht vom Emulator gespiegelt werden. Beide Seiten werden in
+tests/test_local_transport.py gegen mit tinytuya erzeugte Frames geprüft.
+
+Benötigt: pip install cryptography
+
+Usage:
+  python mock_tuya_device.py --device-id dev1 --local-key 0123456789abcdef --version 3.4
+  # in config.yaml: devices: [{device_id: dev1, ip: 127.0.0.1, local_key: ..., version: "3.4"}]
+"""
+
+import argparse
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+import socketserver
+import struct
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 6668
+
+# Commands (Gerätesicht)
+SESS_KEY_NEG_START = 0x03
+SESS_KEY_NEG_RESP = 0x04
+SESS_KEY_NEG_FINISH = 0x05
+CONTROL = 0x07
+STATUS = 0x08
+HEART_BEAT = 0x09
+DP_QUERY = 0x0A
+CONTROL_NEW = 0x0D
+DP_QUERY_NEW = 0x10
+
+# Antworten auf diese Commands tragen keinen Versions-Header
+_PLAIN_REPLY_CMDS = {DP_QUERY, DP_QUERY_NEW, HEART_BEAT, SESS_KEY_NEG_RESP}
+
+
+class DeviceError(Exception):
+    """Frame oder Command vom Gerät abgelehnt"""
+
+
+# ============================================================
+# Framing und Verschlüsselung (Gerätesicht)
+# ============================================================
+
+def pack_frame(seqno: int, cmd: int, payload: bytes, hmac_key: Optional[bytes] = None,
+               retcode: int = 0) -> bytes:
+    """Frame vom Gerät: Header, retcode, Payload, crc32/HMAC, Suffix"""
+    body = struct.pack(">I", retcode) + payload
+    check_size = 32 if hmac_key else 4
+    data = struct.pack(">IIII", 0x000055AA, seqno, cmd, len(body) + check_size + 4) + body
+    if hmac_key:
+        data += hmac.new(hmac_key, data, hashlib.sha256).digest()
+    else:
+        data += struct.pack(">I", binascii.crc32(data) & 0xFFFFFFFF)
+    return data + struct.pack(">I", 0x0000AA55)
+
+
+def unpack_frame(frame: bytes, hmac_key: Optional[bytes] = None) -> Tuple[int, int, bytes]:
+    """
+    Frame vom Client prüfen und zerlegen (ohne retcode)
+    
+    Returns:
+        (seqno, cmd, payload)
+    """
+    prefix, seqno, cmd, length = struct.unpack(">IIII", frame[:16])
+    check_size = 32 if hmac_key else 4
+    if prefix != 0x000055AA or len(frame) != 16 + length or length < check_size + 4:
+        raise DeviceError("Ungültiger Frame")
+    if frame[-4:] != b"\x00\x00\xaa\x55":
+        raise DeviceError("Ungültiger Suffix")
+    body, check = frame[:-check_size - 4], frame[-check_size - 4:-4]
+    if hmac_key:
+        valid = hmac.compare_digest(hmac.new(hmac_key, body, hashlib.sha256).digest(), check)
+    else:
+        valid = struct.unpack(">I", check)[0] == binascii.crc32(body) & 0xFFFFFFFF
+    if not valid:
+        raise DeviceError("Prüfsumme ungültig")
+    return seqno, cmd, body[16:]
+
+
+def _read_frame(sock) -> bytes:
+    header = _recv(sock, 16)
+    length = struct.unpack(">I", header[12:16])[0]
+    if length > 0xFFFF:
+        raise DeviceError(f"Frame zu groß ({length} Bytes)")
+    return header + _recv(sock, length)
+
+
+def _recv(sock, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Client hat die Verbindung geschlossen")
+        data += chunk
+    return data
+
+
+def encrypt(key: bytes, data: bytes, pad: bool = True) -> bytes:
+    """AES-128-ECB mit PKCS#7 Padding"""
+    if pad:
+        data += bytes([16 - len(data) % 16]) * (16 - len(data) % 16)
+    encryptor = Cipher(algorithms.AES(key), modes.ECB()).encryptor()
+    return encryptor.update(data) + encryptor.finalize()
+
+
+def decrypt(key: bytes, data: bytes) -> bytes:
+    decryptor = Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+    plain = decryptor.update(data) + decryptor.finalize()
+    if not plain or not 0 < plain[-1] <= 16:
+        raise DeviceError("Ungültiges Padding")
+    return plain[:-plain[-1]]
+
+
+def version_header(version: str) -> bytes:
+    """"3.3" bzw. "3.4" + 12 Nullbytes"""
+    return version.encode("ascii") + b"\0" * 12
+
+
+def encode_reply(version: str, key: bytes, cmd: int, data: bytes) -> bytes:
+    """Antwort-Payload verschlüsseln (key: local_key bei 3.3, Session Key bei 3.4)"""
+    header = b"" if cmd in _PLAIN_REPLY_CMDS else version_header(version)
+    if version == "3.4":
+        return encrypt(key, header + data)
+    return header + encrypt(key, data)
+
+
+def decode_request(version: str, key: bytes, payload: bytes) -> Dict[str, Any]:
+    """Request-Payload entschlüsseln (Versions-Header ist optional)"""
+    header = version_header(version)
+    if version == "3.4":
+        plain = decrypt(key, payload)
+        if plain.startswith(header):
+            plain = plain[len(header):]
+    else:
+        if payload.startswith(header):
+            payload = payload[len(header):]
+        plain = decrypt(key, payload)
+    return json_codec.loads(plain) if plain else {}
+
+
+def derive_session_key(local_key: bytes, client_nonce: bytes, device_nonce: bytes) -> bytes:
+    """3.4 Session Key: AES-ECB(local_key, client_nonce XOR device_nonce)"""
+    return encrypt(local_key, bytes(a ^ b for a, b in zip(client_nonce, device_nonce)), pad=False)
+
+
+# ============================================================
+# Server
+# ============================================================
+
+class MockTuyaDevice(socketserver.ThreadingTCPServer):
+    """
+    Emuliertes Gerät mit DP-Zustand
+    
+    Args:
+        dps: Anfangszustand {dp_id (str): Wert}
+        latency: künstliche Verzögerung pro Antwort in Sekunden
+    """
+    
+    allow_reuse_address = True
+    daemon_threads = True
+    
+    def __init__(self, device_id: str, local_key: str, version: str = "3.3",
+                 address: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 dps: Optional[Dict[str, Any]] = None, latency: float = 0.0):
+        super().__init__((address, port), _DeviceHandler)
+        self.device_id = device_id
+        self.local_key = local_key.encode("latin1")
+        self.version = str(version)
+        self.latency = latency
+        self.dps: Dict[str, Any] = dict(dps or {"1": False, "2": 20, "4": "auto"})
+        self.dps_lock = threading.Lock()
+        self.requests = 0
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+    
+    def start(self) -> "MockTuyaDevice":
+        """Startet den Server in einem Daemon-Thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-tuya-device",
+                                        daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _DeviceHandler(socketserver.BaseRequestHandler):
+    """Eine Client-Verbindung"""
+    
+    def setup(self):
+        server: MockTuyaDevice = self.server
+        self.is_34 = server.version == "3.4"
+        self.seqno = 0
+        self.session_key: Optional[bytes] = None
+        self.client_nonce: Optional[bytes] = None
+        self.device_nonce: Optional[bytes] = None
+    
+    def _frame_key(self) -> Optional[bytes]:
+        """HMAC Schlüssel: 3.4 vor der Aushandlung local_key, danach Session Key"""
+        if not self.is_34:
+            return None
+        return self.session_key or self.server.local_key
+    
+    def _payload_key(self) -> bytes:
+        return self.session_key if self.is_34 else self.server.local_key
+    
+    def handle(self):
+        server: MockTuyaDevice = self.server
+        while True:
+            try:
+                seqno, cmd, payload = unpack_frame(_read_frame(self.request), self._frame_key())
+            except (ConnectionError, OSError):
+                return
+            except DeviceError as e:
+                logger.warning(f"Ungültiger Frame: {e}")
+                return
+            
+            server.requests += 1
+            if server.latency:
+                time.sleep(server.latency)
+            try:
+                self.dispatch(cmd, payload)
+            except (DeviceError, ValueError) as e:
+                logger.warning(f"Abgelehnt: {e}")
+                self.reply(cmd, b"", retcode=1)
+    
+    def reply(self, cmd: int, payload: bytes, retcode: int = 0) -> None:
+        self.seqno += 1
+        self.request.sendall(pack_frame(self.seqno, cmd, payload, self._frame_key(), retcode))
+    
+    def reply_json(self, cmd: int, body: Dict[str, Any]) -> None:
+        data = json_codec.dumps_bytes(body)
+        self.reply(cmd, encode_reply(self.server.version, self._payload_key(), cmd, data))
+    
+    def dispatch(self, cmd: int, payload: bytes) -> None:
+        server: MockTuyaDevice = self.server
+        key = server.local_key
+        
+        if cmd == SESS_KEY_NEG_START and self.is_34:
+            self.client_nonce = decrypt(key, payload)
+            self.device_nonce = os.urandom(16)
+            proof = hmac.new(key, self.client_nonce, hashlib.sha256).digest()
+            self.reply(SESS_KEY_NEG_RESP, encrypt(key, self.device_nonce + proof))
+            return
+        
+        if cmd == SESS_KEY_NEG_FINISH and self.is_34:
+            expected = hmac.new(key, self.device_nonce or b"", hashlib.sha256).digest()
+            if decrypt(key, payload) != expected:
+                raise DeviceError("Session Key Bestätigung ungültig")
+            self.session_key = derive_session_key(key, self.client_nonce, self.device_nonce)
+            return
+        
+        if cmd == HEART_BEAT:
+            self.reply(HEART_BEAT, b"")
+            return
+        
+        if self.is_34 and self.session_key is None:
+            raise DeviceError("Keine Session Key Aushandlung")
+        body = decode_request(server.version, self._payload_key(), payload)
+        
+        if cmd in (DP_QUERY, DP_QUERY_NEW):
+            with server.dps_lock:
+                dps = dict(server.dps)
+            self.reply_json(cmd, {"devId": server.device_id, "dps": dps})
+            return
+        
+        if cmd in (CONTROL, CONTROL_NEW):
+            dps = body.get("dps") if cmd == CONTROL else (body.get("data") or {}).get("dps")
+            if not isinstance(dps, dict):
+                raise DeviceError("CONTROL ohne dps")
+            unknown = [dp for dp in dps if dp not in server.dps]
+            if unknown:
+                raise DeviceError(f"Unbekannte DPs {unknown}")
+            with server.dps_lock:
+                server.dps.update(dps)
+            self.reply(cmd, b"")
+            # Statusmeldung wie ein echtes Gerät
+            if self.is_34:
+                self.reply_json(STATUS, {"protocol": 4, "t": int(time.time()), "data": {"dps": dps}})
+            else:
+                self.reply_json(STATUS, {"devId": server.device_id, "dps": dps,
+                                         "t": int(time.time())})
+            return
+        
+        raise DeviceError(f"Command {cmd:#x} nicht unterstützt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tuya LAN device emulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--device-id", required=True)
+    parser.add_argument("--local-key", required=True, help="16 Zeichen")
+    parser.add_argument("--version", default="3.3", choices=["3.3", "3.4"])
+    parser.add_argument("--latency", type=float, default=0.0, help="Sekunden pro Antwort")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    device = MockTuyaDevice(args.device_id, args.local_key, args.version,
+                            args.host, args.port, latency=args.latency)
+    logger.info(f"Emuliere {args.device_id} (v{args.version}) auf {args.host}:{device.port}")
+    device.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
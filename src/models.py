@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Kompaktes Property-Modell
+
+Statt pro Abfrage ein 6-Key Dict je Property zu bauen, wird das statische
+Schema (code, dp_id, type, custom_name) pro Gerät einmal gehalten und nur
+noch Wert und Zeitstempel pro Abfrage neu erzeugt. PropertyValue bleibt
+über das Mapping-Interface mit dem bisherigen Dict-Format kompatibel:
+prop["value"], prop.get("type"), dict(prop), {**prop} funktionieren weiter.
+
+PropertyValue ist kein dict: json.dumps braucht prop.to_dict() oder
+json.dumps(props, default=to_jsonable). copy, deepcopy und pickle
+funktionieren direkt.
+"""
+
+import copy
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# Reihenfolge der Keys wie im bisherigen Dict-Format
+PROPERTY_KEYS: Tuple[str, ...] = ("code", "dp_id", "type", "value", "time", "custom_name")
+
+# Strings bis zu dieser Länge werden interniert (Enum-Werte wie "auto", "cool")
+_INTERN_MAX_LEN = 32
+
+
+def _intern(value: Any) -> Any:
+    if isinstance(value, str) and len(value) <= _INTERN_MAX_LEN:
+        return sys.intern(value)
+    return value
+
+
+class PropertySchema:
+    """Statischer Teil einer Property (unveränderlich)"""
+    
+    __slots__ = ("code", "dp_id", "type", "custom_name")
+    
+    def __init__(self, code: str, dp_id: Optional[int], type: Optional[str],
+                 custom_name: Optional[str] = None):
+        object.__setattr__(self, "code", _intern(code))
+        object.__setattr__(self, "dp_id", dp_id)
+        object.__setattr__(self, "type", _intern(type))
+        object.__setattr__(self, "custom_name", custom_name)
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} ist unveränderlich")
+    
+    # Unveränderlich: Kopien sind das Objekt selbst, pickle über __init__
+    def __reduce__(self):
+        return (PropertySchema, (self.code, self.dp_id, self.type, self.custom_name))
+    
+    def __copy__(self) -> "PropertySchema":
+        return self
+    
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "PropertySchema":
+        return self
+    
+    def matches(self, raw: Dict[str, Any]) -> bool:
+        """True wenn die Roh-Property aus der Cloud dasselbe Schema hat"""
+        return (self.dp_id == raw.get("dp_id")
+                and self.type == raw.get("type")
+                and self.custom_name == raw.get("custom_name"))
+    
+    def __repr__(self) -> str:
+        return f"PropertySchema({self.code!r}, dp_id={self.dp_id!r}, type={self.type!r})"
+
+
+class PropertyValue(Mapping):
+    """
+    Wert einer Property zu einem Zeitpunkt (unveränderlich)
+    
+    Dict-kompatible Sicht mit den Keys aus PROPERTY_KEYS. Für JSON
+    to_dict() bzw. default=to_jsonable verwenden.
+    """
+    
+    __slots__ = ("schema", "value", "time")
+    
+    def __init__(self, schema: PropertySchema, value: Any, time: Optional[int]):
+        object.__setattr__(self, "schema", schema)
+        object.__setattr__(self, "value", _intern(value))
+        object.__setattr__(self, "time", time)
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} ist unveränderlich")
+    
+    def __reduce__(self):
+        return (PropertyValue, (self.schema, self.value, self.time))
+    
+    def __copy__(self) -> "PropertyValue":
+        return self
+    
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "PropertyValue":
+        # Der Wert kann eine Liste oder ein Dict aus der Cloud sein
+        value = copy.deepcopy(self.value, memo)
+        if value is self.value:
+            return self
+        return PropertyValue(self.schema, value, self.time)
+    
+    @property
+    def code(self) -> str:
+        return self.schema.code
+    
+    @property
+    def dp_id(self) -> Optional[int]:
+        return self.schema.dp_id
+    
+    @property
+    def type(self) -> Optional[str]:
+        return self.schema.type
+    
+    @property
+    def custom_name(self) -> Optional[str]:
+        return self.schema.custom_name
+    
+    def __getitem__(self, key: str) -> Any:
+        if key == "value":
+            return self.value
+        if key == "time":
+            return self.time
+        if key in PROPERTY_KEYS:
+            return getattr(self.schema, key)
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(PROPERTY_KEYS)
+    
+    def __len__(self) -> int:
+        return len(PROPERTY_KEYS)
+    
+    def __contains__(self, key: object) -> bool:
+        return key in PROPERTY_KEYS
+    
+    def replace(self, value: Any, time: Optional[int]) -> "PropertyValue":
+        """Neuer Wert mit gleichem Schema"""
+        return PropertyValue(self.schema, value, time)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Bisheriges Dict-Format (z.B. für JSON)"""
+        schema = self.schema
+        return {
+            "code": schema.code,
+            "dp_id": schema.dp_id,
+            "type": schema.type,
+            "value": self.value,
+            "time": self.time,
+            "custom_name": schema.custom_name,
+        }
+    
+    def __repr__(self) -> str:
+        return f"PropertyValue({self.schema.code!r}, value={self.value!r}, time={self.time!r})"
+
+
+class DeviceSchema(Mapping):
+    """
+    Statisches Schema eines Geräts: code -> PropertySchema
+    
+    Wird pro Gerät gehalten und bei jeder Abfrage wiederverwendet;
+    nur geänderte Properties bekommen ein neues PropertySchema.
+    """
+    
+    __slots__ = ("_properties",)
+    
+    def __init__(self, properties: Dict[str, PropertySchema]):
+        self._properties = properties
+    
+    @classmethod
+    def merge(cls, previous: Optional["DeviceSchema"],
+              raw_properties: Iterable[Dict[str, Any]]) -> "DeviceSchema":
+        """
+        Schema aus einer shadow/properties Response
+        
+        Unveränderte Einträge (und bei keiner Änderung das ganze Schema)
+        werden aus previous übernommen.
+        """
+        old = previous._properties if previous is not None else {}
+        properties: Dict[str, PropertySchema] = {}
+        unchanged = True
+        for raw in raw_properties:
+            code = raw.get("code")
+            schema = old.get(code)
+            if schema is None or not schema.matches(raw):
+                schema = PropertySchema(code, raw.get("dp_id"), raw.get("type"),
+                                        raw.get("custom_name"))
+                unchanged = False
+            properties[schema.code] = schema
+        
+        if previous is not None and unchanged and len(properties) == len(old):
+            return previous
+        return cls(properties)
+    
+    def __getitem__(self, code: str) -> PropertySchema:
+        return self._properties[code]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._properties)
+    
+    def __len__(self) -> int:
+        return len(self._properties)
+    
+    def by_dp_id(self) -> Dict[int, PropertySchema]:
+        """dp_id -> PropertySchema"""
+        return {
+            schema.dp_id: schema for schema in self._properties.values()
+            if schema.dp_id is not None
+        }
+
+
+def replace_value(prop: Mapping, value: Any, time: Optional[int]) -> Mapping:
+    """Kopie einer Property (PropertyValue oder Dict) mit neuem Wert"""
+    if isinstance(prop, PropertyValue):
+        return prop.replace(value, time)
+    return {**prop, "value": value, "time": time}
+
+
+def to_jsonable(obj: Any) -> Any:
+    """JSON-Fallback für PropertyValue und andere Mappings"""
+    if isinstance(obj, PropertyValue):
+        return obj.to_dict()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
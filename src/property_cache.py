@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+In-Process Cache für Device Properties
+
+Pro Gerät wird das Ergebnis von get_device_properties mit Zeitstempel
+gehalten. Einträge verfallen nach ttl Sekunden, bei mehr als
+max_devices Geräten wird das am längsten nicht genutzte verdrängt (LRU).
+
+ShadowTracker führt pro Gerät eine monoton steigende Version und liefert
+nur die Properties, die sich seit einer bekannten Version geändert haben.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from models import replace_value
+
+
+class PropertyCache:
+    """
+    Thread-sicherer TTL/LRU Cache: device_id -> Properties
+    
+    Config (alle Schlüssel optional):
+        cache:
+          ttl: 5              # Sekunden, 0 = Cache aus
+          max_devices: 256
+    """
+    
+    def __init__(self, ttl: float = 5.0, max_devices: int = 256):
+        self.ttl = float(ttl)
+        self.max_devices = max(1, int(max_devices))
+        
+        self._lock = threading.Lock()
+        # device_id -> (monotonic Zeitpunkt, Properties)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "PropertyCache":
+        """Erstellt Cache aus dem 'cache' Abschnitt der Config"""
+        config = config or {}
+        return cls(
+            ttl=config.get("ttl", 5.0),
+            max_devices=config.get("max_devices", 256),
+        )
+    
+    def get(self, device_id: str, max_staleness: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Properties aus dem Cache, falls nicht älter als max_staleness
+        
+        Args:
+            max_staleness: Max. Alter in Sekunden (None = ttl, 0 = nie aus Cache)
+        
+        Returns:
+            Kopie des Property-Dicts oder None
+        """
+        max_age = self.ttl if max_staleness is None else max_staleness
+        if max_age <= 0:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is None or time.monotonic() - entry[0] > max_age:
+                return None
+            self._entries.move_to_end(device_id)
+            return dict(entry[1])
+    
+    def put(self, device_id: str, properties: Dict[str, Any]) -> None:
+        """Speichert frisch geholte Properties eines Geräts"""
+        with self._lock:
+            self._entries[device_id] = (time.monotonic(), dict(properties))
+            self._entries.move_to_end(device_id)
+            while len(self._entries) > self.max_devices:
+                self._entries.popitem(last=False)
+    
+    def update(self, device_id: str, values: Dict[str, Any],
+               time_ms: Optional[int] = None, refresh: bool = False) -> None:
+        """
+        Write-Through nach erfolgreichem Setzen
+        
+        Aktualisiert value/time der gesetzten Properties, falls das Gerät
+        im Cache ist. Das Alter des Eintrags bleibt unverändert, außer bei
+        refresh=True (Push-Meldungen: der Rest des Eintrags ist weiter aktuell).
+        """
+        now_ms = time_ms or int(time.time() * 1000)
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is None:
+                return
+            
+            fetched_at, properties = entry
+            properties = dict(properties)
+            for code, value in values.items():
+                if code in properties:
+                    # Neues Objekt statt Mutation: ausgegebene Kopien bleiben stabil
+                    properties[code] = replace_value(properties[code], value, now_ms)
+            if refresh:
+                fetched_at = time.monotonic()
+            self._entries[device_id] = (fetched_at, properties)
+    
+    def invalidate(self, device_id: Optional[str] = None) -> None:
+        """Verwirft Cache eines Geräts (oder aller Geräte)"""
+        with self._lock:
+            if device_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(device_id, None)
+    
+    def age(self, device_id: str) -> Optional[float]:
+        """Alter des Eintrags in Sekunden oder None"""
+        with self._lock:
+            entry = self._entries.get(device_id)
+            return time.monotonic() - entry[0] if entry else None
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class _DeviceShadow:
+    """Letzter bekannter Stand eines Geräts für ShadowTracker"""
+    
+    __slots__ = ("version", "properties", "changed", "removed")
+    
+    def __init__(self):
+        self.version = 0
+        self.properties: Dict[str, Dict[str, Any]] = {}
+        # code -> Version der letzten Änderung
+        self.changed: Dict[str, int] = {}
+        # code -> Version, in der die Property verschwunden ist
+        self.removed: Dict[str, int] = {}
+
+
+class ShadowTracker:
+    """
+    Versionierte Änderungsverfolgung pro Gerät
+    
+    Jede Beobachtung, die mindestens eine Property (value oder time)
+    ändert, erhöht die Version des Geräts um eins. Aufrufer merken sich
+    die zuletzt gesehene Version und fragen nur die Änderungen seitdem ab.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices: Dict[str, _DeviceShadow] = {}
+    
+    def observe(self, device_id: str, properties: Dict[str, Any],
+                partial: bool = False) -> int:
+        """
+        Übernimmt einen neuen Stand
+        
+        Args:
+            properties: {code: property dict} wie get_device_properties
+            partial: True wenn nur einzelne Properties gemeldet werden
+                     (fehlende Codes gelten dann nicht als entfernt)
+        
+        Returns:
+            Aktuelle Version des Geräts
+        """
+        with self._lock:
+            shadow = self._devices.get(device_id)
+            if shadow is None:
+                shadow = self._devices[device_id] = _DeviceShadow()
+            
+            changed = [
+                code for code, prop in properties.items()
+                if self._differs(shadow.properties.get(code), prop)
+            ]
+            removed = [] if partial else [
+                code for code in shadow.properties if code not in properties
+            ]
+            if not changed and not removed:
+                return shadow.version
+            
+            shadow.version += 1
+            version = shadow.version
+            for code in changed:
+                shadow.properties[code] = properties[code]
+                shadow.changed[code] = version
+                shadow.removed.pop(code, None)
+            for code in removed:
+                del shadow.properties[code]
+                shadow.changed.pop(code, None)
+                shadow.removed[code] = version
+            return version
+    
+    def update_values(self, device_id: str, values: Dict[str, Any],
+                      time_ms: Optional[int] = None) -> int:
+        """
+        Übernimmt einzelne neue Werte (z.B. nach erfolgreichem Setzen)
+        
+        Nur bereits bekannte Properties werden berücksichtigt; time wird
+        auf time_ms bzw. jetzt gesetzt. Returns: aktuelle Version
+        """
+        now_ms = time_ms or int(time.time() * 1000)
+        with self._lock:
+            shadow = self._devices.get(device_id)
+            known = shadow.properties if shadow else {}
+            updates = {
+                code: replace_value(known[code], value, now_ms)
+                for code, value in values.items() if code in known
+            }
+        if not updates:
+            return self.version(device_id)
+        return self.observe(device_id, updates, partial=True)
+    
+    @staticmethod
+    def _differs(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> bool:
+        if old is None:
+            return True
+        return old.get("value") != new.get("value") or old.get("time") != new.get("time")
+    
+    def version(self, device_id: str) -> int:
+        """Aktuelle Version (0 = noch nichts beobachtet)"""
+        with self._lock:
+            shadow = self._devices.get(device_id)
+            return shadow.version if shadow else 0
+    
+    def changes(self, device_id: str, since: int = 0) -> Dict[str, Any]:
+        """
+        Änderungen seit Version since
+        
+        Ist since größer als die aktuelle Version (z.B. nach Neustart des
+        Prozesses), wird der komplette Stand mit "full": True geliefert.
+        
+        Returns:
+            {"version": int, "changes": {code: prop}, "removed": [code], "full": bool}
+        """
+        with self._lock:
+            shadow = self._devices.get(device_id)
+            if shadow is None:
+                return {"version": 0, "changes": {}, "removed": [], "full": True}
+            
+            full = since <= 0 or since > shadow.version
+            if full:
+                changes = dict(shadow.properties)
+                removed = []
+            else:
+                changes = {
+                    code: shadow.properties[code]
+                    for code, version in shadow.changed.items()
+                    if version > since
+                }
+                removed = [code for code, version in shadow.removed.items() if version > since]
+            return {
+                "version": shadow.version,
+                "changes": changes,
+                "removed": removed,
+                "full": full,
+            }
+    
+    def forget(self, device_id: str) -> None:
+        """Verwirft den Stand eines Geräts"""
+        with self._lock:
+            self._devices.pop(device_id, None)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter für ausgehende Tuya Cloud Requests
+
+Token Buckets pro Region und Endpoint-Klasse (token / read / write).
+Überschreitet ein Burst das Limit, warten Aufrufer in Reihenfolge statt
+abgelehnt zu werden. Ein optionales Tages-Kontingent (daily_quota) wird
+dagegen hart durchgesetzt: ist es verbraucht, werden weitere Requests
+bis Mitternacht (lokale Zeit) abgelehnt.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Endpoint-Klassen
+TOKEN = "token"
+READ = "read"
+WRITE = "write"
+
+# Defaults pro Endpoint-Klasse (überschreibbar über 'rate_limit' in config.yaml)
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    TOKEN: {"rate": 1.0, "burst": 2},
+    READ: {"rate": 10.0, "burst": 20},
+    WRITE: {"rate": 5.0, "burst": 10},
+}
+
+
+def classify_endpoint(method: str, path: str) -> str:
+    """Ordnet einen Request einer Endpoint-Klasse zu"""
+    if path.startswith("/v1.0/token"):
+        return TOKEN
+    if method == "GET":
+        return READ
+    return WRITE
+
+
+class TokenBucket:
+    """
+    Thread-sicherer Token Bucket
+    
+    Jeder Aufruf reserviert sofort ein Token. Ist der Bucket leer, wird
+    der Kontostand negativ und der Aufrufer wartet, bis sein Token
+    nachgefüllt ist. So bleibt die Reihenfolge der Aufrufer erhalten.
+    
+    Mit max_wait wird kein Token reserviert, wenn die Wartezeit länger
+    wäre (z.B. weil sonst die Deadline des Requests überschritten würde).
+    Ebenso nicht, wenn daily_quota für heute verbraucht ist.
+    """
+    
+    def __init__(self, rate: float, burst: float, daily_quota: Optional[int] = None):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.daily_quota = daily_quota
+        
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        
+        # Statistik
+        self._waiting = 0
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._rejected = 0
+        self._day = time.strftime("%Y-%m-%d")
+        self._calls_today = 0
+    
+    def _reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Reserviert ein Token
+        
+        Zurückgegeben: Wartezeit in Sekunden, oder None wenn sie max_wait
+        überschreiten würde oder das Tages-Kontingent verbraucht ist (dann
+        wird nichts reserviert)
+        """
+        with self._lock:
+            if self._quota_used_up():
+                self._rejected += 1
+                return None
+            
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            delay = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if max_wait is not None and delay > max_wait:
+                self._rejected += 1
+                return None
+            self._tokens -= 1
+            if delay > 0:
+                self._waiting += 1
+            
+            self._acquired += 1
+            self._total_wait += delay
+            self._max_wait = max(self._max_wait, delay)
+            self._count_call()
+            return delay
+    
+    def _quota_used_up(self) -> bool:
+        """True wenn daily_quota heute verbraucht ist (mit _lock aufrufen)"""
+        today = time.strftime("%Y-%m-%d")
+        if today != self._day:
+            self._day = today
+            self._calls_today = 0
+        return bool(self.daily_quota) and self._calls_today >= self.daily_quota
+    
+    def _count_call(self) -> None:
+        """Zählt Aufrufe pro Tag und warnt, wenn das Kontingent damit verbraucht ist"""
+        self._calls_today += 1
+        if self.daily_quota and self._calls_today == self.daily_quota:
+            logger.warning(f"Tages-Kontingent verbraucht: {self._calls_today} Requests, "
+                           f"weitere werden bis Mitternacht abgelehnt")
+    
+    def quota_exhausted(self) -> bool:
+        """True wenn weitere Requests heute am Tages-Kontingent scheitern"""
+        with self._lock:
+            return self._quota_used_up()
+    
+    def _done(self, delay: Optional[float]) -> None:
+        if delay:
+            with self._lock:
+                self._waiting -= 1
+    
+    def acquire(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Wartet (blockierend) auf ein Token
+        
+        Zurückgegeben: Wartezeit, None wenn sie max_wait überschreiten würde
+        """
+        delay = self._reserve(max_wait)
+        if delay is None:
+            return None
+        try:
+            if delay > 0:
+                time.sleep(delay)
+        finally:
+            self._done(delay)
+        return delay
+    
+    async def acquire_async(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Wartet (asyncio) auf ein Token. Zurückgegeben: wie acquire()"""
+        import asyncio
+        
+        delay = self._reserve(max_wait)
+        if delay is None:
+            return None
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+        finally:
+            self._done(delay)
+        return delay
+    
+    def stats(self) -> Dict[str, Any]:
+        """Aktuelle Queue-Länge und Wartezeiten"""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "queue_depth": self._waiting,
+                "acquired": self._acquired,
+                "total_wait": round(self._total_wait, 3),
+                "avg_wait": round(self._total_wait / self._acquired, 4) if self._acquired else 0.0,
+                "max_wait": round(self._max_wait, 3),
+                "rejected": self._rejected,
+                "calls_today": self._calls_today,
+                "daily_quota": self.daily_quota,
+            }
+
+
+class RateLimiter:
+    """
+    Token Buckets pro (Region, Endpoint-Klasse)
+    
+    Config (alle Schlüssel optional):
+        rate_limit:
+          enabled: true
+          read:  {rate: 10, burst: 20, daily_quota: 50000}
+          write: {rate: 5, burst: 10}
+          token: {rate: 1, burst: 2}
+    
+    daily_quota ist ein hartes Limit pro Region und Endpoint-Klasse.
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.enabled = bool(config.get("enabled", True))
+        
+        self._limits: Dict[str, Dict[str, Any]] = {}
+        for endpoint_class, defaults in DEFAULT_LIMITS.items():
+            limits = dict(defaults)
+            limits.update(config.get(endpoint_class, {}) or {})
+            self._limits[endpoint_class] = limits
+        
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    def bucket(self, region: str, endpoint_class: str) -> TokenBucket:
+        """Bucket für Region und Endpoint-Klasse (wird bei Bedarf erstellt)"""
+        key = (region, endpoint_class)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    limits = self._limits.get(endpoint_class, self._limits[READ])
+                    bucket = TokenBucket(
+                        limits["rate"], limits["burst"], limits.get("daily_quota")
+                    )
+                    self._buckets[key] = bucket
+        return bucket
+    
+    def acquire(self, region: str, method: str, path: str,
+                max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Wartet bis der Request gesendet werden darf
+        
+        Args:
+            max_wait: Max. Wartezeit in Sekunden (None = unbegrenzt)
+        
+        Returns:
+            Wartezeit, oder None wenn sie max_wait überschreiten würde
+            oder daily_quota verbraucht ist (es wird dann kein Token
+            verbraucht, siehe quota_exhausted)
+        """
+        if not self.enabled:
+            return 0.0
+        delay = self.bucket(region, classify_endpoint(method, path)).acquire(max_wait)
+        if delay is None:
+            logger.debug("Rate Limit: %s %s würde länger als %.3fs warten", method, path, max_wait)
+        elif delay > 0:
+            logger.debug("Rate Limit: %s %s wartet %.3fs", method, path, delay)
+        return delay
+    
+    async def acquire_async(self, region: str, method: str, path: str,
+                            max_wait: Optional[float] = None) -> Optional[float]:
+        """asyncio Variante von acquire()"""
+        if not self.enabled:
+            return 0.0
+        return await self.bucket(region, classify_endpoint(method, path)).acquire_async(max_wait)
+    
+    def quota_exhausted(self, region: str, method: str, path: str) -> bool:
+        """True wenn acquire() für diesen Request am Tages-Kontingent scheitert"""
+        if not self.enabled:
+            return False
+        return self.bucket(region, classify_endpoint(method, path)).quota_exhausted()
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistik aller Buckets, Schlüssel '<region>/<klasse>'"""
+        return {
+            f"{region}/{endpoint_class}": bucket.stats()
+            for (region, endpoint_class), bucket in sorted(self._buckets.items())
+        }
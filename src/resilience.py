@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Fehlerbehandlung für Tuya Cloud Requests
+
+RetryPolicy: Wiederholung mit exponentiellem Backoff und Jitter, kennt
+die wiederholbaren Tuya Fehlercodes und hält eine Gesamt-Deadline ein.
+
+CircuitBreaker: weist Requests sofort ab, solange die Cloud wiederholt
+nicht erreichbar ist, und prüft die Erholung mit einzelnen Probes.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    Retry-Regeln für _request
+    
+    Config (alle Schlüssel optional):
+        retry:
+          max_attempts: 3     # Versuche insgesamt (1 = kein Retry)
+          base_delay: 0.2     # Sekunden, verdoppelt pro Versuch
+          max_delay: 2.0      # Obergrenze pro Pause
+          deadline: 15.0      # Gesamtzeit inkl. aller Versuche
+    """
+    
+    # Tuya Fehlercodes, bei denen ein erneuter Versuch sinnvoll ist
+    # 500: system error, 1013: request time invalid (Timestamp zu alt)
+    RETRYABLE_CODES = {500, 1013}
+    # Token abgelaufen/ungültig: Token erneuern und Request einmal wiederholen
+    # 1010: token invalid, 1011: token status invalid
+    TOKEN_CODES = {1010, 1011}
+    
+    def __init__(self,
+                 max_attempts: int = 3,
+                 base_delay: float = 0.2,
+                 max_delay: float = 2.0,
+                 deadline: float = 15.0):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.deadline = float(deadline)
+    
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "RetryPolicy":
+        """Erstellt Policy aus dem 'retry' Abschnitt der Config"""
+        config = config or {}
+        return cls(
+            max_attempts=config.get("max_attempts", 3),
+            base_delay=config.get("base_delay", 0.2),
+            max_delay=config.get("max_delay", 2.0),
+            deadline=config.get("deadline", 15.0),
+        )
+    
+    def backoff(self, attempt: int) -> float:
+        """Pause nach dem n-ten Versuch (Full Jitter)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+    
+    def is_retryable(self, result: Dict[str, Any]) -> bool:
+        """True wenn die Tuya Antwort einen vorübergehenden Fehler meldet"""
+        return not result.get("success") and result.get("code") in self.RETRYABLE_CODES
+    
+    def is_token_error(self, result: Dict[str, Any]) -> bool:
+        """True wenn der Access Token abgelaufen oder ungültig ist"""
+        return not result.get("success") and result.get("code") in self.TOKEN_CODES
+
+
+# Pseudo-Fehlercode für Requests, die der offene Circuit Breaker abweist
+CIRCUIT_OPEN = "circuit_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit Breaker für den Tuya Cloud Endpoint
+    
+    closed:    Requests laufen normal, Fehler werden gezählt
+    open:      nach failure_threshold Fehlern in Folge werden Requests
+               sofort abgewiesen (kein Warten auf Timeouts)
+    half_open: nach recovery_timeout darf ein Probe-Request durch;
+               Erfolg schließt, Fehler öffnet erneut
+    
+    Config (alle Schlüssel optional):
+        circuit_breaker:
+          failure_threshold: 5
+          recovery_timeout: 30
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_timeout = float(recovery_timeout)
+        
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+    
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "CircuitBreaker":
+        """Erstellt Breaker aus dem 'circuit_breaker' Abschnitt der Config"""
+        config = config or {}
+        return cls(
+            failure_threshold=config.get("failure_threshold", 5),
+            recovery_timeout=config.get("recovery_timeout", 30.0),
+        )
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+    
+    def _current_state(self) -> str:
+        """Zustand inkl. Übergang open -> half_open (Aufrufer hält _lock)"""
+        if (self._state == self.OPEN
+                and time.monotonic() - self._opened_at >= self.recovery_timeout):
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """
+        True wenn ein Request gesendet werden darf
+        
+        Im half_open Zustand wird genau ein Probe-Request zugelassen.
+        Jeder zugelassene Request muss mit record_success/record_failure
+        abgeschlossen werden.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+    
+    def release(self) -> None:
+        """Gibt einen zugelassenen Request frei, der nicht gesendet wurde"""
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit Breaker geschlossen - Tuya Cloud wieder erreichbar")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit Breaker offen nach {self._failures} Fehlern - "
+                                   f"nächster Versuch in {self.recovery_timeout:.0f}s")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Zustand für /health"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = 0.0
+            if state == self.OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_in": round(retry_in, 1),
+                "rejected": self._rejected,
+            }
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Single-Flight: gleichzeitige identische Requests zusammenfassen
+
+Der erste Aufrufer für einen Schlüssel führt den Request aus, alle
+weiteren warten auf dessen Ergebnis statt selbst einen zu senden.
+Das Ergebnis wird geteilt und darf von Aufrufern nicht verändert werden.
+
+Die asyncio Variante liegt in async_client.AsyncSingleFlight.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """Laufender Aufruf für einen Schlüssel"""
+    
+    __slots__ = ("done", "result", "error", "waiters")
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-basierte Single-Flight Gruppe"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Führt fn aus oder wartet auf den laufenden Aufruf mit gleichem key
+        
+        Zurückgegeben: (result, shared) - shared ist True, wenn das
+        Ergebnis von einem anderen Aufrufer stammt
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+    
+    def in_flight(self) -> int:
+        """Anzahl gerade laufender Aufrufe"""
+        with self._lock:
+            return len(self._calls)
+
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Hintergrund-Poller für den Gerätezustand
+
+Fragt in festem Intervall Status (ein Batch-Request) und Properties aller
+konfigurierten Geräte ab und legt das Ergebnis als unveränderlichen
+Snapshot ab. Leser (z.B. die REST API) greifen nur auf den jeweils
+aktuellen Snapshot zu; ein neuer Snapshot ersetzt den alten per
+Referenzzuweisung, Leser brauchen also kein Lock.
+
+Push-Meldungen (message_queue) und bestätigte Set-Befehle werden
+zwischen zwei Abfragen direkt in den Snapshot übernommen.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from models import replace_value
+from resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceState:
+    """
+    Zustand eines Geräts in einem Snapshot (nicht verändern)
+    
+    Attributes:
+        status: Eintrag aus /v2.0/cloud/thing/batch (leer falls unbekannt)
+        properties: {code: PropertyValue} wie get_device_properties
+        version: Shadow-Version des Clients zum Zeitpunkt der Übernahme
+        updated_at: monotonic Zeitpunkt der letzten Aktualisierung
+        error: Fehler der letzten Abfrage (Werte sind dann die vorherigen)
+    """
+    
+    __slots__ = ("device_id", "status", "properties", "version", "updated_at", "error")
+    
+    def __init__(self, device_id: str, status: Dict[str, Any], properties: Dict[str, Any],
+                 version: int = 0, updated_at: Optional[float] = None,
+                 error: Optional[str] = None):
+        self.device_id = device_id
+        self.status = status
+        self.properties = properties
+        self.version = version
+        self.updated_at = time.monotonic() if updated_at is None else updated_at
+        self.error = error
+    
+    def age(self) -> float:
+        """Sekunden seit der letzten Aktualisierung"""
+        return time.monotonic() - self.updated_at
+    
+    def __repr__(self) -> str:
+        return (f"DeviceState(device_id={self.device_id!r}, version={self.version},"
+                f" properties={len(self.properties)})")
+
+
+class StatePoller:
+    """
+    Pollt alle Geräte eines TuyaCloudClient im Hintergrund
+    
+    Config (alle Schlüssel optional):
+        poller:
+          enabled: true
+          interval: 15        # Sekunden zwischen zwei Abfragen
+    
+    Pro Durchlauf: ein Batch-Request für den Status aller Geräte und ein
+    shadow/properties Request pro Gerät (parallel, max. http.pool_size).
+    """
+    
+    def __init__(self, client, device_ids: Optional[Iterable[str]] = None,
+                 interval: float = 15.0):
+        self.client = client
+        if device_ids is None:
+            device_ids = [device.device_id for device in client.config.devices]
+        self.device_ids: List[str] = list(dict.fromkeys(device_ids))
+        self.interval = max(0.1, float(interval))
+        
+        # device_id -> DeviceState, wird nur als Ganzes ersetzt
+        self._states: Dict[str, DeviceState] = {}
+        # Serialisiert Schreiber (Poll-Thread, Push, Set); Leser brauchen es nicht
+        self._write_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Callbacks: listener(device_id, {code: property}, version)
+        self._listeners: List[Callable[[str, Dict[str, Any], int], None]] = []
+        
+        # Statistik
+        self.polls = 0
+        self.errors = 0
+        self.pushes = 0
+        self.last_poll_duration: Optional[float] = None
+    
+    @classmethod
+    def from_config(cls, client) -> Optional["StatePoller"]:
+        """Poller aus dem 'poller' Abschnitt der Config (None falls deaktiviert)"""
+        config = client.config.get("poller") or {}
+        if not config.get("enabled", True):
+            return None
+        return cls(client, interval=config.get("interval", 15.0))
+    
+    def add_listener(self, listener: Callable[[str, Dict[str, Any], int], None]) -> None:
+        """
+        Registriert Callback für geänderte Werte
+        
+        Wird mit den Properties aufgerufen, deren Wert sich gegenüber dem
+        vorherigen Snapshot geändert hat (nicht beim ersten Abruf eines Geräts).
+        """
+        self._listeners.append(listener)
+    
+    def _notify(self, previous: Optional[DeviceState], state: DeviceState) -> None:
+        """Meldet Wertänderungen zwischen zwei Zuständen (unter _write_lock)"""
+        if previous is None or not self._listeners or previous.properties is state.properties:
+            return
+        old = previous.properties
+        changes = {
+            code: prop for code, prop in state.properties.items()
+            if code not in old or old[code].get("value") != prop.get("value")
+        }
+        if not changes:
+            return
+        for listener in self._listeners:
+            try:
+                listener(state.device_id, changes, state.version)
+            except Exception as e:
+                logger.error(f"Poller Listener Fehler: {e}")
+    
+    def device(self, device_id: str) -> Optional[DeviceState]:
+        """Aktueller Zustand eines Geräts oder None (noch nicht abgefragt)"""
+        return self._states.get(device_id)
+    
+    def snapshot(self) -> Dict[str, DeviceState]:
+        """Aktueller Snapshot aller Geräte (nicht verändern)"""
+        return self._states
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wartet auf den ersten Durchlauf"""
+        return self._ready.wait(timeout)
+    
+    def refresh(self) -> Dict[str, DeviceState]:
+        """
+        Ein Durchlauf: fragt alle Geräte ab und ersetzt den Snapshot
+        
+        Geräte ohne Antwort behalten ihren bisherigen Zustand (mit error).
+        Hat apply_values (Set, Push) ein Gerät während der Abfrage
+        aktualisiert, bleibt dieser neuere Stand erhalten.
+        Zurückgegeben: der neue Snapshot
+        """
+        started = time.monotonic()
+        try:
+            statuses = self.client.get_devices_status(self.device_ids)
+        except Exception as e:
+            logger.warning(f"Poller: Status-Abfrage fehlgeschlagen: {e}")
+            statuses = {}
+        
+        workers = min(len(self.device_ids), self.client.pool_size) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tuya-poll") as executor:
+            results = dict(zip(self.device_ids,
+                               executor.map(self._fetch_properties, self.device_ids)))
+        
+        with self._write_lock:
+            previous_states = self._states
+            states = dict(previous_states)
+            for device_id in self.device_ids:
+                properties, since, version, error = results[device_id]
+                previous = states.get(device_id)
+                status = statuses.get(device_id)
+                if previous is not None and previous.version > since:
+                    # Neuer als die Abfrage: nur den Status übernehmen
+                    if status is not None:
+                        states[device_id] = DeviceState(
+                            device_id, status, previous.properties, previous.version,
+                            previous.updated_at, previous.error)
+                    continue
+                if error is not None:
+                    self.errors += 1
+                    if previous is None:
+                        states[device_id] = DeviceState(device_id, status or {}, {}, error=error)
+                    else:
+                        states[device_id] = DeviceState(
+                            device_id, status or previous.status, previous.properties,
+                            previous.version, previous.updated_at, error)
+                    continue
+                if status is None:
+                    status = previous.status if previous else {}
+                states[device_id] = DeviceState(device_id, status, properties, version)
+            self._states = states
+            for device_id in self.device_ids:
+                self._notify(previous_states.get(device_id), states[device_id])
+        
+        self.polls += 1
+        self.last_poll_duration = time.monotonic() - started
+        self._ready.set()
+        return states
+    
+    def _fetch_properties(self, device_id: str):
+        """
+        (properties, since, version, None) oder ({}, since, version, Fehlertext)
+        
+        since: Shadow-Version vor der Abfrage - ein Snapshot mit höherer
+        Version ist neuer als das Ergebnis; version: direkt nach der Abfrage
+        """
+        tracker = self.client.shadow_tracker
+        since = tracker.version(device_id)
+        try:
+            # Veraltete Werte bei offenem Circuit wären kein neuer Stand
+            properties = self.client.get_device_properties(device_id, max_staleness=0,
+                                                           allow_stale=False)
+        except Exception as e:
+            logger.warning(f"Poller: {device_id} nicht abrufbar: {e}")
+            return {}, since, since, str(e)
+        if not properties:
+            if self.client.circuit_breaker.state != CircuitBreaker.CLOSED:
+                return {}, since, since, "Cloud unreachable (circuit open)"
+            return {}, since, since, "No properties returned"
+        return properties, since, tracker.version(device_id), None
+    
+    def apply_values(self, device_id: str, values: Dict[str, Any],
+                     time_ms: Optional[int] = None) -> None:
+        """
+        Übernimmt bestätigte Werte in den Snapshot (ohne I/O)
+        
+        Nur bereits bekannte Properties werden aktualisiert.
+        """
+        now_ms = time_ms or int(time.time() * 1000)
+        with self._write_lock:
+            previous = self._states.get(device_id)
+            if previous is None:
+                return
+            properties = dict(previous.properties)
+            changed = False
+            for code, value in values.items():
+                if code in properties:
+                    properties[code] = replace_value(properties[code], value, now_ms)
+                    changed = True
+            if not changed:
+                return
+            states = dict(self._states)
+            # Neuer Inhalt bekommt immer eine neue Version (ETag)
+            version = max(self.client.shadow_tracker.version(device_id), previous.version + 1)
+            state = states[device_id] = DeviceState(
+                device_id, previous.status, properties, version, error=previous.error)
+            self._states = states
+            self._notify(previous, state)
+    
+    def on_message(self, device_id: str, protocol: int, data: Dict[str, Any]) -> None:
+        """Listener für MessageQueueSubscriber.add_listener"""
+        status = data.get("status")
+        if not status:
+            return
+        values = {item["code"]: item.get("value") for item in status if "code" in item}
+        latest = max((int(item.get("t") or 0) for item in status), default=0)
+        # Manche Meldungen liefern Sekunden statt Millisekunden
+        if 0 < latest < 10**12:
+            latest *= 1000
+        self.pushes += 1
+        self.apply_values(device_id, values, latest or None)
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Poller Durchlauf fehlgeschlagen: {e}")
+                # Leser nicht dauerhaft blockieren
+                self._ready.set()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+    
+    def start(self) -> threading.Thread:
+        """Startet den Poll-Thread (Daemon)"""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tuya-poller", daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Beendet den Poll-Thread"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Status für /health"""
+        states = self._states
+        ages = [state.age() for state in states.values()]
+        return {
+            "devices": len(self.device_ids),
+            "interval": self.interval,
+            "polls": self.polls,
+            "errors": self.errors,
+            "pushes": self.pushes,
+            "max_age": round(max(ages), 1) if ages else None,
+            "last_poll_duration": (round(self.last_poll_duration, 3)
+                                   if self.last_poll_duration is not None else None),
+        }
@@ -4,8 +4,8 @@ TUYA CLOUD CLIENT - FINALES UNIVERSELLES SKRIPT
 Lesen + Schreiben von Tuya Smart Home Geräten über Cloud API
 """
 
-from client import TuyaCloudClient
-import yaml
+from client import TuyaCloudClient, configure_stdout, setup_logging
+import config_loader
 import sys
 import time
 
@@ -13,11 +13,13 @@ import time
 def load_config():
     """Lädt config.yaml"""
     try:
-        with open('config.yaml', 'r') as f:
-            return yaml.safe_load(f)
+        return config_loader.load_config('config.yaml')
     except FileNotFoundError:
         print("❌ config.yaml nicht gefunden!")
         sys.exit(1)
+    except config_loader.ConfigError as e:
+        print(f"❌ config.yaml ungültig: {e}")
+        sys.exit(1)
 
 
 def print_menu():
@@ -134,7 +136,8 @@ def set_property(client, device_id, token):
                 
                 # Status überprüfen
                 time.sleep(1)
-                new_value = client.get_device_property_value(device_id, token, code)
+                new_value = client.get_device_property_value(device_id, token, code,
+                                                             max_staleness=0)
                 print(f"✓ Bestätigung: {code} = {new_value}")
             else:
                 print(f"❌ Fehler beim Setzen von {code}")
@@ -152,21 +155,25 @@ def scenario_heating(client, device_id, token):
     
     print("\n→ Konfiguriere Device...")
     
-    client.set_device_property(device_id, token, "Power", True)
-    print("  ✓ Power: ON")
+    # Alle Einstellungen in einem Command Request
+    ok = client.set_device_properties(device_id, token, {
+        "Power": True,
+        "mode": "hot",
+        "temp_set": 210,
+        "windspeed": "auto",
+    })
+    if not ok:
+        print("  ❌ Fehler beim Konfigurieren")
+        return
     
-    client.set_device_property(device_id, token, "mode", "hot")
+    print("  ✓ Power: ON")
     print("  ✓ Mode: Heating")
-    
-    client.set_device_property(device_id, token, "temp_set", 210)
     print("  ✓ Temperature: 21°C")
-    
-    client.set_device_property(device_id, token, "windspeed", "auto")
     print("  ✓ Windspeed: Auto")
     
     # Status anzeigen
     time.sleep(2)
-    props = client.get_device_properties(device_id, token)
+    props = client.get_device_properties(device_id, token, max_staleness=0)
     
     print("\n→ Aktueller Status:")
     print(f"  Power:        {props['Power']['value']}")
@@ -184,21 +191,25 @@ def scenario_cooling(client, device_id, token):
     
     print("\n→ Konfiguriere Device...")
     
-    client.set_device_property(device_id, token, "Power", True)
-    print("  ✓ Power: ON")
+    # Alle Einstellungen in einem Command Request
+    ok = client.set_device_properties(device_id, token, {
+        "Power": True,
+        "mode": "cold",
+        "temp_set": 200,
+        "windspeed": "auto",
+    })
+    if not ok:
+        print("  ❌ Fehler beim Konfigurieren")
+        return
     
-    client.set_device_property(device_id, token, "mode", "cold")
+    print("  ✓ Power: ON")
     print("  ✓ Mode: Cooling")
-    
-    client.set_device_property(device_id, token, "temp_set", 200)
     print("  ✓ Temperature: 20°C")
-    
-    client.set_device_property(device_id, token, "windspeed", "auto")
     print("  ✓ Windspeed: Auto")
     
     # Status anzeigen
     time.sleep(2)
-    props = client.get_device_properties(device_id, token)
+    props = client.get_device_properties(device_id, token, max_staleness=0)
     
     print("\n→ Aktueller Status:")
     print(f"  Power:        {props['Power']['value']}")
@@ -238,18 +249,25 @@ def custom_command(client, device_id, token):
 
 def main():
     """Hauptprogramm"""
+    configure_stdout()
+    setup_logging()
+    
     config = load_config()
-    device_id = config['devices'][0]['device_id']
+    device = config.primary_device
+    if device is None:
+        print("❌ Keine Geräte in config.yaml konfiguriert!")
+        sys.exit(1)
+    device_id = device.device_id
     
     print("\n" + "=" * 80)
     print("TUYA CLOUD CLIENT GESTARTET")
     print("=" * 80)
-    print(f"\nGeräte: {config['devices'][0]['name']}")
+    print(f"\nGeräte: {device.name}")
     print(f"Device ID: {device_id}")
-    print(f"Region: {config['cloud']['region']}")
+    print(f"Region: {config.cloud.region}")
     
     # Client
-    client = TuyaCloudClient()
+    client = TuyaCloudClient(config=config)
     token = client.get_token()
     
     if not token:
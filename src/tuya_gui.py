@@ -16,8 +16,8 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal, QSize
 from PyQt6.QtGui import QIcon, QColor, QFont, QPixmap
-import yaml
-from client import TuyaCloudClient
+from client import TuyaCloudClient, configure_stdout, setup_logging
+from config_loader import TuyaConfig, load_config
 
 
 class DeviceWorker(QThread):
@@ -27,11 +27,12 @@ class DeviceWorker(QThread):
     error = pyqtSignal(str)
     result = pyqtSignal(dict)
     
-    def __init__(self, operation, *args):
+    def __init__(self, client: TuyaCloudClient, operation, *args):
         super().__init__()
         self.operation = operation
         self.args = args
-        self.client = TuyaCloudClient()
+        # Client des Hauptfensters (Session, Token und Config werden geteilt)
+        self.client = client
     
     def run(self):
         try:
@@ -71,11 +72,11 @@ class TuyaGUI(QMainWindow):
         
         # Config laden
         self.config = self.load_config()
-        self.device_id = self.config['devices'][0]['device_id']
-        self.device_name = self.config['devices'][0]['name']
+        self.device_id = self.config.primary_device.device_id
+        self.device_name = self.config.primary_device.name
         
         # Client
-        self.client = TuyaCloudClient()
+        self.client = TuyaCloudClient(config=self.config)
         self.token = None
         self.properties = {}
         
@@ -88,10 +89,9 @@ class TuyaGUI(QMainWindow):
         # Starte erste Initialisierung
         self.on_startup()
     
-    def load_config(self) -> dict:
+    def load_config(self) -> TuyaConfig:
         """Lädt config.yaml"""
-        with open('config.yaml', 'r') as f:
-            return yaml.safe_load(f)
+        return load_config('config.yaml')
     
     def init_ui(self):
         """Initialisiert die Benutzeroberfläche"""
@@ -314,7 +314,7 @@ class TuyaGUI(QMainWindow):
     
     def on_startup(self):
         """Starte Initialisierung"""
-        self.worker = DeviceWorker("get_token")
+        self.worker = DeviceWorker(self.client, "get_token")
         self.worker.result.connect(self.on_token_received)
         self.worker.error.connect(self.on_error)
         self.worker.start()
@@ -333,7 +333,7 @@ class TuyaGUI(QMainWindow):
         if not self.token:
             return
         
-        self.worker = DeviceWorker("get_properties", self.device_id, self.token)
+        self.worker = DeviceWorker(self.client, "get_properties", self.device_id, self.token)
         self.worker.result.connect(self.on_properties_received)
         self.worker.error.connect(self.on_error)
         self.worker.start()
@@ -344,7 +344,7 @@ class TuyaGUI(QMainWindow):
         self.update_ui_from_properties()
         
         # Auch Status abrufen
-        self.worker = DeviceWorker("get_status", self.device_id, self.token)
+        self.worker = DeviceWorker(self.client, "get_status", self.device_id, self.token)
         self.worker.result.connect(self.on_status_received)
         self.worker.start()
     
@@ -557,7 +557,7 @@ class TuyaGUI(QMainWindow):
         
         self.statusBar().showMessage(f"Setze {code} = {value}...")
         
-        self.worker = DeviceWorker("set_property", self.device_id, self.token, code, value)
+        self.worker = DeviceWorker(self.client, "set_property", self.device_id, self.token, code, value)
         self.worker.result.connect(self.on_property_set)
         self.worker.error.connect(self.on_error)
         self.worker.start()
@@ -830,6 +830,8 @@ class TuyaGUI(QMainWindow):
 
 
 def main():
+    configure_stdout()
+    setup_logging()
     app = QApplication(sys.argv)
     gui = TuyaGUI()
     gui.show()
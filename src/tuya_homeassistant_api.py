@@ -18,59 +18,299 @@ Installation von GitHub (curl):
   python3 src/tuya_homeassistant_api.py --port 5000
 """
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.local import LocalProxy
 import json
 import sys
 import os
+import uuid
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from client import TuyaCloudClient
+from client import TuyaCloudClient, setup_logging
+from config_loader import load_config
+from event_hub import EventHub
+from models import PropertyValue
+from state_poller import StatePoller
+from websocket_api import register_websocket
+import json_codec
 import logging
 
-logging.basicConfig(level=logging.INFO)
 _LOGGER = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-
-# Load configuration
-try:
-    with open("config.yaml", "r") as f:
-        import yaml
-        config = yaml.safe_load(f)
-except Exception as e:
-    _LOGGER.error(f"❌ config.yaml not found. Error: {e}")
-    sys.exit(1)
-
-# Initialize client
-# Note: TuyaCloudClient expects config.yaml file path
-try:
-    client = TuyaCloudClient("config.yaml")
-except Exception as e:
-    _LOGGER.error(f"❌ Failed to initialize TuyaCloudClient: {e}")
-    sys.exit(1)
-
-# Get first device from config
-devices = config.get("devices", [])
-if not devices:
-    _LOGGER.error("❌ No devices configured in config.yaml")
-    sys.exit(1)
-
-PRIMARY_DEVICE_ID = devices[0].get("device_id")
-_LOGGER.info(f"✓ Using device: {devices[0].get('name')} ({PRIMARY_DEVICE_ID})")
+class TuyaJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by json_codec (orjson if installed)
+    
+    Serializes PropertyValue in the classic dict format.
+    """
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, PropertyValue):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+    
+    def dumps(self, obj, **kwargs):
+        # Pretty printing (indent) is left to the stdlib provider
+        if "indent" in kwargs and kwargs["indent"] is not None:
+            return super().dumps(obj, **kwargs)
+        return json_codec.dumps(obj, default=self.default,
+                                sort_keys=kwargs.get("sort_keys", self.sort_keys))
+    
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
+
+
+api = Blueprint("tuya", __name__)
+
+# Client of the current app (set up by create_app)
+client = LocalProxy(lambda: current_app.extensions["tuya_client"])
+
+
+def _device_id():
+    """Device ID addressed by the current request (primary device for unscoped routes)"""
+    return g.tuya_device.device_id
+
+
+@api.url_value_preprocessor
+def _pull_device(endpoint, values):
+    # /devices/<device>/... - resolved in _resolve_device
+    g.tuya_device_key = values.pop("device", None) if values else None
+
+
+@api.before_request
+def _resolve_device():
+    """Resolve the device of a scoped route by ID or configured name (404 if unknown)"""
+    key = g.tuya_device_key
+    if key is None:
+        g.tuya_device = current_app.extensions["tuya_primary_device"]
+        return None
+    device = client.config.device(key)
+    if device is None:
+        return jsonify({
+            "success": False,
+            "error": f"Device {key} not found"
+        }), 404
+    g.tuya_device = device
+    return None
+
+
+def create_app(config_file: str = "config.yaml",
+               tuya_client: Optional[TuyaCloudClient] = None) -> Flask:
+    """
+    Create the Flask app for the REST API
+    
+    Nothing is loaded at import time; configuration is read and the
+    client created here.
+    
+    Raises:
+        OSError: config file not readable
+        ConfigError: invalid config structure
+        RuntimeError: no devices configured
+    """
+    if tuya_client is None:
+        tuya_client = TuyaCloudClient(config=load_config(config_file))
+    
+    config = tuya_client.config
+    primary = config.primary_device
+    if primary is None:
+        raise RuntimeError(f"No devices configured in {config_file}")
+    
+    app = Flask(__name__)
+    app.json = TuyaJSONProvider(app)
+    CORS(app)
+    
+    app.extensions["tuya_client"] = tuya_client
+    app.extensions["tuya_primary_device"] = primary
+    # Part of every ETag: state versions restart with the process
+    app.extensions["tuya_etag_prefix"] = uuid.uuid4().hex[:8]
+    app.extensions["tuya_mq"] = _start_message_queue(tuya_client)
+    app.extensions["tuya_poller"] = _start_poller(tuya_client, app.extensions["tuya_mq"])
+    app.extensions["tuya_events"] = EventHub.from_config(config.get("events"))
+    if app.extensions["tuya_poller"] is not None:
+        app.extensions["tuya_poller"].add_listener(app.extensions["tuya_events"].publish)
+    app.register_blueprint(api)
+    app.extensions["tuya_websocket"] = register_websocket(app)
+    
+    _LOGGER.info(f"✓ Using device: {primary.name} ({primary.device_id})")
+    return app
+
+
+def _start_message_queue(tuya_client: TuyaCloudClient):
+    """Start the push subscriber if 'mq.enabled' is set (None otherwise)"""
+    if not (tuya_client.config.get("mq") or {}).get("enabled"):
+        return None
+    try:
+        from message_queue import MessageQueueSubscriber
+        subscriber = MessageQueueSubscriber(tuya_client)
+    except ImportError as e:
+        _LOGGER.warning(f"Message queue disabled, missing dependency: {e}")
+        return None
+    subscriber.start()
+    return subscriber
+
+
+def _start_poller(tuya_client: TuyaCloudClient, subscriber=None) -> Optional[StatePoller]:
+    """Start the background state poller unless 'poller.enabled' is false"""
+    poller = StatePoller.from_config(tuya_client)
+    if poller is None:
+        return None
+    if subscriber is not None:
+        # Push updates reach the snapshot between two polls
+        subscriber.add_listener(poller.on_message)
+    poller.start()
+    return poller
+
+
+def _device_state(device_id):
+    """Poller state of a device (None = poller disabled or not polled yet)"""
+    poller = current_app.extensions.get("tuya_poller")
+    if poller is None:
+        return None
+    state = poller.device(device_id)
+    return state if state is not None and state.properties else None
+
+
+def _read_properties(device_id):
+    """
+    Properties from the poller snapshot, live from the cloud as fallback
+    
+    Returns:
+        (properties, snapshot_age, version) - properties is None without
+        access token, snapshot_age is None for a live read, version is the
+        state version the properties belong to (0 = unknown)
+    """
+    state = _device_state(device_id)
+    if state is not None:
+        return state.properties, round(state.age(), 3), state.version
+    
+    token = client.get_token()
+    if not token:
+        return None, None, 0
+    props = client.get_device_properties(device_id, token)
+    return props, None, client.shadow_tracker.version(device_id)
+
+
+def _validators(version, props):
+    """
+    ETag and Last-Modified for a state response
+    
+    The ETag is weak (the body also carries snapshot_age) and combines a
+    per-app boot tag with the device state version, so tags from before
+    a restart never match. Last-Modified is the newest property time.
+    
+    Returns:
+        (etag, last_modified) - each may be None
+    """
+    etag = f'{current_app.extensions["tuya_etag_prefix"]}-{version}' if version else None
+    newest = max((prop.get("time") or 0 for prop in props.values()), default=0)
+    last_modified = (datetime.fromtimestamp(newest // 1000, tz=timezone.utc)
+                     if newest else None)
+    return etag, last_modified
+
+
+def _not_modified(etag, last_modified):
+    """304 response if the client's copy is current (None otherwise)"""
+    if etag is None and last_modified is None:
+        return None
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        fresh = etag is not None and request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since is not None and last_modified is not None:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return _with_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def _with_validators(response, etag, last_modified):
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients may cache, but must revalidate every time
+    response.cache_control.no_cache = True
+    return response
+
+
+def _applied(device_id, values):
+    """Write confirmed values into the poller snapshot"""
+    poller = current_app.extensions.get("tuya_poller")
+    if poller is not None:
+        poller.apply_values(device_id, values)
+
+
+def _poller_stats():
+    poller = current_app.extensions.get("tuya_poller")
+    return poller.stats() if poller else None
+
+
+def _events_stats():
+    hub = current_app.extensions.get("tuya_events")
+    return hub.stats() if hub else None
+
+
+def _mq_stats():
+    subscriber = current_app.extensions.get("tuya_mq")
+    return subscriber.stats() if subscriber else None
+
+
+def __getattr__(name):
+    """Create the default ``app`` lazily (e.g. for ``flask --app`` or WSGI servers)"""
+    if name == "app":
+        app = create_app()
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ============================================================
 # REST Endpoints for Home Assistant
 # ============================================================
 
-@app.route("/status", methods=["GET"])
+@api.route("/devices", methods=["GET"])
+def list_devices():
+    """List configured devices and their device-scoped base URLs"""
+    primary = current_app.extensions["tuya_primary_device"]
+    devices = []
+    for device in client.config.devices:
+        state = _device_state(device.device_id)
+        devices.append({
+            "device_id": device.device_id,
+            "name": device.name,
+            "type": device.type,
+            "primary": device is primary,
+            "online": state.status.get("is_online", True) if state else None,
+            "url": f"/devices/{device.device_id}",
+            "snapshot_age": round(state.age(), 3) if state else None
+        })
+    return jsonify({
+        "success": True,
+        "devices": devices,
+        "count": len(devices)
+    })
+
+@api.route("/status", methods=["GET"])
+@api.route("/devices/<device>/status", methods=["GET"])
 def get_status():
     """Get current device status"""
     try:
+        state = _device_state(_device_id())
+        if state is not None and state.status:
+            return jsonify({
+                "success": True,
+                "data": state.status,
+                "snapshot_age": round(state.age(), 3)
+            })
+        
         token = client.get_token()
         if not token:
             return jsonify({
@@ -78,10 +318,11 @@ def get_status():
                 "error": "Failed to get access token"
             }), 401
         
-        status = client.get_device_status(PRIMARY_DEVICE_ID, token)
+        status = client.get_device_status(_device_id(), token)
         return jsonify({
             "success": True,
-            "data": status
+            "data": status,
+            "snapshot_age": None
         })
     except Exception as e:
         return jsonify({
@@ -89,58 +330,72 @@ def get_status():
             "error": str(e)
         }), 400
 
-@app.route("/properties", methods=["GET"])
+@api.route("/properties", methods=["GET"])
+@api.route("/devices/<device>/properties", methods=["GET"])
 def get_properties():
     """Get all device properties"""
     try:
-        token = client.get_token()
-        if not token:
+        props, age, version = _read_properties(_device_id())
+        if props is None:
             return jsonify({
                 "success": False,
                 "error": "Failed to get access token"
             }), 401
         
-        props = client.get_device_properties(PRIMARY_DEVICE_ID, token)
-        return jsonify({
+        etag, last_modified = _validators(version, props)
+        not_modified = _not_modified(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        return _with_validators(jsonify({
             "success": True,
-            "data": props
-        })
+            "data": props,
+            "snapshot_age": age
+        }), etag, last_modified)
     except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
         }), 400
 
-@app.route("/property/<property_code>", methods=["GET"])
+@api.route("/property/<property_code>", methods=["GET"])
+@api.route("/devices/<device>/property/<property_code>", methods=["GET"])
 def get_property(property_code):
     """Get single property"""
     try:
-        token = client.get_token()
-        if not token:
+        props, age, version = _read_properties(_device_id())
+        if props is None:
             return jsonify({
                 "success": False,
                 "error": "Failed to get access token"
             }), 401
         
-        props = client.get_device_properties(PRIMARY_DEVICE_ID, token)
         value = props.get(property_code)
         if value is None:
             return jsonify({
                 "success": False,
                 "error": f"Property {property_code} not found"
             }), 404
-        return jsonify({
+        
+        etag, last_modified = _validators(version, {property_code: value})
+        not_modified = _not_modified(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        return _with_validators(jsonify({
             "success": True,
             "property": property_code,
-            "value": value
-        })
+            "value": value,
+            "snapshot_age": age
+        }), etag, last_modified)
     except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
         }), 400
 
-@app.route("/set", methods=["POST"])
+@api.route("/set", methods=["POST"])
+@api.route("/devices/<device>/set", methods=["POST"])
 def set_property():
     """Set device property"""
     try:
@@ -161,7 +416,9 @@ def set_property():
                 "error": "Missing property or value"
             }), 400
         
-        result = client.set_device_property(PRIMARY_DEVICE_ID, token, property_code, value)
+        result = client.set_device_property(_device_id(), token, property_code, value)
+        if result:
+            _applied(_device_id(), {property_code: value})
         
         return jsonify({
             "success": result,
@@ -174,7 +431,8 @@ def set_property():
             "error": str(e)
         }), 400
 
-@app.route("/batch", methods=["POST"])
+@api.route("/batch", methods=["POST"])
+@api.route("/devices/<device>/batch", methods=["POST"])
 def batch_set():
     """Set multiple properties at once"""
     try:
@@ -188,16 +446,25 @@ def batch_set():
         data = request.get_json()
         properties = data.get("properties", [])
         
-        results = {}
+        commands = {}
         for prop in properties:
             property_code = prop.get("property")
             value = prop.get("value")
-            result = client.set_device_property(PRIMARY_DEVICE_ID, token, property_code, value)
-            results[property_code] = result
+            if not property_code or value is None:
+                return jsonify({
+                    "success": False,
+                    "error": "Missing property or value"
+                }), 400
+            commands[property_code] = value
+        
+        # Send all properties in a single command request
+        result = client.set_device_properties(_device_id(), token, commands)
+        if result:
+            _applied(_device_id(), commands)
         
         return jsonify({
-            "success": True,
-            "results": results
+            "success": result,
+            "results": {code: result for code in commands}
         })
     except Exception as e:
         return jsonify({
@@ -205,27 +472,30 @@ def batch_set():
             "error": str(e)
         }), 400
 
-@app.route("/device", methods=["GET"])
+@api.route("/device", methods=["GET"])
+@api.route("/devices/<device>/device", methods=["GET"])
 def get_device_info():
     """Get device information"""
     try:
-        token = client.get_token()
-        if not token:
+        props, age, _ = _read_properties(_device_id())
+        if props is None:
             return jsonify({
                 "success": False,
                 "error": "Failed to get access token"
             }), 401
         
-        props = client.get_device_properties(PRIMARY_DEVICE_ID, token)
+        state = _device_state(_device_id())
         info = {
-            "device_id": PRIMARY_DEVICE_ID,
+            "device_id": _device_id(),
+            "name": g.tuya_device.name,
             "region": client.region,
-            "online": True,
+            "online": state.status.get("is_online", True) if state else True,
             "properties_count": len(props)
         }
         return jsonify({
             "success": True,
-            "data": info
+            "data": info,
+            "snapshot_age": age
         })
     except Exception as e:
         return jsonify({
@@ -233,7 +503,8 @@ def get_device_info():
             "error": str(e)
         }), 400
 
-@app.route("/schemas", methods=["GET"])
+@api.route("/schemas", methods=["GET"])
+@api.route("/devices/<device>/schemas", methods=["GET"])
 def get_property_schemas():
     """Get all property schemas (types, ranges, enums)"""
     schemas = {
@@ -268,57 +539,183 @@ def get_property_schemas():
         "schemas": schemas
     })
 
-@app.route("/health", methods=["GET"])
+@api.route("/health", methods=["GET"])
+@api.route("/devices/<device>/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
+    circuit = client.circuit_breaker.snapshot()
     try:
+        # Fail fast while the cloud is known to be unreachable
+        if circuit["state"] == "open":
+            return jsonify({
+                "status": "unhealthy",
+                "connected": False,
+                "error": "Tuya Cloud unreachable (circuit open)",
+                "circuit": circuit
+            }), 503
+        
         # Try to get token to verify connection
         token = client.get_token()
         if not token:
             return jsonify({
                 "status": "unhealthy",
                 "connected": False,
-                "error": "Failed to get access token"
+                "error": "Failed to get access token",
+                "circuit": client.circuit_breaker.snapshot()
             }), 503
         
         # Try to get properties
-        props = client.get_device_properties(PRIMARY_DEVICE_ID, token)
+        props = client.get_device_properties(_device_id(), token)
         
         if props and isinstance(props, dict):
             return jsonify({
                 "status": "healthy",
                 "connected": True,
-                "properties_count": len(props)
+                "properties_count": len(props),
+                "circuit": client.circuit_breaker.snapshot(),
+                "rate_limit": client.rate_limiter.stats(),
+                "mq": _mq_stats(),
+                "poller": _poller_stats(),
+                "events": _events_stats(),
+                "local": client.local.stats() if client.local else None
             })
         else:
             return jsonify({
                 "status": "unhealthy",
                 "connected": False,
-                "error": "No properties returned"
+                "error": "No properties returned",
+                "circuit": client.circuit_breaker.snapshot()
             }), 503
     except Exception as e:
         return jsonify({
             "status": "error",
             "connected": False,
-            "error": str(e)
+            "error": str(e),
+            "circuit": circuit
         }), 503
 
+# ============================================================
+# Server-Sent Events
+# ============================================================
+
+def _multi_arg(name):
+    """Query parameter given repeatedly and/or comma separated"""
+    return [item for value in request.args.getlist(name) for item in value.split(",") if item]
+
+def _sse(event_id, event=None, data=None):
+    """One SSE message (id only messages just advance the client's Last-Event-ID)"""
+    lines = [f"id: {event_id}"]
+    if event is not None:
+        lines.append(f"event: {event}")
+    if data is not None:
+        lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+@api.route("/events", methods=["GET"])
+@api.route("/devices/<device>/events", methods=["GET"])
+def events():
+    """
+    Stream property changes as Server-Sent Events
+    
+    Filters: ?device=<id|name> and ?code=<code> (repeatable or comma
+    separated); device-scoped routes only stream their device. Clients
+    resume with Last-Event-ID (header or ?last_event_id=) as long as the
+    events are still buffered, otherwise they get a "resync" event and
+    should re-read the full state.
+    
+    The stream blocks its WSGI worker while open: one OS thread per
+    subscriber under the threaded development server, one greenlet with
+    the gevent worker from gunicorn.conf.py.
+    """
+    hub = current_app.extensions["tuya_events"]
+    if current_app.extensions.get("tuya_poller") is None:
+        return jsonify({
+            "success": False,
+            "error": "Events require the background poller (poller.enabled)"
+        }), 503
+    
+    if g.tuya_device_key is not None:
+        devices = {g.tuya_device.device_id}
+    else:
+        devices = set()
+        for key in _multi_arg("device"):
+            device = client.config.device(key)
+            if device is None:
+                return jsonify({
+                    "success": False,
+                    "error": f"Device {key} not found"
+                }), 404
+            devices.add(device.device_id)
+    codes = set(_multi_arg("code"))
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    heartbeat = float((client.config.get("events") or {}).get("heartbeat", 15))
+    dumps = current_app.json.dumps
+    
+    def stream():
+        # Registered on first iteration so an unstarted response leaks nothing
+        cursor = hub.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            if last_event_id:
+                seq = hub.parse_event_id(last_event_id)
+                if seq is None or seq > cursor:
+                    yield _sse(hub.event_id(cursor), "resync", dumps({"reason": "unknown event id"}))
+                else:
+                    cursor = seq
+            
+            while True:
+                batch, new_cursor, lost = hub.wait(cursor, heartbeat)
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                
+                chunks = []
+                if lost:
+                    chunks.append(_sse(hub.event_id(batch[0].seq - 1), "resync",
+                                       dumps({"reason": "events expired"})))
+                for event in batch:
+                    if devices and event.device_id not in devices:
+                        continue
+                    changes = event.changes
+                    if codes:
+                        changes = {code: prop for code, prop in changes.items() if code in codes}
+                        if not changes:
+                            continue
+                    chunks.append(_sse(hub.event_id(event.seq), "change", dumps({
+                        "device_id": event.device_id,
+                        "version": event.version,
+                        "changes": changes
+                    })))
+                if not chunks or not chunks[-1].startswith(f"id: {hub.event_id(new_cursor)}\n"):
+                    # Filtered clients still move their Last-Event-ID forward
+                    chunks.append(_sse(hub.event_id(new_cursor)))
+                cursor = new_cursor
+                yield "".join(chunks)
+        finally:
+            hub.unsubscribe()
+    
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Disable proxy buffering (nginx)
+        "X-Accel-Buffering": "no"
+    })
+
 # ============================================================
 # Home Assistant Integration Endpoint
 # ============================================================
 
-@app.route("/boolcode", methods=["GET"])
+@api.route("/boolcode", methods=["GET"])
+@api.route("/devices/<device>/boolcode", methods=["GET"])
 def get_boolcode():
     """Get boolCode property (DP_ID 123) - String value"""
     try:
-        token = client.get_token()
-        if not token:
+        props, age, _ = _read_properties(_device_id())
+        if props is None:
             return jsonify({
                 "success": False,
                 "error": "Failed to get access token"
             }), 401
         
-        props = client.get_device_properties(PRIMARY_DEVICE_ID, token)
         boolcode_value = props.get("boolCode")
         
         if boolcode_value is None:
@@ -332,7 +729,8 @@ def get_boolcode():
             "property": "boolCode",
             "value": boolcode_value,
             "type": "string",
-            "description": "Device status code (string)"
+            "description": "Device status code (string)",
+            "snapshot_age": age
         })
     except Exception as e:
         return jsonify({
@@ -340,7 +738,8 @@ def get_boolcode():
             "error": str(e)
         }), 400
 
-@app.route("/boolcode", methods=["POST"])
+@api.route("/boolcode", methods=["POST"])
+@api.route("/devices/<device>/boolcode", methods=["POST"])
 def set_boolcode():
     """Set boolCode property (DP_ID 123) - String value"""
     try:
@@ -363,7 +762,9 @@ def set_boolcode():
         # Ensure value is string
         value_str = str(value)
         
-        result = client.set_device_property(PRIMARY_DEVICE_ID, token, "boolCode", value_str)
+        result = client.set_device_property(_device_id(), token, "boolCode", value_str)
+        if result:
+            _applied(_device_id(), {"boolCode": value_str})
         
         return jsonify({
             "success": result,
@@ -377,23 +778,32 @@ def set_boolcode():
             "error": str(e)
         }), 400
 
-@app.route("/api/v1/ha-entities", methods=["GET"])
+@api.route("/api/v1/ha-entities", methods=["GET"])
+@api.route("/api/v1/devices/<device>/ha-entities", methods=["GET"])
 def ha_entities():
     """Generate Home Assistant entity definitions"""
     try:
-        token = client.get_token()
-        if not token:
+        props, age, version = _read_properties(_device_id())
+        if props is None:
             return jsonify({
                 "success": False,
                 "error": "Failed to get access token"
             }), 401
         
-        props = client.get_device_properties(PRIMARY_DEVICE_ID, token)
+        etag, last_modified = _validators(version, props)
+        not_modified = _not_modified(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        # Device-scoped routes get unique entity IDs per device
+        prefix = "sensor.tuya_"
+        if g.tuya_device_key is not None:
+            prefix += _slug(g.tuya_device.name or g.tuya_device.device_id) + "_"
         
         entities = {}
         for code, value in props.items():
             entity = {
-                "entity_id": f"sensor.tuya_{code}",
+                "entity_id": f"{prefix}{code}",
                 "name": code.replace("_", " ").title(),
                 "state": value,
                 "attributes": {
@@ -401,19 +811,24 @@ def ha_entities():
                     "icon": _get_icon_for_property(code)
                 }
             }
-            entities[f"sensor.tuya_{code}"] = entity
+            entities[f"{prefix}{code}"] = entity
         
-        return jsonify({
+        return _with_validators(jsonify({
             "success": True,
             "entities": entities,
-            "count": len(entities)
-        })
+            "count": len(entities),
+            "snapshot_age": age
+        }), etag, last_modified)
     except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
         }), 400
 
+def _slug(text):
+    """Home Assistant style object ID part ("Living Room" -> "living_room")"""
+    return "_".join("".join(c if c.isalnum() else " " for c in text.lower()).split())
+
 def _get_icon_for_property(property_name):
     """Get appropriate icon for property"""
     icons = {
@@ -437,14 +852,14 @@ def _get_icon_for_property(property_name):
 # Error Handlers
 # ============================================================
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     return jsonify({
         "success": False,
         "error": "Endpoint not found"
     }), 404
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def server_error(error):
     return jsonify({
         "success": False,
@@ -461,8 +876,16 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Tuya Client Home Assistant REST API")
     parser.add_argument("--port", type=int, default=5000, help="Port to run on")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind to")
+    parser.add_argument("--config", default="config.yaml", help="Path to config.yaml")
     args = parser.parse_args()
     
+    setup_logging()
+    try:
+        app = create_app(args.config)
+    except Exception as e:
+        _LOGGER.error(f"❌ Failed to start REST API: {e}")
+        sys.exit(1)
+    
     print(f"""
 ╔════════════════════════════════════════════════════════════╗
 ║  🏠 Tuya Client - Home Assistant REST API                 ║
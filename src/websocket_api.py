@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+WebSocket channel for the REST API (optional, needs: pip install flask-sock)
+
+One persistent socket per client carries both directions as JSON text frames.
+
+Server -> client:
+  {"type": "hello", "devices": [...], "push": true}
+  {"type": "state", "device_id": ..., "version": ..., "properties": {...}}
+  {"type": "delta", "device_id": ..., "version": ..., "changes": {...}, "event_id": ...}
+  {"type": "ack", "id": ..., "device_id": ..., "success": true|false, "error": ...}
+  {"type": "resync"}    (deltas were lost, full state follows)
+  {"type": "pong", "id": ...} / {"type": "error", "id": ..., "error": ...}
+
+An unknown ?device= in the URL is answered with an "error" message and
+the socket is closed (policy violation, 1008). Failed commands are acked
+with the reason (validation or cloud error) in "error".
+
+Client -> server:
+  {"type": "set", "id": "c1", "device": "<id|name>", "property": "temp_set", "value": 220}
+  {"type": "batch", "id": "c2", "properties": [{"property": ..., "value": ...}, ...]}
+  {"type": "subscribe", "devices": [...], "codes": [...]}
+  {"type": "ping", "id": ...}
+
+"device" defaults to the primary device. Commands are acknowledged
+asynchronously once the cloud or the device (LAN) has confirmed them; the
+socket keeps reading meanwhile. Commands for one device run in order.
+A queued "set" is dropped (acked with "superseded_by") when a newer "set"
+of the same property arrives, so rapid slider movements only send the
+latest value.
+
+A socket costs only its WSGI handler thread: deltas for all sockets are
+read from the event hub by one shared fan-out thread and written from
+there, with no pusher thread per client. A client that stops reading
+delays the fan-out until its send fails (ping_interval closes dead
+sockets).
+"""
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Set
+
+from flask import Flask, current_app, request
+
+import json_codec
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def register_websocket(app: Flask) -> bool:
+    """
+    Add the /ws route if flask-sock is installed and 'websocket.enabled' is not false
+    
+    Returns:
+        True if the route was registered
+    """
+    config = app.extensions["tuya_client"].config.get("websocket") or {}
+    if not config.get("enabled", True):
+        return False
+    try:
+        from flask_sock import Sock
+    except ImportError:
+        _LOGGER.info("flask-sock not installed, /ws disabled")
+        return False
+    
+    app.config.setdefault("SOCK_SERVER_OPTIONS",
+                          {"ping_interval": config.get("ping_interval", 25)})
+    client = app.extensions["tuya_client"]
+    app.extensions["tuya_ws_executor"] = ThreadPoolExecutor(
+        max_workers=client.pool_size, thread_name_prefix="tuya-ws")
+    hub = app.extensions.get("tuya_events")
+    if hub is not None:
+        heartbeat = float((client.config.get("events") or {}).get("heartbeat", 15))
+        app.extensions["tuya_ws_fanout"] = _Fanout(hub, heartbeat)
+    Sock(app).route("/ws")(websocket)
+    return True
+
+
+def _split(values):
+    """Query/message list given repeatedly and/or comma separated"""
+    if isinstance(values, str):
+        values = [values]
+    return [item for value in values or [] for item in str(value).split(",") if item]
+
+
+def websocket(ws):
+    """State deltas and commands over one socket (see module docstring)"""
+    connection = _Connection(ws, current_app)
+    error = connection.subscribe(_split(request.args.getlist("device")),
+                                 _split(request.args.getlist("code")))
+    if error:
+        # Like /events (404): no silent fallback to all devices
+        connection.send({"type": "error", "error": error})
+        ws.close(reason=1008, message=error)
+        return
+    connection.start()
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                continue
+            connection.handle(message)
+    finally:
+        connection.close()
+
+
+class _Command:
+    __slots__ = ("id", "kind", "device_id", "values")
+    
+    def __init__(self, command_id, kind: str, device_id: str, values: Dict[str, Any]):
+        self.id = command_id
+        self.kind = kind
+        self.device_id = device_id
+        self.values = values
+
+
+class _Fanout:
+    """Single hub reader that delivers deltas to every open socket"""
+    
+    def __init__(self, hub, heartbeat: float):
+        self.hub = hub
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._connections: Set["_Connection"] = set()
+        self._thread: Optional[threading.Thread] = None
+    
+    def add(self, connection: "_Connection") -> None:
+        """Deliver events published from now on to connection"""
+        with self._lock:
+            self._connections.add(connection)
+            if self._thread is None:
+                # Started with the first socket, ends after the last one
+                cursor = self.hub.subscribe()
+                self._thread = threading.Thread(target=self._run, args=(cursor,),
+                                                name="tuya-ws-fanout", daemon=True)
+                self._thread.start()
+    
+    def discard(self, connection: "_Connection") -> None:
+        with self._lock:
+            self._connections.discard(connection)
+    
+    def _run(self, cursor: int) -> None:
+        try:
+            while True:
+                events, cursor, lost = self.hub.wait(cursor, self.heartbeat)
+                with self._lock:
+                    if not self._connections:
+                        self._thread = None
+                        return
+                    connections = list(self._connections)
+                if events or lost:
+                    for connection in connections:
+                        connection.deliver(events, lost)
+        finally:
+            self.hub.unsubscribe()
+
+
+class _Connection:
+    """One client socket: delta delivery, per-device command queues, acks"""
+    
+    def __init__(self, ws, app: Flask):
+        self.ws = ws
+        # Captured here: fan-out and executor threads run without app context
+        self.client = app.extensions["tuya_client"]
+        self.primary = app.extensions["tuya_primary_device"]
+        self.poller = app.extensions.get("tuya_poller")
+        self.hub = app.extensions.get("tuya_events")
+        self.fanout: Optional[_Fanout] = app.extensions.get("tuya_ws_fanout")
+        self.executor: ThreadPoolExecutor = app.extensions["tuya_ws_executor"]
+        self.dumps = app.json.dumps
+        
+        self.devices: Set[str] = set()
+        self.codes: Set[str] = set()
+        self.closed = False
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[_Command]] = {}
+        self._running: Set[str] = set()
+    
+    def send(self, message: Dict[str, Any]) -> None:
+        data = self.dumps(message)
+        try:
+            with self._send_lock:
+                self.ws.send(data)
+        except Exception:
+            # Socket gone, the reader loop ends the connection
+            self.closed = True
+    
+    def start(self) -> None:
+        devices = [{"device_id": device.device_id, "name": device.name}
+                   for device in self.client.config.devices]
+        self.send({"type": "hello", "devices": devices, "push": self.poller is not None})
+        if self.poller is None or self.fanout is None:
+            return
+        # Registered before the state: changes in between arrive as deltas
+        self.fanout.add(self)
+        self.send_state()
+    
+    def close(self) -> None:
+        self.closed = True
+        if self.fanout is not None:
+            self.fanout.discard(self)
+        with self._lock:
+            self._queues.clear()
+    
+    def subscribe(self, devices, codes) -> Optional[str]:
+        """Set the filters, Returns: error message or None"""
+        ids = set()
+        for key in devices:
+            device = self.client.config.device(key)
+            if device is None:
+                return f"Device {key} not found"
+            ids.add(device.device_id)
+        self.devices = ids
+        self.codes = set(codes)
+        return None
+    
+    def _wanted(self, device_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        if self.devices and device_id not in self.devices:
+            return {}
+        if self.codes:
+            return {code: prop for code, prop in changes.items() if code in self.codes}
+        return changes
+    
+    def send_state(self) -> None:
+        """Full state of all subscribed devices from the poller snapshot"""
+        if self.poller is None:
+            return
+        for device_id, state in self.poller.snapshot().items():
+            properties = self._wanted(device_id, state.properties)
+            if properties:
+                self.send({"type": "state", "device_id": device_id,
+                           "version": state.version, "properties": properties})
+    
+    def deliver(self, events, lost: bool) -> None:
+        """Push hub events to this socket (fan-out thread)"""
+        if self.closed:
+            return
+        if lost:
+            self.send({"type": "resync"})
+            self.send_state()
+            return
+        for event in events:
+            changes = self._wanted(event.device_id, event.changes)
+            if changes:
+                self.send({"type": "delta", "device_id": event.device_id,
+                           "version": event.version, "changes": changes,
+                           "event_id": self.hub.event_id(event.seq)})
+    
+    def handle(self, text) -> None:
+        """Dispatch one client message"""
+        try:
+            message = json_codec.loads(text)
+        except ValueError:
+            self.send({"type": "error", "error": "Invalid JSON"})
+            return
+        if not isinstance(message, dict):
+            self.send({"type": "error", "error": "Expected a JSON object"})
+            return
+        
+        kind = message.get("type")
+        command_id = message.get("id")
+        if kind == "ping":
+            self.send({"type": "pong", "id": command_id})
+        elif kind == "subscribe":
+            error = self.subscribe(_split(message.get("devices")), _split(message.get("codes")))
+            if error:
+                self.send({"type": "error", "id": command_id, "error": error})
+            else:
+                self.send_state()
+        elif kind in ("set", "batch"):
+            self._command(kind, command_id, message)
+        else:
+            self.send({"type": "error", "id": command_id, "error": f"Unknown type {kind!r}"})
+    
+    def _ack(self, command_id, device_id, success: bool, **extra) -> None:
+        self.send({"type": "ack", "id": command_id, "device_id": device_id,
+                   "success": success, **extra})
+    
+    def _command(self, kind: str, command_id, message: Dict[str, Any]) -> None:
+        key = message.get("device")
+        device = self.primary if key is None else self.client.config.device(key)
+        if device is None:
+            self._ack(command_id, None, False, error=f"Device {key} not found")
+            return
+        
+        items = [message] if kind == "set" else message.get("properties") or []
+        values = {}
+        for item in items:
+            code = item.get("property") if isinstance(item, dict) else None
+            if not code or item.get("value") is None:
+                self._ack(command_id, device.device_id, False, error="Missing property or value")
+                return
+            values[code] = item["value"]
+        if not values:
+            self._ack(command_id, device.device_id, False, error="Missing property or value")
+            return
+        
+        self._enqueue(_Command(command_id, kind, device.device_id, values))
+    
+    def _enqueue(self, command: _Command) -> None:
+        superseded = []
+        with self._lock:
+            queue = self._queues.setdefault(command.device_id, deque())
+            if command.kind == "set":
+                # Only the newest value of a property is still worth sending
+                kept = deque()
+                for queued in queue:
+                    if queued.kind == "set" and queued.values.keys() == command.values.keys():
+                        superseded.append(queued)
+                    else:
+                        kept.append(queued)
+                queue = self._queues[command.device_id] = kept
+            queue.append(command)
+            start = command.device_id not in self._running
+            if start:
+                self._running.add(command.device_id)
+        
+        for queued in superseded:
+            self._ack(queued.id, queued.device_id, False, superseded_by=command.id)
+        if start:
+            self.executor.submit(self._drain, command.device_id)
+    
+    def _drain(self, device_id: str) -> None:
+        """Run the queued commands of one device in order (executor thread)"""
+        while True:
+            with self._lock:
+                queue = self._queues.get(device_id)
+                if not queue or self.closed:
+                    self._running.discard(device_id)
+                    return
+                command = queue.popleft()
+            self._run(command)
+    
+    def _run(self, command: _Command) -> None:
+        try:
+            error = self.client.send_device_properties(command.device_id, None, command.values)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        
+        if error:
+            self._ack(command.id, command.device_id, False, error=error)
+            return
+        if self.poller is not None:
+            # Publishes the delta to every subscriber, this one included
+            self.poller.apply_values(command.device_id, command.values)
+        self._ack(command.id, command.device_id, True, values=command.values)
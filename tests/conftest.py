@@ -0,0 +1,49 @@
+"""
+Gemeinsame Fixtures: Mock Tuya Cloud im Test-Prozess
+
+Die Module in src/ werden wie von den Skripten als flache Imports geladen.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from config_loader import TuyaConfig  # noqa: E402
+from mock_tuya_cloud import MOCK_ACCESS_ID, MOCK_ACCESS_KEY, MockTuyaCloud  # noqa: E402
+
+
+def make_config(server: MockTuyaCloud, **sections) -> TuyaConfig:
+    """Config für den Mock, einzelne Abschnitte überschreibbar"""
+    raw = {
+        "cloud": {
+            "access_id": MOCK_ACCESS_ID,
+            "access_key": MOCK_ACCESS_KEY,
+            "base_url": server.base_url,
+        },
+        "devices": [{"device_id": device_id, "name": f"Room {index}"}
+                    for index, device_id in enumerate(server.device_ids)],
+        "rate_limit": {"enabled": False},
+        "retry": {"base_delay": 0.01, "max_delay": 0.02, "deadline": 5},
+        "poller": {"enabled": False},
+    }
+    raw.update(sections)
+    return TuyaConfig(raw)
+
+
+@pytest.fixture
+def mock_cloud():
+    server = MockTuyaCloud(port=0, device_count=2, seed=1).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def cloud_client(mock_cloud):
+    from client import TuyaCloudClient
+    
+    client = TuyaCloudClient(config=make_config(mock_cloud))
+    yield client
+    client.close()
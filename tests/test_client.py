@@ -0,0 +1,157 @@
+"""TuyaCloudClient gegen den Mock: Circuit Breaker, Single-Flight, Shadow-Diff"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from client import TuyaCloudClient
+from conftest import make_config
+
+
+def _external_change(server, device_id, code, value):
+    """Wert ändert sich in der Cloud (z.B. per Fernbedienung)"""
+    prop = server.devices[device_id].properties[code]
+    prop["value"] = value
+    prop["time"] = int(time.time() * 1000)
+
+
+def test_properties_and_set(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    props = cloud_client.get_device_properties(device_id, max_staleness=0)
+    assert props["temp_set"]["value"] == 220
+    
+    assert cloud_client.set_device_properties(device_id, None, {"temp_set": 230, "Power": True})
+    assert mock_cloud.devices[device_id].properties["temp_set"]["value"] == 230
+    # Write-Through: der Cache kennt den bestätigten Wert ohne neuen Request
+    assert cloud_client.get_device_properties(device_id)["temp_set"]["value"] == 230
+
+
+def test_invalid_value_is_rejected(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    assert not cloud_client.set_device_properties(device_id, None, {"temp_set": 999})
+    assert mock_cloud.devices[device_id].properties["temp_set"]["value"] == 220
+
+
+def _add_property(server, device_id, code, dp_id, prop_type, value):
+    """Gerät bekommt eine neue Property (z.B. nach Firmware-Update)"""
+    device = server.devices[device_id]
+    device.properties[code] = {"code": code, "dp_id": dp_id, "type": prop_type, "value": value,
+                               "time": int(time.time() * 1000), "custom_name": ""}
+    device.ranges[code] = None
+
+
+def test_out_of_range_value_keeps_schema(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    cloud_client.get_device_properties(device_id)
+    schema = cloud_client._cached_schema(device_id)
+    
+    # Bekannter Code, Wert außerhalb des Bereichs: Cloud lehnt ab, Schema bleibt
+    assert cloud_client.send_device_properties(device_id, None, {"temp_set": 999}) \
+        == "param is out of range"
+    assert cloud_client._cached_schema(device_id) is schema
+    
+    # Code, den das Gerät nicht mehr kennt: Schema wird verworfen
+    del mock_cloud.devices[device_id].properties["sleep"]
+    assert cloud_client.send_device_properties(device_id, None, {"sleep": "off"})
+    assert cloud_client._cached_schema(device_id) is None
+
+
+class _FakeLocal:
+    """LAN-Stand-in: liefert die Werte des Mock-Geräts über die DP-IDs"""
+    
+    def __init__(self, server):
+        self.server = server
+        self.sent = []
+    
+    def query(self, device_id):
+        return {str(prop["dp_id"]): prop["value"]
+                for prop in self.server.devices[device_id].properties.values()}
+    
+    def set_dps(self, device_id, dps):
+        self.sent.append((device_id, dps))
+        return True
+    
+    def close(self):
+        pass
+
+
+def test_new_code_reloads_schema_from_cloud_with_lan(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    cloud_client.local = _FakeLocal(mock_cloud)
+    cloud_client.get_device_properties(device_id)
+    _add_property(mock_cloud, device_id, "child_lock", 40, "bool", False)
+    
+    # Das LAN kennt nur das gecachte Schema, neu geladen wird aus der Cloud
+    assert cloud_client.send_device_properties(device_id, None, {"child_lock": True}) is None
+    assert cloud_client.local.sent == [(device_id, {"40": True})]
+    assert "child_lock" in cloud_client._cached_schema(device_id)
+
+
+def test_async_new_code_reloads_schema(mock_cloud):
+    pytest.importorskip("aiohttp")
+    from async_client import AsyncTuyaCloudClient
+    
+    device_id = mock_cloud.device_ids[0]
+    
+    async def main():
+        async with AsyncTuyaCloudClient(config=make_config(mock_cloud)) as client:
+            await client.get_device_properties(device_id)
+            _add_property(mock_cloud, device_id, "child_lock", 40, "bool", False)
+            return await client.send_device_properties(device_id, None, {"child_lock": True})
+    
+    assert asyncio.run(main()) is None
+    assert mock_cloud.devices[device_id].properties["child_lock"]["value"] is True
+
+
+def test_concurrent_reads_share_one_request(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    cloud_client.get_token()
+    mock_cloud.latency = 0.2
+    before = mock_cloud.stats["shadow"]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(
+            lambda _: cloud_client.get_device_properties(device_id, max_staleness=0), range(8)))
+    assert all(result["temp_set"]["value"] == 220 for result in results)
+    assert mock_cloud.stats["shadow"] - before < 8
+
+
+def test_circuit_breaker_serves_last_known_data(mock_cloud):
+    config = make_config(mock_cloud,
+                         circuit_breaker={"failure_threshold": 2, "recovery_timeout": 60},
+                         retry={"max_attempts": 1, "base_delay": 0.01, "deadline": 5})
+    client = TuyaCloudClient(config=config)
+    try:
+        device_id = mock_cloud.device_ids[0]
+        assert client.get_device_properties(device_id, max_staleness=0)["Power"]["value"] is False
+        
+        mock_cloud.http_error_rate = 1
+        for _ in range(3):
+            props = client.get_device_properties(device_id, max_staleness=0)
+        assert client.circuit_breaker.state == "open"
+        # Letzte bekannte Werte statt eines Fehlers
+        assert props["Power"]["value"] is False
+        
+        # Offen: keine weiteren Requests an die Cloud
+        before = mock_cloud.stats["requests"]
+        client.get_device_properties(device_id, max_staleness=0)
+        assert not client.set_device_properties(device_id, None, {"Power": True})
+        assert mock_cloud.stats["requests"] == before
+    finally:
+        client.close()
+
+
+def test_shadow_changes_only_contain_differences(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    full = cloud_client.get_property_changes(device_id, 0, max_staleness=0)
+    assert full["full"] and "temp_set" in full["changes"]
+    
+    unchanged = cloud_client.get_property_changes(device_id, full["version"], max_staleness=0)
+    assert unchanged["version"] == full["version"] and unchanged["changes"] == {}
+    
+    _external_change(mock_cloud, device_id, "mode", "cold")
+    delta = cloud_client.get_property_changes(device_id, full["version"], max_staleness=0)
+    assert not delta["full"] and delta["version"] > full["version"]
+    assert list(delta["changes"]) == ["mode"]
+    assert delta["changes"]["mode"]["value"] == "cold"
@@ -0,0 +1,76 @@
+import json
+import os
+import stat
+
+import pytest
+
+import config_loader
+
+
+CONFIG = """\
+cloud:
+  access_id: test-id
+  access_key: test-secret
+  region: eu
+devices:
+  - device_id: dev1
+    name: Wohnzimmer
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("TUYA_CONFIG_CACHE_DIR", str(tmp_path / "cache"))
+    config_loader.clear_cache()
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    yield str(path)
+    config_loader.clear_cache()
+
+
+def test_disk_cache_is_private_json(config_file):
+    config = config_loader.load_config(config_file)
+    assert config.device("Wohnzimmer").device_id == "dev1"
+    
+    cache_file = config_loader._cache_file(os.path.abspath(config_file))
+    assert cache_file.suffix == ".json"
+    entry = json.loads(cache_file.read_text())
+    assert entry["data"]["cloud"]["access_key"] == "test-secret"
+    if os.name == "posix":
+        assert stat.S_IMODE(cache_file.stat().st_mode) == 0o600
+        assert stat.S_IMODE(cache_file.parent.stat().st_mode) == 0o700
+
+
+def test_disk_cache_is_used(config_file, monkeypatch):
+    config_loader.load_config(config_file)
+    config_loader.clear_cache()
+    monkeypatch.setattr(config_loader, "_parse_yaml", lambda content: pytest.fail("YAML parsed"))
+    assert config_loader.load_config(config_file).cloud.access_id == "test-id"
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_writable_cache_file_is_ignored(config_file):
+    config_loader.load_config(config_file)
+    cache_file = config_loader._cache_file(os.path.abspath(config_file))
+    entry = json.loads(cache_file.read_text())
+    entry["data"]["cloud"]["access_id"] = "injected"
+    cache_file.write_text(json.dumps(entry))
+    
+    os.chmod(cache_file, 0o666)
+    config_loader.clear_cache()
+    assert config_loader.load_config(config_file).cloud.access_id == "test-id"
+
+
+def test_corrupt_cache_falls_back_to_yaml(config_file):
+    config_loader.load_config(config_file)
+    cache_file = config_loader._cache_file(os.path.abspath(config_file))
+    cache_file.write_bytes(b"\x80\x04not json")
+    config_loader.clear_cache()
+    assert config_loader.load_config(config_file).cloud.access_id == "test-id"
+
+
+def test_yaml_only_values_are_not_cached(config_file):
+    with open(config_file, "a") as f:
+        f.write("meta:\n  created: 2024-01-01\n  1: int key\n")
+    config_loader.load_config(config_file)
+    assert not config_loader._cache_file(os.path.abspath(config_file)).exists()
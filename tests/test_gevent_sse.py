@@ -0,0 +1,114 @@
+"""Smoke-Test: viele /events Abonnenten unter gunicorn + gevent (gunicorn.conf.py)"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+pytest.importorskip("gevent")
+pytest.importorskip("gunicorn")
+yaml = pytest.importorskip("yaml")
+
+from mock_tuya_cloud import MOCK_ACCESS_ID, MOCK_ACCESS_KEY  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+SUBSCRIBERS = 200
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _open_stream(port: int) -> socket.socket:
+    sock = socket.create_connection(("127.0.0.1", port), timeout=10)
+    sock.sendall(b"GET /events?code=temp_set HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    return sock
+
+
+def _read_until(sock: socket.socket, marker: bytes) -> bytes:
+    data = b""
+    while marker not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise AssertionError(f"Stream geschlossen vor {marker!r}: {data[-200:]!r}")
+        data += chunk
+    return data
+
+
+@pytest.fixture
+def gunicorn_server(mock_cloud, tmp_path):
+    config = tmp_path / "config.yaml"
+    config.write_text(yaml.safe_dump({
+        "cloud": {"access_id": MOCK_ACCESS_ID, "access_key": MOCK_ACCESS_KEY,
+                  "base_url": mock_cloud.base_url},
+        "devices": [{"device_id": device_id, "name": f"Room {index}"}
+                    for index, device_id in enumerate(mock_cloud.device_ids)],
+        "rate_limit": {"enabled": False},
+        "poller": {"interval": 3600},
+        "events": {"heartbeat": 1},
+    }))
+    port = _free_port()
+    env = dict(os.environ, TUYA_CONFIG=str(config), TUYA_BIND=f"127.0.0.1:{port}")
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+                               cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2):
+                    break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise AssertionError(process.stderr.read().decode(errors="replace")[-2000:])
+                time.sleep(0.2)
+        yield port, process.pid
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def _worker_threads(master_pid: int) -> int:
+    """OS-Threads des (einzigen) Worker-Prozesses"""
+    children = Path(f"/proc/{master_pid}/task/{master_pid}/children")
+    if not children.exists():
+        pytest.skip("/proc nicht verfügbar")
+    worker = children.read_text().split()[0]
+    return len(os.listdir(f"/proc/{worker}/task"))
+
+
+def test_many_subscribers_share_one_worker(gunicorn_server, mock_cloud):
+    port, master_pid = gunicorn_server
+    streams = [_open_stream(port) for _ in range(SUBSCRIBERS)]
+    try:
+        for sock in streams:
+            _read_until(sock, b"retry: 3000")
+        
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+            health = json.loads(response.read())
+        assert health["events"]["subscribers"] == SUBSCRIBERS
+        # Greenlets statt eines Threads pro offenem Stream
+        assert _worker_threads(master_pid) < 20
+        
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/set", method="POST",
+            data=json.dumps({"property": "temp_set", "value": 245}).encode(),
+            headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            assert json.loads(response.read())["success"] is True
+        
+        for sock in streams:
+            _read_until(sock, b'"value":245')
+    finally:
+        for sock in streams:
+            sock.close()
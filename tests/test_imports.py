@@ -0,0 +1,28 @@
+"""Import aus dem Repository-Verzeichnis (README) und flach aus src/"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _run(code: str, cwd: Path) -> str:
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_package_import_from_repo_root():
+    out = _run(
+        "from src.client import TuyaCloudClient\n"
+        "from src.models import PropertyValue, to_jsonable\n"
+        "import client, models\n"
+        "print(TuyaCloudClient is client.TuyaCloudClient, PropertyValue is models.PropertyValue)",
+        ROOT)
+    assert out == "True True"
+
+
+def test_flat_import_from_src():
+    assert _run("from client import TuyaCloudClient; print('ok')", ROOT / "src") == "ok"
@@ -0,0 +1,206 @@
+import threading
+import time
+
+import pytest
+
+import json_codec
+
+pytest.importorskip("cryptography")
+
+from local_transport import LocalTransport
+
+
+class _SlowClient:
+    """Client stub: local_key of 'slow' only via a slow cloud request"""
+    
+    def __init__(self):
+        self.release = threading.Event()
+        self.devices = {
+            "slow": {"ip": "192.0.2.1"},
+            "fast": {"ip": "192.0.2.2", "local_key": "0123456789abcdef"},
+        }
+    
+    def get_device_status(self, device_id):
+        self.release.wait(5)
+        return {"local_key": "fedcba9876543210"}
+
+
+def test_key_lookup_does_not_block_other_devices():
+    client = _SlowClient()
+    transport = LocalTransport(client)
+    slow = threading.Thread(target=transport._device, args=("slow",))
+    slow.start()
+    try:
+        time.sleep(0.05)
+        started = time.monotonic()
+        assert transport._device("fast") is not None
+        assert time.monotonic() - started < 1
+    finally:
+        client.release.set()
+        slow.join()
+    assert transport._device("slow").local_key == b"fedcba9876543210"
+
+
+def test_device_without_ip_stays_cloud_only():
+    client = _SlowClient()
+    client.devices["cloud"] = {}
+    assert LocalTransport(client)._device("cloud") is None
+
+
+# Known-answer Frames, erzeugt mit tinytuya 1.20.0 (Device._encode_message,
+# pack_message) für local_key "0123456789abcdef", Gerät "dev1"
+LOCAL_KEY = b"0123456789abcdef"
+CLIENT_NONCE = b"0123456789abcdef"
+DEVICE_NONCE = b"fedcba9876543210"
+SESSION_KEY = bytes.fromhex("6575cf6b37479d9215337ff9767fe786")
+
+V33_QUERY = (1, 0x0A, b'{"gwId":"dev1","devId":"dev1","uid":"dev1","t":"1700000000"}', bytes.fromhex(
+    "000055aa000000010000000a00000048e85dd832581fe4732bedd0efe0450ac930ae971ddb90f43af417c83d"
+    "11e56ead89343b1bf77cf753bd8e6bb91a7c405ebe23f34440aefb47c4fa7fbe7027af01536215a50000aa55"))
+V33_CONTROL = (2, 0x07, b'{"devId":"dev1","uid":"dev1","t":"1700000000","dps":{"1":true}}', bytes.fromhex(
+    "000055aa000000020000000700000057332e33000000000000000000000000f36f3bf3e082b0e0638499f4fd"
+    "3402c5012eea3a0f92a31c78edff31ddfdb02514289c9042f2aa08005786aab66fcc6d5c91b94d45d4e66e52"
+    "2e93cf8c4ab1fee69478870000aa55"))
+V34_CONTROL = (3, 0x0D, b'{"protocol":5,"t":1700000000,"data":{"dps":{"1":true}}}', bytes.fromhex(
+    "000055aa000000030000000d00000074746f1879e5e3003a5bd64e0aad1234deb1d6698735beb08e7136e12a"
+    "8c733cc407868ba7df4ea4d319e2e31a088e8bd991f0abcb1317a64b50e0dfd7822feefe2f085389a58e8fab"
+    "1575d7dc735771488bfbbe84734e7abbd7f8fa7a3f3a5092af4d76558288f749804b6fa9f2fa49770000aa55"))
+V34_QUERY = (4, 0x10, b"{}", bytes.fromhex(
+    "000055aa00000004000000100000003428bad438110dae722c4089f9c4f9e904d2df4c2727f58809d2d79e9d"
+    "183eb735d172880ba29b23a19c679555e19568350000aa55"))
+V34_NEG_START = bytes.fromhex(
+    "000055aa00000001000000030000004472727e881edcfd0100a718687909b565377222e061a924c591cd9c27"
+    "ea163ed4d7dd1f9eb60b8cb5b90748aa228534c62460d05b84665c9e692efc896dd77d680000aa55")
+# Antworten vom Gerät (retcode 0)
+V33_REPLY = (7, 0x0A, b'{"devId":"dev1","dps":{"1":true,"2":20}}', bytes.fromhex(
+    "000055aa000000070000000a0000003c00000000f36f3bf3e082b0e0638499f4fd3402c579644ab9afbda994"
+    "a9f8a6c9cecdf2b2a2c1ee9a008a52cdb00aaa66bd43942fce41bbe20000aa55"))
+V34_REPLY = (8, 0x10, b'{"dps":{"1":true,"2":20}}', bytes.fromhex(
+    "000055aa000000080000001000000048000000001955105efbf5be3514f00e8b4e10d683b55652b3ec9a5d78"
+    "7c9d65845afa9ee098210cbc3193e3a0568f66be0b3a57633736415c4a730404241b492f487eb9560000aa55"))
+
+
+def _client_codec(version):
+    from local_transport import TuyaLocalDevice
+    
+    codec = TuyaLocalDevice("dev1", "127.0.0.1", LOCAL_KEY.decode(), version)
+    if version == "3.4":
+        codec._session_key = SESSION_KEY
+    return codec
+
+
+def test_session_key_vector():
+    import mock_tuya_device
+    from local_transport import session_key
+    
+    assert session_key(LOCAL_KEY, CLIENT_NONCE, DEVICE_NONCE) == SESSION_KEY
+    assert mock_tuya_device.derive_session_key(LOCAL_KEY, CLIENT_NONCE, DEVICE_NONCE) == SESSION_KEY
+
+
+@pytest.mark.parametrize("version, vector", [
+    ("3.3", V33_QUERY), ("3.3", V33_CONTROL), ("3.4", V34_CONTROL), ("3.4", V34_QUERY),
+])
+def test_client_frames_match_vectors(version, vector):
+    from local_transport import pack_message
+    
+    seqno, cmd, plain, frame = vector
+    codec = _client_codec(version)
+    assert pack_message(seqno, cmd, codec.encode_payload(cmd, plain), codec._hmac_key()) == frame
+
+
+def test_client_negotiation_frame_matches_vector():
+    from local_transport import aes_encrypt, pack_message
+    
+    assert pack_message(1, 0x03, aes_encrypt(LOCAL_KEY, CLIENT_NONCE), LOCAL_KEY) == V34_NEG_START
+
+
+@pytest.mark.parametrize("version, vector", [("3.3", V33_REPLY), ("3.4", V34_REPLY)])
+def test_client_parses_device_vectors(version, vector):
+    from local_transport import unpack_message
+    
+    seqno, cmd, plain, frame = vector
+    codec = _client_codec(version)
+    message = unpack_message(frame, codec._hmac_key())
+    assert (message.seqno, message.cmd, message.retcode) == (seqno, cmd, 0)
+    assert codec.decode_payload(message.payload) == json_codec.loads(plain)
+
+
+@pytest.mark.parametrize("version, vector", [
+    ("3.3", V33_QUERY), ("3.3", V33_CONTROL), ("3.4", V34_CONTROL), ("3.4", V34_QUERY),
+])
+def test_emulator_parses_client_vectors(version, vector):
+    import mock_tuya_device as device
+    
+    seqno, cmd, plain, frame = vector
+    key = SESSION_KEY if version == "3.4" else None
+    assert device.unpack_frame(frame, key)[:2] == (seqno, cmd)
+    payload = device.unpack_frame(frame, key)[2]
+    assert device.decode_request(version, key or LOCAL_KEY, payload) == json_codec.loads(plain)
+
+
+@pytest.mark.parametrize("version, vector", [("3.3", V33_REPLY), ("3.4", V34_REPLY)])
+def test_emulator_frames_match_vectors(version, vector):
+    import mock_tuya_device as device
+    
+    seqno, cmd, plain, frame = vector
+    key = SESSION_KEY if version == "3.4" else None
+    payload = device.encode_reply(version, key or LOCAL_KEY, cmd, plain)
+    assert device.pack_frame(seqno, cmd, payload, key) == frame
+
+
+def test_corrupt_frame_is_rejected():
+    from local_transport import LocalProtocolError, unpack_message
+    
+    frame = bytearray(V33_REPLY[3])
+    frame[20] ^= 0xFF
+    with pytest.raises(LocalProtocolError):
+        unpack_message(bytes(frame))
+
+
+@pytest.fixture(params=["3.3", "3.4"])
+def emulator(request):
+    from mock_tuya_device import MockTuyaDevice
+    
+    device = MockTuyaDevice("dev1", LOCAL_KEY.decode(), request.param, port=0).start()
+    yield device
+    device.stop()
+
+
+def test_client_against_emulator(emulator):
+    from local_transport import TuyaLocalDevice
+    
+    device = TuyaLocalDevice("dev1", "127.0.0.1", LOCAL_KEY.decode(), emulator.version,
+                             port=emulator.port)
+    try:
+        assert device.status() == {"1": False, "2": 20, "4": "auto"}
+        # Die STATUS Meldung nach CONTROL wird beim nächsten Aufruf übersprungen
+        device.set_dps({"1": True, "2": 23})
+        assert device.status() == {"1": True, "2": 23, "4": "auto"}
+        assert emulator.dps["2"] == 23
+    finally:
+        device.close()
+
+
+def test_emulator_rejects_unknown_dps(emulator):
+    from local_transport import LocalProtocolError, TuyaLocalDevice
+    
+    device = TuyaLocalDevice("dev1", "127.0.0.1", LOCAL_KEY.decode(), emulator.version,
+                             port=emulator.port)
+    try:
+        with pytest.raises(LocalProtocolError):
+            device.set_dps({"99": 1})
+        assert "99" not in emulator.dps
+    finally:
+        device.close()
+
+
+def test_wrong_local_key_fails(emulator):
+    from local_transport import LocalProtocolError, TuyaLocalDevice
+    
+    device = TuyaLocalDevice("dev1", "127.0.0.1", "fedcba9876543210", emulator.version,
+                             port=emulator.port, timeout=1)
+    try:
+        with pytest.raises((LocalProtocolError, OSError)):
+            device.status()
+    finally:
+        device.close()
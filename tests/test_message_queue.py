@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("cryptography")
+
+from aiohttp import web  # noqa: E402
+
+from message_queue import MessageQueueSubscriber  # noqa: E402
+from mock_mq_server import MockMessageQueue  # noqa: E402
+from mock_tuya_cloud import MOCK_ACCESS_ID, MOCK_ACCESS_KEY  # noqa: E402
+
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Bedingung nicht erfüllt")
+        await asyncio.sleep(0.01)
+
+
+def run_with_mq(client, scenario, mode=None, access_key=MOCK_ACCESS_KEY):
+    """Startet MockMessageQueue und Subscriber in einem Event Loop und führt scenario aus"""
+    async def main():
+        mock = MockMessageQueue(MOCK_ACCESS_ID, access_key, mode)
+        runner = web.AppRunner(mock.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        subscriber = MessageQueueSubscriber(client, url=f"ws://127.0.0.1:{port}/",
+                                            heartbeat=5, reconnect_delay=0.01,
+                                            max_reconnect_delay=0.05)
+        task = asyncio.ensure_future(subscriber.run())
+        try:
+            await scenario(mock, subscriber)
+        finally:
+            subscriber.stop(timeout=None)
+            await asyncio.wait_for(task, 5)
+            await runner.cleanup()
+    
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("mode", [None, "aes_gcm"])
+def test_status_push_is_acked_and_applied(cloud_client, mock_cloud, mode):
+    device_id = mock_cloud.device_ids[0]
+    cloud_client.get_device_properties(device_id)
+    version = cloud_client.shadow_tracker.version(device_id)
+    
+    async def scenario(mock, subscriber):
+        await mock.wait_connected()
+        message_id = await mock.publish(device_id, [{"code": "temp_set", "value": 235}])
+        await wait_for(lambda: message_id in mock.acked)
+    
+    run_with_mq(cloud_client, scenario, mode)
+    assert cloud_client.shadow_tracker.version(device_id) > version
+    changes = cloud_client.shadow_tracker.changes(device_id, version)["changes"]
+    assert changes["temp_set"]["value"] == 235
+    assert cloud_client.property_cache.get(device_id)["temp_set"]["value"] == 235
+
+
+def test_wrong_password_is_rejected(cloud_client):
+    async def scenario(mock, subscriber):
+        await wait_for(lambda: mock.rejected >= 2)
+        assert not mock.consumers and not subscriber.connected
+        assert subscriber.errors >= 2
+    
+    run_with_mq(cloud_client, scenario, access_key="another-secret-0123456789")
+
+
+def test_reconnect_after_disconnect(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[1]
+    cloud_client.get_device_properties(device_id)
+    
+    async def scenario(mock, subscriber):
+        await mock.wait_connected()
+        assert await mock.disconnect_all() == 1
+        await wait_for(lambda: mock.connections == 2 and mock.consumers)
+        message_id = await mock.publish(device_id, [{"code": "Power", "value": True}])
+        await wait_for(lambda: message_id in mock.acked)
+        assert subscriber.reconnects >= 1
+    
+    run_with_mq(cloud_client, scenario)
+    assert cloud_client.property_cache.get(device_id)["Power"]["value"] is True
+
+
+def test_apply_status_report_merges_values(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    cloud_client.get_device_properties(device_id)
+    version = cloud_client.shadow_tracker.version(device_id)
+    
+    # Sekunden-Zeitstempel werden als Millisekunden übernommen
+    assert cloud_client.apply_status_report(device_id, [
+        {"code": "temp_set", "value": 240, "t": 1_700_000_000},
+        {"value": "ohne code"},
+    ]) == version + 1
+    changes = cloud_client.shadow_tracker.changes(device_id, version)["changes"]
+    assert set(changes) == {"temp_set"}
+    assert changes["temp_set"]["time"] == 1_700_000_000_000
+    # Leere Meldung ändert nichts
+    assert cloud_client.apply_status_report(device_id, []) == version + 1
@@ -0,0 +1,60 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from models import PropertySchema, PropertyValue, replace_value, to_jsonable
+
+
+@pytest.fixture
+def prop():
+    return PropertyValue(PropertySchema("temp_set", 2, "value", "Target"), 220, 1700000000000)
+
+
+def test_mapping_matches_dict_format(prop):
+    assert dict(prop) == prop.to_dict() == {
+        "code": "temp_set", "dp_id": 2, "type": "value",
+        "value": 220, "time": 1700000000000, "custom_name": "Target",
+    }
+    assert prop.get("value") == 220 and "dp_id" in prop
+
+
+def test_immutable(prop):
+    with pytest.raises(AttributeError):
+        prop.value = 1
+    with pytest.raises(AttributeError):
+        prop.schema.code = "x"
+
+
+def test_json(prop):
+    data = json.dumps({"temp_set": prop}, default=to_jsonable)
+    assert json.loads(data) == {"temp_set": prop.to_dict()}
+    assert json.loads(json.dumps(prop.to_dict()))["value"] == 220
+
+
+def test_copy_and_deepcopy(prop):
+    assert copy.copy(prop) is prop
+    assert copy.deepcopy(prop) is prop
+    assert copy.deepcopy({"temp_set": prop})["temp_set"] == prop
+    
+    nested = PropertyValue(prop.schema, {"a": [1, 2]}, None)
+    cloned = copy.deepcopy(nested)
+    assert cloned == nested and cloned.value is not nested.value
+    assert cloned.schema is nested.schema
+
+
+@pytest.mark.parametrize("protocol", range(pickle.HIGHEST_PROTOCOL + 1))
+def test_pickle(prop, protocol):
+    restored = pickle.loads(pickle.dumps({"temp_set": prop}, protocol))["temp_set"]
+    assert isinstance(restored, PropertyValue)
+    assert restored.to_dict() == prop.to_dict()
+    assert pickle.loads(pickle.dumps(prop.schema, protocol)).code == "temp_set"
+
+
+def test_replace_value(prop):
+    updated = replace_value(prop, 230, 1)
+    assert updated.schema is prop.schema
+    assert (updated["value"], updated["time"]) == (230, 1)
+    assert prop["value"] == 220
+    assert replace_value({"value": 1, "code": "x"}, 2, 3) == {"value": 2, "code": "x", "time": 3}
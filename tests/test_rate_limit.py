@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+from client import TuyaCloudClient
+from conftest import make_config
+from rate_limit import RateLimiter, TokenBucket
+
+
+def test_bucket_rejects_wait_beyond_max_wait_without_reserving():
+    bucket = TokenBucket(rate=1.0, burst=1)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire(max_wait=0.1) is None
+    # Nichts reserviert: nach dem Nachfüllen ist sofort wieder ein Token da
+    time.sleep(1.05)
+    assert bucket.acquire(max_wait=0.1) == 0.0
+    assert bucket.stats()["rejected"] == 1
+
+
+def test_bucket_waits_when_within_max_wait():
+    bucket = TokenBucket(rate=20.0, burst=1)
+    bucket.acquire()
+    delay = bucket.acquire(max_wait=1.0)
+    assert 0 < delay <= 0.06
+
+
+def test_daily_quota_is_enforced():
+    bucket = TokenBucket(rate=100.0, burst=10, daily_quota=2)
+    assert bucket.acquire() == 0.0
+    assert not bucket.quota_exhausted()
+    assert bucket.acquire() == 0.0
+    assert bucket.quota_exhausted()
+    assert bucket.acquire() is None
+    assert bucket.stats()["calls_today"] == 2 and bucket.stats()["rejected"] == 1
+    
+    # Neuer Tag: Kontingent wieder frei
+    bucket._day = "2000-01-01"
+    assert not bucket.quota_exhausted()
+    assert bucket.acquire() == 0.0
+
+
+def test_request_fails_when_daily_quota_is_used_up(mock_cloud):
+    config = make_config(mock_cloud, rate_limit={"read": {"daily_quota": 1}})
+    client = TuyaCloudClient(config=config)
+    try:
+        device_id = mock_cloud.device_ids[0]
+        assert client.get_device_properties(device_id, max_staleness=0)
+        before = mock_cloud.stats["shadow"]
+        
+        path = f"/v2.0/cloud/thing/{device_id}/shadow/properties"
+        result = client._request("GET", path, access_token=client.get_token())
+        assert result == {"success": False, "msg": "Daily quota exceeded"}
+        assert mock_cloud.stats["shadow"] == before
+        # Schreibende Requests haben ihr eigenes Kontingent
+        assert client.set_device_properties(device_id, None, {"temp_set": 230})
+    finally:
+        client.close()
+
+
+def test_disabled_limiter_never_waits():
+    limiter = RateLimiter({"enabled": False})
+    assert limiter.acquire("eu", "GET", "/x", max_wait=0) == 0.0
+
+
+def test_request_queued_behind_rate_limit_respects_deadline(mock_cloud):
+    config = make_config(mock_cloud, rate_limit={"read": {"rate": 0.2, "burst": 1}})
+    client = TuyaCloudClient(config=config)
+    try:
+        device_id = mock_cloud.device_ids[0]
+        assert client.get_device_properties(device_id, max_staleness=0)
+        
+        started = time.monotonic()
+        path = f"/v2.0/cloud/thing/{device_id}/shadow/properties"
+        result = client._request("GET", path, access_token=client.get_token(), deadline=0.3)
+        elapsed = time.monotonic() - started
+        
+        assert result == {"success": False, "msg": "Deadline exceeded"}
+        assert elapsed < 0.3
+        assert client.rate_limiter.stats()["eu/read"]["rejected"] == 1
+    finally:
+        client.close()
+
+
+def test_async_request_queued_behind_rate_limit_respects_deadline(mock_cloud):
+    pytest.importorskip("aiohttp")
+    from async_client import AsyncTuyaCloudClient
+    
+    config = make_config(mock_cloud, rate_limit={"read": {"rate": 0.2, "burst": 1}})
+    device_id = mock_cloud.device_ids[0]
+    path = f"/v2.0/cloud/thing/{device_id}/shadow/properties"
+    
+    async def main():
+        async with AsyncTuyaCloudClient(config=config) as client:
+            token = await client.get_token()
+            assert (await client._request("GET", path, access_token=token))["success"]
+            started = time.monotonic()
+            result = await client._request("GET", path, access_token=token, deadline=0.3)
+            return result, time.monotonic() - started
+    
+    result, elapsed = asyncio.run(main())
+    assert result == {"success": False, "msg": "Deadline exceeded"}
+    assert elapsed < 0.3
@@ -0,0 +1,102 @@
+"""REST API gegen den Mock: Geräte-Routen, ETag/304, SSE Resume"""
+
+import json
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+from client import TuyaCloudClient  # noqa: E402
+from conftest import make_config  # noqa: E402
+from tuya_homeassistant_api import create_app  # noqa: E402
+
+
+@pytest.fixture
+def app(mock_cloud):
+    # Poller läuft, fragt aber im Test nur beim Start ab (refresh() von Hand)
+    config = make_config(mock_cloud, poller={"interval": 3600}, websocket={"enabled": False},
+                         events={"heartbeat": 0.2})
+    client = TuyaCloudClient(config=config)
+    app = create_app(tuya_client=client)
+    assert app.extensions["tuya_poller"].wait_ready(5)
+    yield app
+    app.extensions["tuya_poller"].stop()
+    client.close()
+
+
+@pytest.fixture
+def http(app):
+    return app.test_client()
+
+
+def _read_events(response, count):
+    """Die ersten count SSE Nachrichten (ohne Kommentare) als Dicts"""
+    messages = []
+    buffer = ""
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buffer:
+            block, buffer = buffer.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in block.splitlines()
+                          if ": " in line and not line.startswith(":"))
+            if "id" in fields or "event" in fields:
+                messages.append(fields)
+        if len(messages) >= count:
+            break
+    response.close()
+    return messages
+
+
+def test_device_routes(http, mock_cloud):
+    devices = http.get("/devices").get_json()
+    assert [d["device_id"] for d in devices["devices"]] == mock_cloud.device_ids
+    
+    second = mock_cloud.device_ids[1]
+    assert http.get("/devices/Room 1/properties").get_json()["success"]
+    assert http.get(f"/devices/{second}/property/temp_set").get_json()["success"]
+    missing = http.get("/devices/NOPE/properties")
+    assert missing.status_code == 404 and not missing.get_json()["success"]
+
+
+def test_conditional_get(http):
+    first = http.get("/properties")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Last-Modified"]
+    
+    cached = http.get("/properties", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.data == b""
+    assert cached.headers["ETag"] == etag
+    
+    assert http.post("/set", json={"property": "temp_set", "value": 240}).get_json()["success"]
+    changed = http.get("/properties", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert changed.get_json()["data"]["temp_set"]["value"] == 240
+
+
+def test_sse_resume_with_last_event_id(app, http, mock_cloud):
+    poller = app.extensions["tuya_poller"]
+    device_id = mock_cloud.device_ids[0]
+    hub = app.extensions["tuya_events"]
+    
+    poller.apply_values(device_id, {"temp_set": 230})
+    first_id = hub.event_id(hub.last_seq)
+    poller.apply_values(device_id, {"temp_set": 240})
+    poller.apply_values(device_id, {"mode": "cold"})
+    
+    # Resume nach dem ersten Ereignis: genau die beiden folgenden
+    messages = _read_events(http.get("/events", headers={"Last-Event-ID": first_id}), 2)
+    changes = [json.loads(m["data"])["changes"] for m in messages if m.get("event") == "change"]
+    assert [list(c) for c in changes] == [["temp_set"], ["mode"]]
+    assert changes[0]["temp_set"]["value"] == 240
+    assert messages[-1]["id"] == hub.event_id(hub.last_seq)
+    assert hub.subscribers == 0
+
+
+def test_sse_unknown_event_id_resyncs(http):
+    messages = _read_events(http.get("/events?last_event_id=deadbeef-7"), 1)
+    assert messages[0]["event"] == "resync"
+
+
+def test_sse_unknown_device_is_404(http):
+    assert http.get("/events?device=NOPE").status_code == 404
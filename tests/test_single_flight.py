@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def flight():
+    pytest.importorskip("aiohttp")
+    from async_client import AsyncSingleFlight
+    
+    return AsyncSingleFlight()
+
+
+def test_concurrent_calls_share_one_execution(flight):
+    calls = []
+    
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+    
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+    
+    results = run(main())
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["result"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+    assert flight.in_flight() == 0
+
+
+def test_cancelled_leader_does_not_cancel_waiters(flight):
+    async def fetch():
+        await asyncio.sleep(0.1)
+        return "result"
+    
+    async def main():
+        leader = asyncio.ensure_future(asyncio.wait_for(flight.do("k", fetch), 0.02))
+        await asyncio.sleep(0)
+        waiters = asyncio.gather(*(flight.do("k", fetch) for _ in range(3)))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        return await waiters
+    
+    results = run(main())
+    assert [r for r, _ in results] == ["result"] * 3
+    assert all(shared for _, shared in results)
+
+
+def test_request_cancelled_when_no_caller_waits(flight):
+    cancelled = []
+    
+    async def fetch():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+    
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(flight.do("k", fetch), 0.02)
+        await asyncio.sleep(0.01)
+        assert flight.in_flight() == 0
+        # Neuer Aufruf startet frisch statt einen abgebrochenen Task zu teilen
+        return await flight.do("k", lambda: asyncio.sleep(0, "fresh"))
+    
+    assert run(main()) == ("fresh", False)
+    assert cancelled == [1]
+
+
+def test_exception_reaches_all_callers(flight):
+    async def fetch():
+        await asyncio.sleep(0.02)
+        raise ValueError("boom")
+    
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(3)),
+                                    return_exceptions=True)
+    
+    assert all(isinstance(r, ValueError) for r in run(main()))
+
+
+def test_thread_single_flight_shares_result():
+    flight = SingleFlight()
+    calls = []
+    barrier = threading.Barrier(4)
+    results = []
+    
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return "result"
+    
+    def worker():
+        barrier.wait()
+        results.append(flight.do("k", fetch))
+    
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["result"] * 4
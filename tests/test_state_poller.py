@@ -0,0 +1,94 @@
+import pytest
+
+from client import TuyaCloudClient
+from conftest import make_config
+from state_poller import StatePoller
+
+
+@pytest.fixture
+def breaker_client(mock_cloud):
+    config = make_config(mock_cloud,
+                         circuit_breaker={"failure_threshold": 1, "recovery_timeout": 60},
+                         retry={"max_attempts": 1, "base_delay": 0.01, "deadline": 5})
+    client = TuyaCloudClient(config=config)
+    yield client
+    client.close()
+
+
+def test_refresh_builds_snapshot(cloud_client, mock_cloud):
+    poller = StatePoller(cloud_client)
+    states = poller.refresh()
+    assert set(states) == set(mock_cloud.device_ids)
+    state = states[mock_cloud.device_ids[0]]
+    assert state.error is None and state.properties["temp_set"]["value"] == 220
+    assert state.status.get("is_online") is not None
+
+
+def test_stale_data_is_not_taken_as_fresh(breaker_client, mock_cloud):
+    poller = StatePoller(breaker_client)
+    device_id = mock_cloud.device_ids[0]
+    before = poller.refresh()[device_id]
+    
+    mock_cloud.http_error_rate = 1
+    for _ in range(2):
+        after = poller.refresh()[device_id]
+    assert breaker_client.circuit_breaker.state == "open"
+    # Vorheriger Stand bleibt mit seinem Zeitpunkt erhalten, Fehler ist vermerkt
+    assert after.updated_at == before.updated_at
+    assert after.properties is before.properties
+    assert after.error and "circuit" in after.error
+    assert poller.errors >= len(mock_cloud.device_ids)
+    
+    # Normale Leser bekommen weiter die letzten bekannten Werte
+    assert breaker_client.get_device_properties(device_id, max_staleness=0)["temp_set"]["value"] == 220
+
+
+def test_listener_gets_only_changes(cloud_client, mock_cloud):
+    poller = StatePoller(cloud_client)
+    device_id = mock_cloud.device_ids[0]
+    seen = []
+    poller.add_listener(lambda device, changes, version: seen.append((device, set(changes))))
+    poller.refresh()
+    assert seen == []
+    
+    poller.apply_values(device_id, {"temp_set": 250, "unknown": 1})
+    assert seen == [(device_id, {"temp_set"})]
+    assert poller.device(device_id).properties["temp_set"]["value"] == 250
+
+
+def test_set_during_fetch_is_not_rolled_back(cloud_client, mock_cloud):
+    poller = StatePoller(cloud_client)
+    device_id = mock_cloud.device_ids[0]
+    poller.refresh()
+    events = []
+    poller.add_listener(lambda device, changes, version: events.append(
+        (device, {code: prop["value"] for code, prop in changes.items()}, version)))
+    
+    fetch = poller._fetch_properties
+    
+    def fetch_then_set(fetched_id):
+        # Abfrage liefert noch 220, danach bestätigt die Cloud einen Set
+        result = fetch(fetched_id)
+        if fetched_id == device_id:
+            cloud_client._apply_property_values(device_id, {"temp_set": 250})
+            poller.apply_values(device_id, {"temp_set": 250})
+        return result
+    
+    poller._fetch_properties = fetch_then_set
+    state = poller.refresh()[device_id]
+    assert state.properties["temp_set"]["value"] == 250
+    assert events == [(device_id, {"temp_set": 250}, state.version)]
+    
+    # Nächste Abfrage ohne Störung sieht den Wert der Cloud
+    poller._fetch_properties = fetch
+    mock_cloud.devices[device_id].properties["temp_set"]["value"] = 250
+    assert poller.refresh()[device_id].properties["temp_set"]["value"] == 250
+
+
+def test_apply_values_always_bumps_version(cloud_client, mock_cloud):
+    poller = StatePoller(cloud_client)
+    device_id = mock_cloud.device_ids[0]
+    first = poller.refresh()[device_id]
+    # Ohne Schreiben in den Client-Shadow (z.B. reiner Push)
+    poller.apply_values(device_id, {"temp_set": 260})
+    assert poller.device(device_id).version > first.version
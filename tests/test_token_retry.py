@@ -0,0 +1,122 @@
+"""Token-Cache und Retry-Policy gegen den Mock"""
+
+import time
+
+import pytest
+
+import mock_tuya_cloud
+from client import TuyaCloudClient
+from conftest import make_config
+
+
+@pytest.fixture
+def retry_client(mock_cloud):
+    config = make_config(mock_cloud,
+                         retry={"max_attempts": 3, "base_delay": 0.01, "max_delay": 0.02,
+                                "deadline": 5},
+                         circuit_breaker={"failure_threshold": 100})
+    client = TuyaCloudClient(config=config)
+    yield client
+    client.close()
+
+
+class _Draws:
+    """Ersetzt server.random: liefert die vorgegebenen Werte, danach 1.0 (kein Fehler)"""
+    
+    def __init__(self, *values):
+        self.values = list(values)
+    
+    def random(self):
+        return self.values.pop(0) if self.values else 1.0
+    
+    def uniform(self, low, high):
+        return low
+
+
+def _shadow(client, device_id, **kwargs):
+    path = f"/v2.0/cloud/thing/{device_id}/shadow/properties"
+    return client._request("GET", path, access_token=client.get_token(), **kwargs)
+
+
+def test_token_is_reused(cloud_client, mock_cloud):
+    for device_id in mock_cloud.device_ids * 2:
+        assert cloud_client.get_device_properties(device_id, max_staleness=0)
+    assert mock_cloud.stats["token"] == 1
+
+
+def test_token_is_renewed_before_it_expires(cloud_client, mock_cloud):
+    # expire_time 61s abzüglich TOKEN_REFRESH_MARGIN: Client verwendet ihn 1s
+    mock_cloud.token_ttl = TuyaCloudClient.TOKEN_REFRESH_MARGIN + 1
+    first = cloud_client.get_token()
+    assert cloud_client.get_token() == first
+    time.sleep(1.1)
+    assert cloud_client.get_token() != first
+    assert mock_cloud.stats["token"] == 2
+    assert "rejected_1010" not in mock_cloud.stats
+
+
+def test_rejected_token_is_refreshed_once(cloud_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    stale = cloud_client.get_token()
+    mock_cloud.expire_tokens()
+    
+    result = _shadow(cloud_client, device_id)
+    assert result["success"] is True
+    assert mock_cloud.stats["rejected_1010"] == 1
+    assert mock_cloud.stats["token"] == 2
+    # Der erneuerte Token wird danach weiterverwendet
+    assert cloud_client.get_token() != stale
+    assert _shadow(cloud_client, device_id)["success"] is True
+    assert mock_cloud.stats["token"] == 2
+
+
+def test_system_error_is_retried(retry_client, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    retry_client.get_token()
+    mock_cloud.error_rate = 0.5
+    mock_cloud.random = _Draws(0.0, 0.0)
+    
+    assert _shadow(retry_client, device_id)["success"] is True
+    assert mock_cloud.stats["injected_errors"] == 2
+    assert mock_cloud.stats["shadow"] == 1
+
+
+def test_retries_stop_after_max_attempts(retry_client, mock_cloud):
+    retry_client.get_token()
+    mock_cloud.error_rate = 1
+    
+    result = _shadow(retry_client, mock_cloud.device_ids[0])
+    assert result["success"] is False and result["code"] == 500
+    assert mock_cloud.stats["injected_errors"] == 3
+
+
+def test_invalid_timestamp_is_retried(retry_client, mock_cloud, monkeypatch):
+    retry_client.get_token()
+    # Jeder Timestamp gilt als zu alt
+    monkeypatch.setattr(mock_tuya_cloud, "MAX_CLOCK_SKEW_MS", -1)
+    
+    result = _shadow(retry_client, mock_cloud.device_ids[0])
+    assert result["code"] == 1013
+    assert mock_cloud.stats["rejected_1013"] == 3
+
+
+def test_retries_give_up_at_deadline(mock_cloud):
+    config = make_config(mock_cloud,
+                         retry={"max_attempts": 50, "base_delay": 0.05, "max_delay": 0.05,
+                                "deadline": 0.35},
+                         circuit_breaker={"failure_threshold": 100})
+    client = TuyaCloudClient(config=config)
+    try:
+        client.get_token()
+        mock_cloud.error_rate = 1
+        mock_cloud.latency = 0.1
+        
+        started = time.monotonic()
+        result = _shadow(client, mock_cloud.device_ids[0])
+        elapsed = time.monotonic() - started
+        
+        assert result["success"] is False
+        assert elapsed < 0.5
+        assert 2 <= mock_cloud.stats["injected_errors"] <= 4
+    finally:
+        client.close()
@@ -0,0 +1,105 @@
+"""/ws gegen den Mock: Abo-Fehler, Befehle mit Ack und Begründung"""
+
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+pytest.importorskip("flask_sock")
+simple_websocket = pytest.importorskip("simple_websocket")
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from client import TuyaCloudClient  # noqa: E402
+from conftest import make_config  # noqa: E402
+from tuya_homeassistant_api import create_app  # noqa: E402
+
+
+@pytest.fixture
+def ws_url(mock_cloud):
+    config = make_config(mock_cloud, poller={"interval": 3600})
+    client = TuyaCloudClient(config=config)
+    app = create_app(tuya_client=client)
+    app.extensions["tuya_poller"].wait_ready(5)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"ws://127.0.0.1:{server.server_port}/ws"
+    server.shutdown()
+    app.extensions["tuya_poller"].stop()
+    client.close()
+
+
+def _receive(ws, kind):
+    """Nächste Nachricht vom Typ kind (andere werden übersprungen)"""
+    while True:
+        message = json.loads(ws.receive(timeout=5))
+        if message["type"] == kind:
+            return message
+
+
+def test_unknown_device_in_query_closes_socket(ws_url):
+    ws = simple_websocket.Client(f"{ws_url}?device=NOPE")
+    message = json.loads(ws.receive(timeout=5))
+    assert message == {"type": "error", "error": "Device NOPE not found"}
+    with pytest.raises(simple_websocket.ConnectionClosed) as closed:
+        ws.receive(timeout=5)
+    assert closed.value.reason == 1008
+
+
+def test_set_is_acked_and_pushed(ws_url, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    ws = simple_websocket.Client(f"{ws_url}?device={device_id}&code=temp_set")
+    try:
+        assert _receive(ws, "hello")["push"] is True
+        assert _receive(ws, "state")["properties"]["temp_set"]["value"] == 220
+        
+        ws.send(json.dumps({"type": "set", "id": "c1", "property": "temp_set", "value": 230}))
+        ack = _receive(ws, "ack")
+        assert ack["id"] == "c1" and ack["success"] is True
+        assert _receive(ws, "delta")["changes"]["temp_set"]["value"] == 230
+        assert mock_cloud.devices[device_id].properties["temp_set"]["value"] == 230
+    finally:
+        ws.close()
+
+
+def test_rejected_command_ack_carries_reason(ws_url, mock_cloud):
+    ws = simple_websocket.Client(ws_url)
+    try:
+        _receive(ws, "hello")
+        # Abgelehnt von der Validierung im Client
+        ws.send(json.dumps({"type": "set", "id": "c2", "property": "temp_set", "value": "warm"}))
+        ack = _receive(ws, "ack")
+        assert ack["id"] == "c2" and ack["success"] is False
+        assert "temp_set" in ack["error"] and "Zahl" in ack["error"]
+        
+        # Abgelehnt von der Cloud
+        ws.send(json.dumps({"type": "set", "id": "c3", "property": "temp_set", "value": 999}))
+        ack = _receive(ws, "ack")
+        assert ack["id"] == "c3" and ack["success"] is False
+        assert ack["error"] == "param is out of range"
+    finally:
+        ws.close()
+
+
+def test_deltas_fan_out_from_one_thread(ws_url, mock_cloud):
+    device_id = mock_cloud.device_ids[0]
+    before = set(threading.enumerate())
+    clients = [simple_websocket.Client(f"{ws_url}?device={device_id}") for _ in range(5)]
+    try:
+        for ws in clients:
+            _receive(ws, "state")
+        started = [thread.name for thread in set(threading.enumerate()) - before
+                   if thread.name.startswith("tuya-ws")]
+        # Ein gemeinsamer Leser für alle Sockets, kein Push-Thread pro Client
+        assert started == ["tuya-ws-fanout"]
+        
+        clients[0].send(json.dumps({"type": "set", "id": "c4", "property": "temp_set",
+                                    "value": 240}))
+        for ws in clients:
+            assert _receive(ws, "delta")["changes"]["temp_set"]["value"] == 240
+    finally:
+        for ws in clients:
+            ws.close()